@@ -0,0 +1,253 @@
+# benchmark.py
+import argparse
+import csv
+import datetime
+import json
+import math
+import platform
+import random
+import time
+import tracemalloc
+
+import networkx as nx
+import numpy as np
+
+from graph_manager import GraphManager
+
+KM_PER_DEGREE = 111.195  # along a meridian; generated maps sit near the equator
+ALGORITHMS = ("dijkstra", "a_star", "bellman_ford", "bfs", "dfs", "prim_mst", "kruskal_mst")
+WHOLE_GRAPH = {"prim_mst", "kruskal_mst"}
+
+
+# Synthetic graphs
+def _to_manager(xy, edges, seed, detour=0.3):
+    """Build a GraphManager from km coordinates and an edge list.
+
+    Each road is the straight-line distance times a random detour factor in
+    [1, 1 + detour], so haversine bounds stay admissible for A*.
+    """
+    rng = random.Random(seed)
+    graph = GraphManager()
+    names = [f"C{i}" for i in range(len(xy))]
+    for name, (x, y) in zip(names, xy):
+        graph.add_city(name, y / KM_PER_DEGREE, x / KM_PER_DEGREE)
+    for u, v in edges:
+        straight = math.dist(xy[u], xy[v])
+        graph.add_route(names[u], names[v], round(max(straight, 0.1) * (1 + rng.random() * detour), 3))
+    return graph
+
+
+def grid_graph(rows, cols, spacing_km=10.0, seed=0, cities=None):
+    """City blocks: a rows x cols lattice with ``spacing_km`` between neighbours.
+
+    With ``cities`` only that many lattice points are kept, in row order, so
+    the last row may be partial.
+    """
+    count = rows * cols if cities is None else min(cities, rows * cols)
+    xy = [(c * spacing_km, r * spacing_km) for r in range(rows) for c in range(cols)][:count]
+    edges = [(r * cols + c, r * cols + c + 1) for r in range(rows) for c in range(cols - 1)]
+    edges += [(r * cols + c, (r + 1) * cols + c) for r in range(rows - 1) for c in range(cols)]
+    return _to_manager(xy, [(u, v) for u, v in edges if v < count], seed)
+
+
+def _grid_of(n, seed):
+    """A near-square grid of exactly ``n`` cities."""
+    cols = math.isqrt(n - 1) + 1 if n > 0 else 1  # ceil(sqrt(n))
+    return grid_graph(-(-n // cols), cols, seed=seed, cities=n)
+
+
+def random_geometric_graph(n, degree=6.0, side_km=1000.0, seed=0):
+    """Cities scattered over a square, joined to everything within a radius giving ``degree`` on average."""
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(0, side_km, size=(n, 2))
+    radius = side_km * math.sqrt(degree / (math.pi * max(n, 1)))
+    # Sweep along x so each city is only compared with a thin slab of others.
+    order = np.argsort(xy[:, 0], kind="stable")
+    xs = xy[order, 0]
+    edges = []
+    for i in range(n):
+        hi = np.searchsorted(xs, xs[i] + radius, side="right")
+        cand = order[i + 1:hi]
+        u = order[i]
+        close = cand[np.hypot(*(xy[cand] - xy[u]).T) <= radius]
+        edges.extend((int(u), int(v)) for v in close)
+    return _to_manager(xy.tolist(), edges, seed)
+
+
+def scale_free_graph(n, m=2, side_km=1000.0, seed=0):
+    """Road-like hubs: Barabasi-Albert attachment with roads as long as the map says."""
+    rng = np.random.default_rng(seed)
+    G = nx.barabasi_albert_graph(n, m, seed=seed)
+    xy = rng.uniform(0, side_km, size=(n, 2)).tolist()
+    return _to_manager(xy, G.edges(), seed)
+
+
+GENERATORS = {
+    "grid": _grid_of,
+    "geometric": lambda n, seed: random_geometric_graph(n, seed=seed),
+    "scale_free": lambda n, seed: scale_free_graph(n, seed=seed),
+}
+
+
+# Runner
+def random_pairs(graph, count, seed=0):
+    rng = random.Random(seed)
+    names = list(graph.graph)
+    return [tuple(rng.sample(names, 2)) for _ in range(count)] if len(names) > 1 else []
+
+
+def _found(result):
+    if isinstance(result, tuple):
+        result = result[0]
+    return bool(result)
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def _peak_kib(graph, method, calls):
+    """Largest Python allocation peak over ``calls`` cold runs, in KiB."""
+    tracemalloc.start()
+    try:
+        peak = 0
+        for args in calls:
+            graph.clear_caches()
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            method(*args)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def _search_effort(graph, method, calls):
+    """Mean nodes settled, edges relaxed and largest frontier over cold, instrumented runs."""
+    popped, relaxed, heap_max = [], [], 0
+    enabled = graph.metrics()["enabled"]
+    graph.enable_metrics()
+    try:
+        for args in calls:
+            graph.clear_caches()
+            method(*args)
+            stats = graph.last_query_stats()
+            popped.append(stats.popped)
+            relaxed.append(stats.relaxed)
+            heap_max = max(heap_max, stats.heap_max)
+    finally:
+        if not enabled:
+            graph.enable_metrics(False)
+    return {"settled": round(sum(popped) / len(popped), 1) if popped else 0.0,
+            "relaxed": round(sum(relaxed) / len(relaxed), 1) if relaxed else 0.0,
+            "heap_max": heap_max}
+
+
+def run_benchmark(graph, label="graph", algorithms=ALGORITHMS, queries=50, repeat=3, seed=0,
+                  memory=True, memory_samples=5):
+    """Time each algorithm on ``graph`` and return one result row (a dict) per algorithm.
+
+    Point-to-point algorithms run over ``queries`` random city pairs, the MST
+    algorithms ``repeat`` times. Caches are cleared before every call so each
+    timing is a cold start. Search effort (mean nodes settled and edges relaxed,
+    largest frontier) and memory are measured on separate passes so neither
+    the instrumentation nor tracemalloc skews the timings.
+    """
+    pairs = random_pairs(graph, queries, seed)
+    nodes, edges = len(graph.graph), len(graph.get_all_routes())
+    rows = []
+    for algorithm in algorithms:
+        method = getattr(graph, algorithm)
+        calls = [()] * repeat if algorithm in WHOLE_GRAPH else pairs
+        times, found = [], 0
+        for args in calls:
+            graph.clear_caches()
+            t0 = time.perf_counter()
+            result = method(*args)
+            times.append(time.perf_counter() - t0)
+            found += _found(result)
+        effort = _search_effort(graph, method, calls)
+        peak = _peak_kib(graph, method, calls[:memory_samples]) if memory and calls else None
+        ms = [t * 1000 for t in times]
+        rows.append({
+            "graph": label, "nodes": nodes, "edges": edges, "algorithm": algorithm,
+            "runs": len(times), "found": found,
+            "total_s": round(sum(times), 6),
+            "mean_ms": round(sum(ms) / len(ms), 4) if ms else 0.0,
+            "p50_ms": round(_percentile(ms, 50), 4),
+            "p95_ms": round(_percentile(ms, 95), 4),
+            "max_ms": round(max(ms), 4) if ms else 0.0,
+            **effort,
+            "peak_kib": peak,
+        })
+    return rows
+
+
+# Output
+def environment(label=None):
+    """Describe the machine and run so result files can be compared across versions."""
+    return {
+        "label": label,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "networkx": nx.__version__,
+    }
+
+
+def write_json(rows, path, meta=None):
+    with open(path, "w") as f:
+        json.dump({"meta": meta or environment(), "results": rows}, f, indent=2)
+
+
+def write_csv(rows, path):
+    if not rows:
+        return
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def format_table(rows):
+    lines = [f"{'graph':<12}{'nodes':>8}{'algorithm':>14}{'runs':>6}{'mean ms':>11}{'p95 ms':>11}"
+             f"{'settled':>10}{'relaxed':>10}{'heap max':>10}{'peak KiB':>11}"]
+    for r in rows:
+        peak = "-" if r["peak_kib"] is None else f"{r['peak_kib']:.1f}"
+        lines.append(f"{r['graph']:<12}{r['nodes']:>8}{r['algorithm']:>14}{r['runs']:>6}"
+                     f"{r['mean_ms']:>11.3f}{r['p95_ms']:>11.3f}"
+                     f"{r['settled']:>10.1f}{r['relaxed']:>10.1f}{r['heap_max']:>10}{peak:>11}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark SmartRoute+ algorithms on synthetic networks.")
+    parser.add_argument("--graphs", nargs="+", default=list(GENERATORS), choices=list(GENERATORS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 1000])
+    parser.add_argument("--algorithms", nargs="+", default=list(ALGORITHMS), choices=list(ALGORITHMS))
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--label", help="tag stored with the results, e.g. a version")
+    parser.add_argument("--json", help="write results to this JSON file")
+    parser.add_argument("--csv", help="write results to this CSV file")
+    args = parser.parse_args(argv)
+
+    rows = []
+    for kind in args.graphs:
+        for size in args.sizes:
+            graph = GENERATORS[kind](size, args.seed)
+            rows += run_benchmark(graph, f"{kind}-{size}", args.algorithms, args.queries,
+                                  args.repeat, args.seed, memory=not args.no_memory)
+    print(format_table(rows))
+    if args.json:
+        write_json(rows, args.json, environment(args.label))
+    if args.csv:
+        write_csv(rows, args.csv)
+
+
+if __name__ == "__main__":
+    main()
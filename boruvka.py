@@ -0,0 +1,115 @@
+# boruvka.py
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+_shared = {}
+
+
+def _cheapest_edges(eu, ev, rank, comp, lo, hi):
+    """For edges lo..hi return (components, ranks) of each component's cheapest outgoing edge.
+
+    Edges are compared by their rank in (weight, id) order, a strict total order
+    that keeps the picked edges acyclic and matches Kruskal's stable sort.
+    """
+    cu, cv = comp[eu[lo:hi]], comp[ev[lo:hi]]
+    cross = cu != cv
+    r = rank[lo:hi][cross]
+    return _min_per_component(np.concatenate([cu[cross], cv[cross]]), np.concatenate([r, r]), len(comp))
+
+
+def _min_per_component(comps, ranks, n):
+    best = np.full(n, np.iinfo(np.int64).max)
+    np.minimum.at(best, comps, ranks)
+    comps = np.flatnonzero(best != np.iinfo(np.int64).max)
+    return comps, best[comps]
+
+
+def _attach(names, m, n):
+    for key, (name, dtype, size) in zip(("eu", "ev", "rank", "comp"),
+                                        zip(names, (np.int32, np.int32, np.int64, np.int64), (m, m, m, n))):
+        block = shared_memory.SharedMemory(name=name)
+        _shared[key] = (block, np.ndarray(size, dtype=dtype, buffer=block.buf))
+
+
+def _worker_slice(lo, hi):
+    eu, ev, rank, comp = (_shared[k][1] for k in ("eu", "ev", "rank", "comp"))
+    return _cheapest_edges(eu, ev, rank, comp, lo, hi)
+
+
+def _share(array):
+    block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+    view[:] = array
+    return block, view
+
+
+def boruvka_mst(n, eu, ev, w, processes=None):
+    """Return the edge ids of the minimum spanning forest of an undirected graph.
+
+    Each round every component picks its cheapest outgoing edge and the picks
+    are merged; the number of components at least halves per round. With
+    ``processes`` > 1 the per-edge scan of each round is split across a process
+    pool that reads endpoints, edge ranks and component labels from shared memory.
+    """
+    eu = np.asarray(eu, dtype=np.int32)
+    ev = np.asarray(ev, dtype=np.int32)
+    w = np.asarray(w, dtype=np.float64)
+    m = len(w)
+    order = np.argsort(w, kind="stable")
+    rank = np.empty(m, dtype=np.int64)
+    rank[order] = np.arange(m)
+    comp = np.arange(n, dtype=np.int64)
+    chosen = [np.empty(0, dtype=np.int64)]
+    if not m:
+        return chosen[0]
+
+    shared, pool = [], None
+    try:
+        if processes and processes > 1:
+            shared = [_share(a) for a in (eu, ev, rank, comp)]
+            comp = shared[3][1]
+            pool = ProcessPoolExecutor(max_workers=processes, initializer=_attach,
+                                       initargs=([b.name for b, _ in shared], m, n))
+            step = -(-m // processes)
+            slices = [(lo, min(m, lo + step)) for lo in range(0, m, step)]
+
+        while True:
+            if pool is not None:
+                parts = list(pool.map(_worker_slice, *zip(*slices)))
+                comps, ranks = _min_per_component(np.concatenate([p[0] for p in parts]),
+                                                  np.concatenate([p[1] for p in parts]), n)
+            else:
+                comps, ranks = _cheapest_edges(eu, ev, rank, comp, 0, m)
+            if not len(comps):
+                break
+            ids = order[ranks]
+
+            # Point each component at the one its cheapest edge leads to. Two
+            # components picking each other share the same edge, and the lower
+            # label becomes the root; pointer jumping then flattens the trees.
+            cu, cv = comp[eu[ids]], comp[ev[ids]]
+            other = np.where(cu == comps, cv, cu)
+            parent = np.arange(n, dtype=np.int64)
+            parent[comps] = other
+            root = (parent[other] == comps) & (comps < other)
+            parent[comps[root]] = comps[root]
+            chosen.append(ids[~root])
+            while True:
+                jumped = parent[parent]
+                if np.array_equal(jumped, parent):
+                    break
+                parent = jumped
+            comp[:] = parent[comp]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        blocks = [b for b, _ in shared]
+        # Views must go before the blocks can be closed.
+        shared = comp = None
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    return np.concatenate(chosen).astype(np.int64)
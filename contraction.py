@@ -0,0 +1,192 @@
+# contraction.py
+import heapq
+from array import array
+
+
+class ContractionHierarchy:
+    """Contraction Hierarchies index over an undirected, non-negatively weighted graph.
+
+    Nodes are contracted one at a time (least important first); whenever removing
+    a node would lengthen a shortest path between two of its neighbours a shortcut
+    edge remembering the skipped "middle" node is added. Queries then only climb
+    to more important nodes from both ends, which touches a tiny part of the graph.
+    """
+
+    def __init__(self, n, eu, ev, weights, order=None, witness_limit=60, tick=None):
+        self.n = n
+        self.witness_limit = witness_limit
+        self.order = None
+        self._contract(eu, ev, weights, order, tick)
+
+    def customize(self, eu, ev, weights, tick=None):
+        """Rebuild shortcuts for new weights, keeping the existing contraction order.
+
+        Finding a good order is the expensive part of preprocessing; re-contracting
+        in the same order is enough to stay exact after traffic changes weights.
+        """
+        self._contract(eu, ev, weights, self.order, tick)
+
+    @property
+    def shortcut_count(self):
+        """Number of shortcut edges added by the last contraction."""
+        return len(self._middle)
+
+    # Preprocessing
+    def _contract(self, eu, ev, weights, order, tick=None):
+        """Contract every node; ``tick`` (if given) is called once per node and may raise to abort."""
+        n = self.n
+        adj = [{} for _ in range(n)]
+        for u, v, w in zip(eu, ev, weights):
+            if u == v:
+                continue
+            if w < adj[u].get(v, (float("inf"),))[0]:
+                adj[u][v] = adj[v][u] = (w, -1)
+
+        rank = [-1] * n
+        removed = [0] * n
+        up = [None] * n
+        sequence = []
+
+        def contract(v):
+            if tick is not None:
+                tick()
+            for u, x, via in self._shortcuts(adj, v):
+                if via < adj[u].get(x, (float("inf"),))[0]:
+                    adj[u][x] = adj[x][u] = (via, v)
+            up[v] = list(adj[v].items())
+            for u in adj[v]:
+                del adj[u][v]
+                removed[u] += 1
+            adj[v] = {}
+            rank[v] = len(sequence)
+            sequence.append(v)
+
+        if order is not None:
+            for v in order:
+                contract(v)
+        else:
+            def priority(v):
+                return len(self._shortcuts(adj, v)) - len(adj[v]) + removed[v]
+
+            heap = [(priority(v), v) for v in range(n)]
+            heapq.heapify(heap)
+            while heap:
+                _, v = heapq.heappop(heap)
+                # Lazy update: re-evaluate and only contract if still the cheapest.
+                p = priority(v)
+                if heap and p > heap[0][0]:
+                    heapq.heappush(heap, (p, v))
+                    continue
+                contract(v)
+
+        self.order = sequence
+        self.rank = rank
+        self._middle = {}
+        off, to, wt = array("q", [0]), array("i"), array("d")
+        for v in range(n):
+            for u, (w, mid) in up[v]:
+                to.append(u)
+                wt.append(w)
+                if mid >= 0:
+                    self._middle[(v, u) if v < u else (u, v)] = mid
+            off.append(len(to))
+        self._up = (off, to, wt)
+
+    def _shortcuts(self, adj, v):
+        """Return (u, x, weight) shortcuts needed if ``v`` were contracted now."""
+        neighbours = [(u, w) for u, (w, _) in adj[v].items()]
+        found = []
+        for i, (u, wu) in enumerate(neighbours):
+            rest = neighbours[i + 1:]
+            if not rest:
+                break
+            limit = wu + max(w for _, w in rest)
+            reach = self._witness(adj, u, v, limit)
+            for x, wx in rest:
+                via = wu + wx
+                if reach.get(x, float("inf")) > via:
+                    found.append((u, x, via))
+        return found
+
+    def _witness(self, adj, source, skip, limit):
+        """Bounded Dijkstra from ``source`` that avoids ``skip``; returns tentative distances."""
+        dist = {source: 0.0}
+        heap = [(0.0, source)]
+        settled = 0
+        while heap and settled < self.witness_limit:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            if d > limit:
+                break
+            settled += 1
+            for x, (w, _) in adj[u].items():
+                nd = d + w
+                if x != skip and nd <= limit and nd < dist.get(x, float("inf")):
+                    dist[x] = nd
+                    heapq.heappush(heap, (nd, x))
+        return dist
+
+    # Queries
+    def query(self, s, t):
+        """Return (node_path, distance) between ids ``s`` and ``t``, or (None, None)."""
+        if s == t:
+            return [s], 0.0
+        off, to, wt = self._up
+        inf = float("inf")
+        dist = ({s: 0.0}, {t: 0.0})
+        prev = ({s: -1}, {t: -1})
+        heaps = ([(0.0, s)], [(0.0, t)])
+        best, meet = inf, -1
+        pop, push = heapq.heappop, heapq.heappush
+
+        while heaps[0] or heaps[1]:
+            side = 0 if heaps[0] and (not heaps[1] or heaps[0][0][0] <= heaps[1][0][0]) else 1
+            heap, own, other, pred = heaps[side], dist[side], dist[1 - side], prev[side]
+            d, u = pop(heap)
+            if d >= best:
+                # Upward searches are not monotone in each other, so only this side stops.
+                heap.clear()
+                continue
+            if d > own[u]:
+                continue
+            if u in other and d + other[u] < best:
+                best, meet = d + other[u], u
+            for k in range(off[u], off[u + 1]):
+                v = to[k]
+                nd = d + wt[k]
+                if nd < own.get(v, inf):
+                    own[v] = nd
+                    pred[v] = u
+                    push(heap, (nd, v))
+
+        if meet < 0:
+            return None, None
+        up_from_s = self._trace(prev[0], meet)
+        up_from_t = self._trace(prev[1], meet)
+        hops = up_from_s + up_from_t[::-1][1:]
+        path = [hops[0]]
+        for a, b in zip(hops, hops[1:]):
+            self._unpack(a, b, path)
+        return path, best
+
+    @staticmethod
+    def _trace(prev, node):
+        path = []
+        while node != -1:
+            path.append(node)
+            node = prev[node]
+        path.reverse()
+        return path
+
+    def _unpack(self, a, b, path):
+        """Append the original nodes of edge a-b (excluding ``a``) to ``path``."""
+        stack = [(a, b)]
+        while stack:
+            a, b = stack.pop()
+            mid = self._middle.get((a, b) if a < b else (b, a), -1)
+            if mid < 0:
+                path.append(b)
+            else:
+                stack.append((mid, b))
+                stack.append((a, mid))
@@ -1,224 +1,2305 @@
 # graph_manager.py
+import bisect
 import heapq
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 import networkx as nx
+import numpy as np
+import copy
+import csv
 import datetime
-from collections import deque
+import functools
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import math
+import mmap
+import numbers
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict, deque
+from collections.abc import Mapping, Sequence
+from contextlib import contextmanager
+from boruvka import boruvka_mst
+from contraction import ContractionHierarchy
+from itinerary import solve_tour
+
+_NP_TYPES = {"i": np.int32, "q": np.int64, "d": np.float64}
+EARTH_RADIUS_KM = 6371.0088
+_MISSING = object()
+PROFILE_SLOTS = 96  # speed-profile samples per day (every 15 minutes)
+NEGATIVE_CYCLE = "Negative cycle detected!"
+LOD_NODES = 300  # above this many cities visualize_graph drops labels and batches edges
+# Snapshot files: magic, format version, then a table of named raw-array sections.
+SNAPSHOT_MAGIC = b"SRGS"
+SNAPSHOT_VERSION = 1
+_SNAPSHOT_HEADER = struct.Struct("<4sHHqqI4x")  # magic, version, byte order, n, m, sections
+_SNAPSHOT_ENTRY = struct.Struct("<8sqq")  # section name, offset, byte length
+_SNAPSHOT_TYPES = {"names": "B", "name_off": "q", "eu": "i", "ev": "i", "weight": "d", "speed": "d",
+                   "lat": "d", "lon": "d", "csr_off": "q", "csr_to": "i", "csr_eid": "i", "csr_w": "d",
+                   "slot_1st": "q", "slot_2nd": "q", "lm_ids": "i", "lm_dist": "d", "mst_off": "q", "mst_eid": "i"}
+# Header names load_routes recognises for its three columns.
+_ROUTE_COLUMNS = ({"from", "source", "src", "city1", "origin", "u"},
+                  {"to", "target", "dst", "city2", "destination", "v"},
+                  {"distance", "km", "weight", "length", "dist"})
+
+
+def _default_speed(distance):
+    """Typical road speed (km/h) for a segment of the given length."""
+    if distance < 30:
+        return 40.0
+    elif distance < 100:
+        return 60.0
+    return 90.0
+
+
+def _default_speeds(distances):
+    """Vectorised _default_speed over a NumPy array of lengths."""
+    return np.where(distances < 30, 40.0, np.where(distances < 100, 60.0, 90.0))
+
+
+def _city_key(name):
+    """Case- and spacing-insensitive lookup key for a city name."""
+    return " ".join(str(name).split()).casefold()
+
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between points given in radians (NumPy-aware)."""
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _to_array(typecode, values):
+    """Copy a NumPy array into a compact array.array (fast scalar indexing)."""
+    out = array(typecode)
+    out.frombytes(np.ascontiguousarray(values, dtype=_NP_TYPES[typecode]).tobytes())
+    return out
+
+
+def _as_numpy(typecode, values):
+    """Copy an array.array into a NumPy array without pinning its buffer."""
+    return np.frombuffer(values, dtype=_NP_TYPES[typecode]).copy()
+
+
+def _one_to_many(off, to, wt, n, source, targets):
+    """Plain Dijkstra from ``source`` that stops once every target id has settled."""
+    inf = float("inf")
+    dist = [inf] * n
+    done = bytearray(n)
+    wanted = bytearray(n)
+    for t in targets:
+        wanted[t] = 1
+    remaining = sum(wanted)
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    pop, push = heapq.heappop, heapq.heappush
+    while heap and remaining:
+        d, u = pop(heap)
+        if done[u]:
+            continue
+        done[u] = 1
+        if wanted[u]:
+            remaining -= 1
+        for k in range(off[u], off[u + 1]):
+            v = to[k]
+            nd = d + wt[k]
+            if nd < dist[v]:
+                dist[v] = nd
+                push(heap, (nd, v))
+    return [dist[t] for t in targets]
+
+
+_worker_graph = None
+
+
+def _init_matrix_worker(off, to, wt, n):
+    global _worker_graph
+    _worker_graph = (off, to, wt, n)
+
+
+def _owned(values):
+    """array.array copy of a snapshot memoryview; views into an mmap can't grow or be pickled."""
+    if isinstance(values, memoryview):
+        out = array(values.format)
+        out.frombytes(values.cast("B"))
+        return out
+    return values
+
+
+def _matrix_rows(sources, targets):
+    off, to, wt, n = _worker_graph
+    return [_one_to_many(off, to, wt, n, s, targets) for s in sources]
+
+
+class QueryCancelled(Exception):
+    """Raised inside a search whose CancelToken was cancelled."""
+
+
+class CancelToken:
+    """Cooperative cancellation flag and coarse progress for one long-running call.
+
+    Search loops call ``tick`` once per step; the flag is only looked at every
+    1024 steps so polling stays cheap.
+    """
+
+    def __init__(self):
+        self.cancelled = False
+        self.progress = 0.0
+        self.steps = 0
+
+    def cancel(self):
+        self.cancelled = True
+
+    def tick(self, total=0):
+        self.steps += 1
+        if not self.steps & 1023:
+            if self.cancelled:
+                raise QueryCancelled()
+            if total:
+                self.progress = min(1.0, self.steps / total)
+
+
+class QueryStats:
+    """Counters and timings for one instrumented query.
+
+    ``popped`` counts settled nodes (or dequeued paths for BFS), ``relaxed`` the
+    edges scanned from them and ``heap_max`` the largest frontier seen. Phases
+    are named preprocessing steps triggered by the query (CSR build, traffic
+    derivation, landmarks, ...); whatever is left of ``seconds`` is the search.
+    """
+
+    def __init__(self, algorithm, args=()):
+        self.algorithm = algorithm
+        self.args = args
+        self.popped = 0
+        self.relaxed = 0
+        self.heap_max = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.phases = {}
+        self.seconds = 0.0
+
+    def visit(self, frontier, degree):
+        self.popped += 1
+        self.relaxed += degree
+        if frontier > self.heap_max:
+            self.heap_max = frontier
+
+    def as_dict(self):
+        phases = {name: round(t, 6) for name, t in self.phases.items()}
+        phases["search"] = round(max(0.0, self.seconds - sum(self.phases.values())), 6)
+        return {"algorithm": self.algorithm, "args": list(self.args), "seconds": round(self.seconds, 6),
+                "popped": self.popped, "relaxed": self.relaxed, "heap_max": self.heap_max,
+                "cache_hits": self.cache_hits, "cache_misses": self.cache_misses, "phases": phases}
+
+    def summary(self):
+        d = self.as_dict()
+        phases = ", ".join(f"{name} {t * 1000:.2f} ms" for name, t in d["phases"].items())
+        return (f"{self.algorithm}: {self.seconds * 1000:.2f} ms, {self.popped} popped, {self.relaxed} edges relaxed, "
+                f"heap max {self.heap_max}, cache {self.cache_hits} hit / {self.cache_misses} miss ({phases})")
+
+
+class _Metrics:
+    """Running per-algorithm totals plus the registered hooks and the last query."""
+
+    def __init__(self):
+        self.hooks = []
+        self.totals = {}
+        self.last = None
+
+    def record(self, stats):
+        total = self.totals.setdefault(stats.algorithm, {"queries": 0, "seconds": 0.0, "popped": 0, "relaxed": 0,
+                                                         "heap_max": 0, "cache_hits": 0})
+        total["queries"] += 1
+        total["seconds"] += stats.seconds
+        total["popped"] += stats.popped
+        total["relaxed"] += stats.relaxed
+        total["heap_max"] = max(total["heap_max"], stats.heap_max)
+        total["cache_hits"] += stats.cache_hits
+        self.last = stats
+        for hook in list(self.hooks):
+            hook(stats)
+
+
+def _instrumented(method):
+    """Record a QueryStats for each outermost call while metrics are enabled."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        metrics = self._metrics
+        if metrics is None or self._stats is not None:
+            return method(self, *args, **kwargs)
+        stats = self._stats = QueryStats(method.__name__, args)
+        results, trees = self._results, self._trees
+        hits, misses = results.hits + trees.hits, results.misses + trees.misses
+        t0 = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            stats.seconds = time.perf_counter() - t0
+            stats.cache_hits = results.hits + trees.hits - hits
+            stats.cache_misses = results.misses + trees.misses - misses
+            self._stats = None
+            metrics.record(stats)
+    return wrapper
+
+
+class TrafficOverlay:
+    """One traffic scenario: sparse multipliers layered over the base road weights.
+
+    ``factor`` scales every road, ``regions`` maps a region name to a multiplier
+    for roads touching it and ``edges`` maps an edge id to a per-road multiplier.
+    Effective weights, speeds and CSR slot weights are derived on first use and
+    patched in place when a single road or region changes.
+    """
+
+    def __init__(self, factor=1.0, rush_hour=False):
+        self.factor = factor
+        self.rush_hour = rush_hour
+        self.regions = {}
+        self.edges = {}
+        self.weights = None
+        self.speeds = None
+        self.slot_weights = None
+
+    def drop_derived(self):
+        self.weights = self.speeds = self.slot_weights = None
+
+    def copy(self):
+        other = copy.copy(self)
+        other.regions, other.edges = dict(self.regions), dict(self.edges)
+        for name in ("weights", "speeds", "slot_weights"):
+            derived = getattr(self, name)
+            if derived is not None:
+                setattr(other, name, derived[:])
+        return other
+
+
+class _LRUCache:
+    """Bounded mapping that evicts the least recently used entry; counts hits and misses."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        value = self._data.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class _SearchTree:
+    """Resumable Dijkstra state from one source: distances, predecessors and open heap."""
+
+    __slots__ = ("dist", "prev", "done", "heap")
+
+    def __init__(self, n, source):
+        self.dist = [float("inf")] * n
+        self.prev = [-1] * n
+        self.done = bytearray(n)
+        self.dist[source] = 0.0
+        self.heap = [(0.0, source)]
+
+
+class _AdjacencyView(Mapping):
+    """Read-only ``{city: {neighbor: distance}}`` view over the CSR core."""
+
+    def __init__(self, manager):
+        self._gm = manager
+
+    def __getitem__(self, city):
+        u = self._gm._ids[city]
+        off, to, w = self._gm._adjacency()
+        names = self._gm._names
+        return {names[to[k]]: w[k] for k in range(off[u], off[u + 1])}
+
+    def __contains__(self, city):
+        return city in self._gm._ids
+
+    def __iter__(self):
+        return iter(self._gm._names)
+
+    def __len__(self):
+        return len(self._gm._names)
+
+
+class _SpeedView(Mapping):
+    """Read-only ``{(city1, city2): speed}`` view over the per-edge speeds."""
+
+    def __init__(self, manager):
+        self._gm = manager
+
+    def __getitem__(self, key):
+        eid = self._gm._edge_id(*key)
+        if eid is None:
+            raise KeyError(key)
+        return self._gm._speed[eid]
+
+    def __iter__(self):
+        gm = self._gm
+        for e in range(len(gm._eu)):
+            a, b = gm._names[gm._eu[e]], gm._names[gm._ev[e]]
+            yield (a, b)
+            if a != b:
+                yield (b, a)
+
+    def __len__(self):
+        gm = self._gm
+        return sum(1 if u == v else 2 for u, v in zip(gm._eu, gm._ev))
+
+
+class _RouteView(Sequence):
+    """Lazy ``(city, neighbor, distance)`` sequence over the CSR core, one entry per road.
+
+    Iterating walks the adjacency without building a list; indexing or slicing
+    (e.g. ``routes[200:400]`` for one page) only materialises the rows asked for.
+    The view reads the adjacency as it was when taken: distance edits patch the
+    slot weights in place, so those are copied, while city names are append-only.
+    """
+
+    def __init__(self, manager):
+        self._names = manager._names
+        self._off, self._to, w = manager._adjacency()
+        self._w = w[:] if isinstance(w, array) else _owned(w)
+        self._len = len(manager._eu)
+        self._slots = self._offsets = None
+
+    def __len__(self):
+        return self._len
+
+    def __eq__(self, other):
+        # Compares like the list get_all_routes used to return.
+        if isinstance(other, (_RouteView, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __iter__(self):
+        off, to, w, names = self._off, self._to, self._w, self._names
+        for u in range(len(off) - 1):
+            for k in range(off[u], off[u + 1]):
+                v = to[k]
+                if v >= u:
+                    yield names[u], names[v], w[k]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._rows(index)
+        i = range(self._len)[index]
+        return self._rows(slice(i, i + 1))[0]
+
+    def _rows(self, index):
+        if self._slots is None:
+            # CSR slots that emit a route (each road once, from its lower-id end), in iteration order.
+            off = self._offsets = _as_numpy("q", self._off)
+            src = np.repeat(np.arange(len(off) - 1, dtype=np.int64), np.diff(off))
+            self._slots = np.flatnonzero(_as_numpy("i", self._to) >= src)
+        slots = self._slots[index]
+        u = np.searchsorted(self._offsets, slots, side="right") - 1
+        names, to, w = self._names, self._to, self._w
+        return [(names[a], names[to[k]], w[k]) for a, k in zip(u.tolist(), slots.tolist())]
 
 
 class GraphManager:
     def __init__(self):
-        self.graph = {}
-        self.original_graph = {}
-        self.road_speeds = {}
+        # City names are interned to dense integer ids; every algorithm runs on ids.
+        self._ids = {}
+        self._names = []
+        # Undirected edge list, one slot per road: endpoints, base weight and speed.
+        # The packed-endpoints -> edge id index is rebuilt on demand (see _edge_ids).
+        self._edge_index = {}
+        # Sorted (lookup key, id) pairs for prefix and fuzzy city search, built on
+        # first use; cities added afterwards wait in _name_pending until the next lookup.
+        self._name_index = None
+        self._name_pending = []
+        self._eu = array("i")
+        self._ev = array("i")
+        self._base_w = array("d")
+        self._base_speed = array("d")
+        # Named traffic scenarios over the base weights; None means free flow.
+        self._overlays = {}
+        self._scenario = None
+        self._regions = {}
+        self._node_region = {}
+        # Optional coordinates in radians (NaN when unknown) and the A* scale factor.
+        self._lat = array("d")
+        self._lon = array("d")
+        self._geo_scale = None
+        # ALT landmarks: requested count, chosen ids and one distance row per landmark.
+        self._landmark_count = 0
+        self._landmarks = None
+        self._landmark_dist = None
+        # Optional Contraction Hierarchies index; stale once weights change.
+        self._ch = None
+        self._ch_stale = False
+        # Minimum spanning forest as per-node {neighbour: edge id}, kept current by add_route.
+        self._mst = None
+        # Kruskal's weight-sorted edge order, valid for one graph version.
+        self._kruskal_order = None
+        # Time-dependent speed profiles: shared per-day multiplier shapes, the default
+        # shape and sparse per-road overrides (edge id -> shape id).
+        self._profile_names = {}
+        self._profile_shapes = []
+        self._road_profiles = {}
+        self._td_tables = None
+        # Per-CSR-slot travel times for time-budget isochrones, valid for one graph version.
+        self._time_w = None
+        # Itinerary stop distances for one graph version: {stop id: {stop id: km}}.
+        self._stop_table = None
+        self.add_speed_profile("flat", [(0.0, 1.0)])
+        self.add_speed_profile("rush_hour", [(6.5, 1.0), (7.0, 0.85), (10.0, 0.85), (10.5, 1.0),
+                                             (15.5, 1.0), (16.0, 0.85), (19.0, 0.85), (19.5, 1.0)])
+        self._default_profile = self._profile_names["rush_hour"]
+        # Shortest-path trees of watched ("hot") sources, repaired after edge changes.
+        self._hot = {}
+        self._hot_changes = set()
+        self._hot_stale = False
+        # Serialises callers that share one manager across threads; the active
+        # CancelToken (if any) is polled by the search loops.
+        self.lock = threading.RLock()
+        self._token = None
+        # Opt-in instrumentation: totals and hooks when enabled, and the stats of
+        # the query in flight. Loops only check ``_stats`` for None when disabled.
+        self._metrics = None
+        self._stats = None
+        # Query caches, keyed on the graph version so stale answers are never served.
+        self._version = 0
+        self._results = _LRUCache(1024)
+        self._trees = _LRUCache(32)
+        # Lazily built CSR adjacency (offsets, targets, edge ids), the two CSR slots
+        # of every edge, and free-flow per-slot weights.
+        self._csr = None
+        self._edge_slots = None
+        self._csr_w = None
+        # Drawing: node positions per layout kind, extended as cities are added, and
+        # the open figure (fig, ax, drawn key, highlight artists) for highlight redraws.
+        self._layouts = {}
+        self._figure = None
+
+    @property
+    def graph(self):
+        return _AdjacencyView(self)
+
+    @property
+    def road_speeds(self):
+        return _SpeedView(self)
+
+    @property
+    def _edge_ids(self):
+        """Packed endpoint pair -> edge id; built lazily so snapshot loads stay cheap."""
+        if self._edge_index is None:
+            eu, ev = _as_numpy("i", self._eu).astype(np.int64), _as_numpy("i", self._ev).astype(np.int64)
+            keys = (np.minimum(eu, ev) << 32) | np.maximum(eu, ev)
+            self._edge_index = dict(zip(keys.tolist(), range(len(keys))))
+        return self._edge_index
+
+    @property
+    def _w(self):
+        """Effective per-road weights under the active traffic scenario."""
+        overlay = self._overlays.get(self._scenario)
+        if overlay is None:
+            return self._base_w
+        if overlay.weights is None:
+            self._derive_overlay(overlay)
+        return overlay.weights
+
+    @property
+    def _speed(self):
+        overlay = self._overlays.get(self._scenario)
+        if overlay is None:
+            return self._base_speed
+        if overlay.speeds is None:
+            self._derive_overlay(overlay)
+        return overlay.speeds
+
+    # Graph core
+    def _intern(self, city):
+        node = self._ids.get(city)
+        if node is None:
+            node = len(self._names)
+            self._ids[city] = node
+            self._names.append(city)
+            if self._name_index is not None:
+                self._name_pending.append(node)
+            self._lat.append(math.nan)
+            self._lon.append(math.nan)
+            self._mark_node_added()
+        return node
+
+    @staticmethod
+    def _edge_key(u, v):
+        return (u << 32) | v if u <= v else (v << 32) | u
+
+    def _edge_id(self, city1, city2):
+        u, v = self._ids.get(city1), self._ids.get(city2)
+        if u is None or v is None:
+            return None
+        return self._edge_ids.get(self._edge_key(u, v))
+
+    def _endpoints(self, start, goal):
+        """Return (start_id, goal_id), or None if either city is unknown."""
+        s, t = self._ids.get(start), self._ids.get(goal)
+        if s is None or t is None:
+            return None
+        return s, t
+
+    def _mark_node_added(self):
+        """Invalidate per-node tables after a new, still isolated city was interned.
+
+        Distances between existing cities are unchanged, so the MST, landmark
+        tables and watched trees are kept; the new city is unreachable from all of them.
+        """
+        self._csr = self._edge_slots = self._csr_w = None
+        for overlay in self._overlays.values():
+            overlay.slot_weights = None
+        self._ch = None
+        if self._landmark_dist is not None:
+            self._landmark_dist = [_owned(row) for row in self._landmark_dist]
+            for row in self._landmark_dist:
+                row.append(math.inf)
+        for dist, prev in self._hot.values():
+            dist.append(math.inf)
+            prev.append(-1)
+        self._version += 1
+        self._results.clear()
+        self._trees.clear()
+
+    def _mark_topology_changed(self, eids=None):
+        self._csr = self._edge_slots = self._csr_w = None
+        for overlay in self._overlays.values():
+            overlay.drop_derived()
+        self._ch = None
+        self._mark_weights_changed(eids)
+
+    def _mark_weights_changed(self, eids=None):
+        """Invalidate everything derived from effective weights (callers refresh the weights).
+
+        ``eids`` lists the edges whose weight changed when that is known, letting
+        watched shortest-path trees be repaired instead of recomputed.
+        """
+        if self._hot:
+            if eids is None:
+                self._hot_stale = True
+            elif not self._hot_stale:
+                self._hot_changes.update(eids)
+        self._geo_scale = None
+        self._landmarks = None
+        self._landmark_dist = None
+        self._ch_stale = True
+        self._mst = None
+        self._version += 1
+        self._results.clear()
+        self._trees.clear()
+
+    def _build_csr(self):
+        n, m = len(self._names), len(self._eu)
+        eu, ev = _as_numpy("i", self._eu), _as_numpy("i", self._ev)
+        # Half-edge 2e is u->v and 2e+1 is v->u, so a stable sort by source keeps
+        # each city's neighbours in insertion order. Self-loops are stored once.
+        src = np.empty(2 * m, dtype=np.int32)
+        dst = np.empty(2 * m, dtype=np.int32)
+        src[0::2], src[1::2] = eu, ev
+        dst[0::2], dst[1::2] = ev, eu
+        keep = np.ones(2 * m, dtype=bool)
+        keep[1::2] = eu != ev
+        eids = np.repeat(np.arange(m, dtype=np.int32), 2)[keep]
+        src, dst = src[keep], dst[keep]
+        order = np.argsort(src, kind="stable")
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=offsets[1:])
+        slot_eids = eids[order]
+        self._csr = (_to_array("q", offsets), _to_array("i", dst[order]), _to_array("i", slot_eids))
+        # First and last CSR slot of every edge (equal for self-loops), for in-place patches.
+        slots = np.arange(len(slot_eids), dtype=np.int64)
+        first, last = np.empty(m, dtype=np.int64), np.empty(m, dtype=np.int64)
+        first[slot_eids[::-1]] = slots[::-1]
+        last[slot_eids] = slots
+        self._edge_slots = (_to_array("q", first), _to_array("q", last))
+
+    def _adjacency(self):
+        """Return (offsets, targets, weights) for the current graph, rebuilding if stale."""
+        if self._csr is None:
+            with self._phase("csr_build"):
+                self._build_csr()
+        off, to, eids = self._csr
+        overlay = self._overlays.get(self._scenario)
+        if overlay is None:
+            if self._csr_w is None:
+                with self._phase("slot_weights"):
+                    self._csr_w = self._gather_slots(self._base_w)
+            return off, to, self._csr_w
+        if overlay.slot_weights is None:
+            weights = self._w
+            with self._phase("slot_weights"):
+                overlay.slot_weights = self._gather_slots(weights)
+        return off, to, overlay.slot_weights
+
+    def _gather_slots(self, weights):
+        return _to_array("d", _as_numpy("d", weights)[_as_numpy("i", self._csr[2])])
+
+    def _path_names(self, ids):
+        names = self._names
+        return [names[i] for i in ids]
 
     def add_route(self, city1, city2, distance):
-        """Add a bidirectional route to both graph and original_graph."""
+        """Add a bidirectional route (re-adding a route resets it to the new distance)."""
         d = float(distance)
-        for g in (self.graph, self.original_graph):
-            if city1 not in g:
-                g[city1] = {}
-            if city2 not in g:
-                g[city2] = {}
-            g[city1][city2] = d
-            g[city2][city1] = d
-
-        if d < 30:
-            speed = 40.0   
-        elif d < 100:
-            speed = 60.0   
+        u, v = self._intern(city1), self._intern(city2)
+        speed = _default_speed(d)
+        key = self._edge_key(u, v)
+        eid = self._edge_ids.get(key)
+        mst = self._mst
+        if eid is None:
+            eid = self._edge_ids[key] = len(self._eu)
+            self._eu.append(u)
+            self._ev.append(v)
+            self._base_w.append(d)
+            self._base_speed.append(speed)
+            old = None
+            self._mark_topology_changed((eid,))
         else:
-            speed = 90.0   
+            old = self._w[eid]
+            self._base_w[eid] = d
+            self._base_speed[eid] = speed
+            self._set_slots(self._csr_w, eid, d)
+            for overlay in self._overlays.values():
+                self._patch_overlay(overlay, (eid,))
+            self._mark_weights_changed((eid,))
+        if mst is not None:
+            self._mst = mst
+            self._mst_update(eid, old)
 
-        self.road_speeds[(city1, city2)] = speed
-        self.road_speeds[(city2, city1)] = speed
+    def add_city(self, city, lat=None, lon=None):
+        """Register a city, optionally with its latitude/longitude in degrees."""
+        node = self._intern(city)
+        if lat is not None and lon is not None:
+            self._lat[node] = math.radians(float(lat))
+            self._lon[node] = math.radians(float(lon))
+            self._geo_scale = None
+        return node
 
     def get_all_routes(self):
-        """Return list of unique routes as (city, neighbor, distance)."""
-        routes = []
-        seen = set()
-        for city in self.graph:
-            for neighbor, dist in self.graph[city].items():
-                if (neighbor, city) in seen:
+        """Return every road once as (city, neighbor, distance), as a lazy sequence.
+
+        The result supports len(), iteration and slicing into pages without
+        copying the network into a list; see _RouteView.
+        """
+        return _RouteView(self)
+
+    # City lookup
+    def lookup_city(self, name):
+        """Return the city matching ``name`` ignoring case and extra spaces, or None."""
+        if name in self._ids:
+            return name
+        key = _city_key(name)
+        index = self._city_index()
+        i = bisect.bisect_left(index, (key,))
+        if i < len(index) and index[i][0] == key:
+            return self._names[index[i][1]]
+        return None
+
+    def complete_city(self, prefix, limit=10):
+        """Return up to ``limit`` cities whose name starts with ``prefix`` (case-insensitive), sorted."""
+        key = _city_key(prefix)
+        index = self._city_index()
+        out = []
+        for i in range(bisect.bisect_left(index, (key,)), len(index)):
+            if len(out) >= limit or not index[i][0].startswith(key):
+                break
+            out.append(self._names[index[i][1]])
+        return out
+
+    def suggest_cities(self, name, limit=5, max_edits=2):
+        """Return up to ``limit`` cities within ``max_edits`` edits of ``name``, closest first.
+
+        Edit distance is Levenshtein on the lookup keys. Keys are walked in
+        sorted order like a trie: the distance rows of a shared prefix are
+        reused, and a whole block of keys is skipped once its prefix is
+        already more than ``max_edits`` away.
+        """
+        query = _city_key(name)
+        index = self._city_index()
+        width = len(query)
+        rows = [list(range(width + 1))]  # rows[j]: distances from the first j characters of `prev`
+        prev, found, i = "", [], 0
+        while i < len(index):
+            key, node = index[i]
+            common = 0
+            limit_common = min(len(prev), len(key), len(rows) - 1)
+            while common < limit_common and prev[common] == key[common]:
+                common += 1
+            del rows[common + 1:]
+            for j in range(common, len(key)):
+                ch, above = key[j], rows[-1]
+                row = [above[0] + 1]
+                for c in range(1, width + 1):
+                    row.append(min(row[c - 1] + 1, above[c] + 1, above[c - 1] + (query[c - 1] != ch)))
+                rows.append(row)
+                if min(row) > max_edits:
+                    # Nothing starting with key[:j + 1] can match; jump past that block.
+                    stem = key[:j + 1]
+                    if ord(stem[-1]) < 0x10FFFF:
+                        i = bisect.bisect_left(index, (stem[:-1] + chr(ord(stem[-1]) + 1),), i + 1)
+                    else:
+                        i += 1
+                    prev = stem
+                    break
+            else:
+                if rows[-1][width] <= max_edits:
+                    found.append((rows[-1][width], key, node))
+                prev = key
+                i += 1
+        found.sort()
+        return [self._names[node] for _, _, node in found[:limit]]
+
+    def _city_index(self):
+        """Return the sorted (key, id) list, folding in cities added since the last lookup."""
+        index = self._name_index
+        if index is None:
+            index = self._name_index = sorted((_city_key(name), node) for node, name in enumerate(self._names))
+            self._name_pending = []
+        elif self._name_pending:
+            added = [(_city_key(self._names[node]), node) for node in self._name_pending]
+            if len(added) <= 32:
+                for item in added:
+                    bisect.insort(index, item)
+            else:
+                # Two sorted runs: Timsort merges them in linear time.
+                added.sort()
+                index.extend(added)
+                index.sort()
+            self._name_pending = []
+        return index
+
+    # Bulk loading
+    def load_routes(self, source, delimiter=None, chunk_size=65536, progress=None):
+        """Load many routes from a CSV/TSV file or an iterable of rows in one bulk pass.
+
+        ``source`` is a path, an iterable of text lines, or an iterable of
+        (city1, city2, distance) sequences. Rows are read ``chunk_size`` at a
+        time and only their city names are interned on the way; the edges are
+        deduplicated and merged in one bulk pass at the end. An edge keeps the
+        position of its first row and the distance of its last, exactly as
+        repeated add_route calls would. An optional header naming the columns
+        (from/to/distance, ...) is honoured and malformed rows are skipped.
+        ``progress(rows, fraction)`` is called after each chunk (fraction is
+        None when the total is unknown). Returns a dict of counts.
+        """
+        stats = {"rows": 0, "added": 0, "updated": 0, "duplicates": 0, "skipped": 0, "cities": len(self._names)}
+        token = self._token
+        columns = None  # column order once the first row has been looked at
+        parts = []
+        try:
+            for rows, fraction in self._route_chunks(source, delimiter, chunk_size):
+                if token is not None:
+                    if token.cancelled:
+                        raise QueryCancelled()
+                    if fraction is not None:
+                        token.progress = fraction
+                columns, part = self._parse_chunk(rows, stats, columns)
+                parts.append(part)
+                if progress is not None:
+                    progress(stats["rows"], fraction)
+        finally:
+            # Rows read so far are merged even if a later chunk fails or is cancelled,
+            # so no interned city is left without its roads.
+            if parts:
+                self._merge_routes(*(np.concatenate(cols) for cols in zip(*parts)), stats)
+        stats["cities"] = len(self._names) - stats["cities"]
+        return stats
+
+    def _route_chunks(self, source, delimiter, chunk_size):
+        """Yield (rows, fraction_done) chunks from a path, text lines or row tuples."""
+        if isinstance(source, (str, os.PathLike)):
+            size = os.path.getsize(source) or 1
+            with open(source, "rb") as f:
+                first = f.readline()
+                if first.startswith(b"\xef\xbb\xbf"):
+                    first = first[3:]
+                if delimiter is None:
+                    delimiter = "\t" if str(source).lower().endswith(".tsv") or b"\t" in first else ","
+                data = first
+                while True:
+                    # Whole lines up to roughly the byte budget; decoding a block at a time is cheap.
+                    data += b"".join(f.readlines(chunk_size * 32))
+                    if not data:
+                        return
+                    lines = data.decode("utf-8").splitlines(keepends=True)
+                    yield csv.reader(lines, delimiter=delimiter), min(1.0, f.tell() / size)
+                    data = b""
+        it = iter(source)
+        while True:
+            chunk = list(itertools.islice(it, chunk_size))
+            if not chunk:
+                return
+            if isinstance(chunk[0], str):
+                if delimiter is None:
+                    delimiter = "\t" if "\t" in chunk[0] else ","
+                chunk = csv.reader(chunk, delimiter=delimiter)
+            yield chunk, None
+
+    def _parse_chunk(self, rows, stats, columns):
+        """Intern one chunk's cities; returns (columns, (u, v, distance) arrays)."""
+        rows = [row for row in rows if row]
+        empty = (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32), np.empty(0))
+        if not rows:
+            return columns, empty
+        if columns is None:
+            columns = self._route_header(rows[0])
+            if columns is None:
+                columns = (0, 1, 2)
+            else:
+                rows = rows[1:]
+        ca, cb, cd = columns
+        # Column-wise fast path; fall back to row-by-row checks if anything is malformed.
+        try:
+            starts = [str(row[ca]).strip() for row in rows]
+            ends = [str(row[cb]).strip() for row in rows]
+            d = np.array([row[cd] for row in rows], dtype=np.float64)
+            clean = all(starts) and all(ends) and bool(np.isfinite(d).all())
+        except (IndexError, ValueError, TypeError):
+            clean = False
+        if not clean:
+            starts, ends, ds = [], [], []
+            for row in rows:
+                try:
+                    a, b, w = str(row[ca]).strip(), str(row[cb]).strip(), float(row[cd])
+                except (IndexError, ValueError, TypeError):
+                    stats["skipped"] += 1
+                    continue
+                if not a or not b or not math.isfinite(w):
+                    stats["skipped"] += 1
                     continue
-                routes.append((city, neighbor, dist))
-                seen.add((city, neighbor))
-        return routes
+                starts.append(a)
+                ends.append(b)
+                ds.append(w)
+            d = np.array(ds, dtype=np.float64)
+
+        # Intern in row order so new cities get the ids repeated add_route calls would give them.
+        ids, intern = self._ids, self._intern
+        us, vs = [], []
+        for a, b in zip(starts, ends):
+            u = ids.get(a)
+            if u is None:
+                u = intern(a)
+            v = ids.get(b)
+            if v is None:
+                v = intern(b)
+            us.append(u)
+            vs.append(v)
+        if not us:
+            return columns, empty
+        stats["rows"] += len(us)
+        return columns, (np.array(us, dtype=np.int32), np.array(vs, dtype=np.int32), d)
+
+    def _merge_routes(self, u, v, d, stats):
+        """Add or update many edges at once, then invalidate derived state a single time."""
+        if not len(u):
+            return
+        u, v = u.astype(np.int64), v.astype(np.int64)
+        keys = (np.minimum(u, v) << 32) | np.maximum(u, v)
+        # One entry per edge: placed at its first row, carrying its last row's distance.
+        uniq, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        last = np.zeros(len(uniq), dtype=np.int64)
+        last[inverse] = np.arange(len(keys))
+        order = np.argsort(first, kind="stable")
+        uniq, first, last = uniq[order], first[order], last[order]
+        stats["duplicates"] = len(keys) - len(uniq)
+        dist, speed = d[last], _default_speeds(d[last])
+
+        edge_ids = self._edge_ids
+        if edge_ids:
+            existing = np.array([edge_ids.get(k, -1) for k in uniq.tolist()], dtype=np.int64)
+        else:
+            existing = np.full(len(uniq), -1, dtype=np.int64)
+        new = existing < 0
+        for eid, w, sp in zip(existing[~new].tolist(), dist[~new].tolist(), speed[~new].tolist()):
+            self._base_w[eid] = w
+            self._base_speed[eid] = sp
+        stats["updated"] = int((~new).sum())
+
+        added = int(new.sum())
+        if added:
+            m = len(self._eu)
+            edge_ids.update(zip(uniq[new].tolist(), range(m, m + added)))
+            self._eu.extend(_to_array("i", u[first[new]]))
+            self._ev.extend(_to_array("i", v[first[new]]))
+            self._base_w.extend(_to_array("d", dist[new]))
+            self._base_speed.extend(_to_array("d", speed[new]))
+            stats["added"] = added
+            self._mark_topology_changed()
+        elif stats["updated"]:
+            self._csr_w = None
+            for overlay in self._overlays.values():
+                overlay.drop_derived()
+            self._mark_weights_changed()
+
+    @staticmethod
+    def _route_header(row):
+        """Return the column order if ``row`` is a header naming all three columns, else None."""
+        names = [str(c).strip().lower() for c in row]
+        columns = [next((i for i, name in enumerate(names) if name in aliases), None) for aliases in _ROUTE_COLUMNS]
+        # Anything else is a data row, and skipped like any other if malformed.
+        return tuple(columns) if None not in columns else None
+
+    # Snapshots
+    def save_snapshot(self, path, landmarks=True, mst=True):
+        """Write the network to ``path`` in the binary snapshot format.
+
+        The file holds the city-name table, the edge arrays and the free-flow
+        CSR adjacency as raw native arrays, plus landmark tables and the MST
+        when they are current, computed at free flow and requested. Traffic scenarios and speed
+        profiles are not part of a snapshot. The file is written beside
+        ``path`` and renamed into place.
+        """
+        if self._csr is None:
+            self._build_csr()
+        if self._csr_w is None:
+            self._csr_w = self._gather_slots(self._base_w)
+        encoded = [name.encode("utf-8") for name in self._names]
+        name_off = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(np.array([len(b) for b in encoded], dtype=np.int64), out=name_off[1:])
+        sections = [("names", b"".join(encoded)), ("name_off", name_off),
+                    ("eu", self._eu), ("ev", self._ev), ("weight", self._base_w), ("speed", self._base_speed),
+                    ("csr_off", self._csr[0]), ("csr_to", self._csr[1]), ("csr_eid", self._csr[2]),
+                    ("csr_w", self._csr_w), ("slot_1st", self._edge_slots[0]), ("slot_2nd", self._edge_slots[1])]
+        if not all(math.isnan(x) for x in self._lat):
+            sections += [("lat", self._lat), ("lon", self._lon)]
+        # Landmark tables and the MST follow the effective weights, so they are
+        # only stored when they were computed at free flow like the rest of the file.
+        free_flow = self._overlays.get(self._scenario) is None
+        if landmarks and free_flow and self._landmark_dist is not None:
+            n = len(self._names)
+            rows = [(lm, row) for lm, row in zip(self._landmarks, self._landmark_dist) if len(row) == n]
+            if rows:
+                sections += [("lm_ids", array("i", [lm for lm, _ in rows])),
+                             ("lm_dist", b"".join(bytes(row) for _, row in rows))]
+        if mst and free_flow and self._mst is not None:
+            # Per-city tree edges in dict order, so traversals come back identical.
+            mst_off = array("q", [0])
+            for nbrs in self._mst:
+                mst_off.append(mst_off[-1] + len(nbrs))
+            sections += [("mst_off", mst_off), ("mst_eid", array("i", [e for nbrs in self._mst for e in nbrs.values()]))]
+
+        blobs = [memoryview(data).cast("B") for _, data in sections]
+        table_end = _SNAPSHOT_HEADER.size + _SNAPSHOT_ENTRY.size * len(sections)
+        offsets, pos = [], table_end
+        for blob in blobs:
+            pos += -pos % 8  # keep every array 8-byte aligned
+            offsets.append(pos)
+            pos += blob.nbytes
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(_SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, sys.byteorder == "little",
+                                          len(self._names), len(self._eu), len(sections)))
+            for (name, _), offset, blob in zip(sections, offsets, blobs):
+                f.write(_SNAPSHOT_ENTRY.pack(name.encode("ascii"), offset, blob.nbytes))
+            for offset, blob in zip(offsets, blobs):
+                f.write(bytes(offset - f.tell()))
+                f.write(blob)
+        os.replace(tmp, path)
+        return True
+
+    @classmethod
+    def load_snapshot(cls, path):
+        """Return a GraphManager backed by the snapshot at ``path``, or None if it isn't a valid one.
+
+        The file is memory-mapped copy-on-write: the CSR adjacency, its slot
+        weights and any landmark tables are used straight from the mapping, so
+        startup does no parsing and processes loading the same file share its
+        pages. Edge arrays are copied out since add_route appends to them.
+        """
+        with open(path, "rb") as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+            except ValueError:  # empty file
+                return None
+        if len(mm) < _SNAPSHOT_HEADER.size:
+            return None
+        magic, version, little, n, m, count = _SNAPSHOT_HEADER.unpack_from(mm, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or bool(little) != (sys.byteorder == "little"):
+            return None
+        view = memoryview(mm)
+        sections = {}
+        for i in range(count):
+            name, offset, size = _SNAPSHOT_ENTRY.unpack_from(mm, _SNAPSHOT_HEADER.size + i * _SNAPSHOT_ENTRY.size)
+            name = name.rstrip(b"\0").decode("ascii")
+            typecode = _SNAPSHOT_TYPES.get(name)
+            if typecode is None:
+                continue  # a section this version doesn't know about
+            if offset + size > len(mm) or size % array(typecode).itemsize:
+                return None
+            sections[name] = view[offset:offset + size].cast(typecode)
+
+        def sized(name, count):
+            return name in sections and len(sections[name]) == count
+
+        # Every section must agree with the header counts before anything indexes into it.
+        if not ("names" in sections and sized("name_off", n + 1) and sized("csr_off", n + 1)
+                and all(sized(name, m) for name in ("eu", "ev", "weight", "speed", "slot_1st", "slot_2nd"))):
+            return None
+        slots = sections["csr_off"][n]
+        if sections["name_off"][n] != len(sections["names"]) or slots > 2 * m:
+            return None
+        if not all(sized(name, slots) for name in ("csr_to", "csr_eid", "csr_w")):
+            return None
+        if any((first in sections) != (second in sections)
+               for first, second in (("lat", "lon"), ("lm_ids", "lm_dist"), ("mst_off", "mst_eid"))):
+            return None
+        if "lat" in sections and not (sized("lat", n) and sized("lon", n)):
+            return None
+        if "lm_ids" in sections and not sized("lm_dist", len(sections["lm_ids"]) * n):
+            return None
+        if "mst_off" in sections and not (sized("mst_off", n + 1) and sized("mst_eid", sections["mst_off"][n])):
+            return None
+
+        g = cls()
+        blob, name_off = bytes(sections["names"]), sections["name_off"]
+        try:
+            g._names = [blob[name_off[i]:name_off[i + 1]].decode("utf-8") for i in range(n)]
+        except UnicodeDecodeError:
+            return None
+        g._ids = dict(zip(g._names, range(n)))
+        g._eu, g._ev = _owned(sections["eu"]), _owned(sections["ev"])
+        g._base_w, g._base_speed = _owned(sections["weight"]), _owned(sections["speed"])
+        g._edge_index = None
+        if "lat" in sections:
+            g._lat, g._lon = _owned(sections["lat"]), _owned(sections["lon"])
+        else:
+            g._lat, g._lon = array("d", [math.nan]) * n, array("d", [math.nan]) * n
+        g._csr = (sections["csr_off"], sections["csr_to"], sections["csr_eid"])
+        g._edge_slots = (sections["slot_1st"], sections["slot_2nd"])
+        g._csr_w = sections["csr_w"]
+        if "lm_ids" in sections:
+            g._landmarks = sections["lm_ids"].tolist()
+            dist = sections["lm_dist"]
+            g._landmark_dist = [dist[i * n:(i + 1) * n] for i in range(len(g._landmarks))]
+            g._landmark_count = len(g._landmarks)
+        if "mst_off" in sections:
+            mst_off, mst_eid = sections["mst_off"], sections["mst_eid"].tolist()
+            eu, ev = g._eu, g._ev
+            g._mst = [{eu[e] + ev[e] - u: e for e in mst_eid[mst_off[u]:mst_off[u + 1]]}
+                      for u in range(len(mst_off) - 1)]
+        return g
+
+    def clone(self):
+        """Return an independent manager over the same network, e.g. to update and swap in.
+
+        Everything the clone could patch in place is duplicated; derived data that
+        is only ever replaced (CSR layout, landmark rows, time tables) is shared.
+        The clone starts with empty caches and reports to the same metrics. Hold
+        ``lock`` while cloning if other threads are querying this manager.
+        """
+        g = object.__new__(type(self))
+        g.__dict__.update(self.__dict__)
+        g._ids, g._names = dict(self._ids), list(self._names)
+        g._name_index = None if self._name_index is None else list(self._name_index)
+        g._name_pending = list(self._name_pending)
+        g._edge_index = None if self._edge_index is None else dict(self._edge_index)
+        g._eu, g._ev = self._eu[:], self._ev[:]
+        g._base_w, g._base_speed = self._base_w[:], self._base_speed[:]
+        g._lat, g._lon = self._lat[:], self._lon[:]
+        g._overlays = {name: overlay.copy() for name, overlay in self._overlays.items()}
+        g._regions, g._node_region = dict(self._regions), dict(self._node_region)
+        g._ch = copy.copy(self._ch)
+        g._mst = None if self._mst is None else [dict(nbrs) for nbrs in self._mst]
+        g._profile_names, g._profile_shapes = dict(self._profile_names), list(self._profile_shapes)
+        g._road_profiles = dict(self._road_profiles)
+        g._hot = {s: (list(dist), list(prev)) for s, (dist, prev) in self._hot.items()}
+        g._hot_changes = set(self._hot_changes)
+        if self._stop_table is not None:
+            g._stop_table = (self._stop_table[0], dict(self._stop_table[1]))
+        g.lock = threading.RLock()
+        g._token = g._stats = None
+        g._results, g._trees = _LRUCache(self._results.maxsize), _LRUCache(self._trees.maxsize)
+        if self._csr_w is not None:
+            g._csr_w = self._csr_w[:] if isinstance(self._csr_w, array) else _owned(self._csr_w)
+        g._layouts, g._figure = {}, None
+        return g
+
+    @contextmanager
+    def cancellable(self, token):
+        """Run the enclosed calls under ``token``; they raise QueryCancelled once it is cancelled."""
+        previous, self._token = self._token, token
+        try:
+            yield token
+        finally:
+            self._token = previous
+
+    def _token_tick(self):
+        token, n = self._token, len(self._names)
+        return None if token is None else (lambda: token.tick(n))
+
+    # Instrumentation
+    def enable_metrics(self, enabled=True):
+        """Turn per-query instrumentation on or off (off drops totals and hooks)."""
+        if not enabled:
+            self._metrics = None
+        elif self._metrics is None:
+            self._metrics = _Metrics()
+
+    def add_metrics_hook(self, hook):
+        """Call ``hook(stats)`` with the QueryStats of every finished query; enables metrics."""
+        self.enable_metrics()
+        self._metrics.hooks.append(hook)
+
+    def remove_metrics_hook(self, hook):
+        if self._metrics is not None and hook in self._metrics.hooks:
+            self._metrics.hooks.remove(hook)
+
+    def metrics(self):
+        """Snapshot of per-algorithm totals, the last query's stats and cache state."""
+        m = self._metrics
+        return {"enabled": m is not None,
+                "totals": {} if m is None else {name: dict(t) for name, t in m.totals.items()},
+                "last": None if m is None or m.last is None else m.last.as_dict(),
+                "cache": self.cache_stats()}
+
+    def last_query_stats(self):
+        m = self._metrics
+        return None if m is None else m.last
+
+    def reset_metrics(self):
+        if self._metrics is not None:
+            self._metrics.totals.clear()
+            self._metrics.last = None
+
+    @contextmanager
+    def _phase(self, name):
+        """Charge the enclosed time to phase ``name`` of the query being instrumented."""
+        stats = self._stats
+        if stats is None:
+            yield
+            return
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats.phases[name] = stats.phases.get(name, 0.0) + time.perf_counter() - t0
+
+    # Query cache
+    @property
+    def version(self):
+        """Counter bumped by every change to routes or weights."""
+        return self._version
+
+    def cache_stats(self):
+        hits = self._results.hits + self._trees.hits
+        misses = self._results.misses + self._trees.misses
+        return {"hits": hits, "misses": misses, "results": len(self._results),
+                "trees": len(self._trees), "version": self._version}
+
+    def clear_caches(self):
+        """Drop cached answers, search trees and MST state (e.g. for cold-start timings)."""
+        self._results.clear()
+        self._trees.clear()
+        self._mst = None
+        self._kruskal_order = None
+
+    def set_cache_size(self, results=1024, trees=32):
+        """Bound the number of cached answers and of cached shortest-path trees."""
+        self._results.maxsize = results
+        self._trees.maxsize = trees
+
+    def _cached(self, algorithm, start, goal, compute):
+        key = (algorithm, start, goal, self._version)
+        result = self._results.get(key, _MISSING)
+        if result is _MISSING:
+            result = compute(start, goal)
+            self._results.put(key, result)
+        # Hand out fresh path lists so callers can't corrupt cached entries.
+        if isinstance(result, tuple):
+            return (list(result[0]) if result[0] else result[0]), result[1]
+        return list(result) if result else result
 
     # Dijkstra
-    def dijkstra(self, start, goal):
-        """Return (path_list, total_distance) or (None, None) if unreachable."""
-        if start not in self.graph or goal not in self.graph:
+    @_instrumented
+    def dijkstra(self, start, goal, bidirectional=False):
+        """Return (path_list, total_distance) or (None, None) if unreachable.
+
+        With ``bidirectional=True`` the search grows from both ends and stops
+        once the two frontiers meet.
+        """
+        ends = self._endpoints(start, goal)
+        if ends is None:
+            return None, None
+        s, t = ends
+        if bidirectional:
+            return self._cached("dijkstra_bidirectional", start, goal,
+                                lambda *_: self._bidirectional_dijkstra(s, t))
+
+        if t in self._hot and s not in self._hot:
+            path, dist = self.dijkstra(goal, start)
+            return (path[::-1] if path else path), dist
+        if s in self._hot:
+            dist, prev = self._hot_tree(s)
+        else:
+            dist, prev = self._dijkstra_ids(s, t)
+        if dist[t] == float("inf"):
             return None, None
+        return self._path_names(self._unwind(prev, t)), round(dist[t], 2)
+
+    def _dijkstra_ids(self, s, t=-1):
+        """Dijkstra from id ``s`` until ``t`` settles (or everything does); return (dist, prev).
+
+        Search trees are cached per source and resumed on later calls, so repeat
+        queries from the same city only pay for the path walk.
+        """
+        tree = self._search_tree(s)
+        if t < 0 or not tree.done[t]:
+            self._grow_tree(tree, t)
+        return tree.dist, tree.prev
 
-        pq = [(0.0, start, [])]
-        visited = set()
+    def _search_tree(self, s):
+        key = ("tree", s, self._version)
+        tree = self._trees.get(key)
+        if tree is None:
+            tree = _SearchTree(len(self._names), s)
+            self._trees.put(key, tree)
+        return tree
 
-        while pq:
-            cost, node, path = heapq.heappop(pq)
-            if node in visited:
+    def _grow_tree(self, tree, t):
+        off, to, wt = self._adjacency()
+        dist, prev, done, heap = tree.dist, tree.prev, tree.done, tree.heap
+        pop, push = heapq.heappop, heapq.heappush
+        token, stats, n = self._token, self._stats, len(dist)
+
+        while heap:
+            if token is not None:
+                token.tick(n)
+            d, u = pop(heap)
+            if done[u]:
                 continue
-            visited.add(node)
-            path = path + [node]
+            done[u] = 1
+            if stats is not None:
+                stats.visit(len(heap) + 1, off[u + 1] - off[u])
+            for k in range(off[u], off[u + 1]):
+                v = to[k]
+                nd = d + wt[k]
+                if nd < dist[v]:
+                    dist[v] = nd
+                    prev[v] = u
+                    push(heap, (nd, v))
+            if u == t:
+                break
 
-            if node == goal:
-                return path, round(cost, 2)
+    def _bidirectional_dijkstra(self, s, t):
+        if s == t:
+            return [self._names[s]], 0.0
+        off, to, wt = self._adjacency()
+        n = len(self._names)
+        inf = float("inf")
+        # Index 0 is the forward search from s, index 1 the backward search from t;
+        # roads are bidirectional so both sides walk the same adjacency.
+        dist = ([inf] * n, [inf] * n)
+        prev = ([-1] * n, [-1] * n)
+        done = (bytearray(n), bytearray(n))
+        heaps = ([(0.0, s)], [(0.0, t)])
+        dist[0][s] = dist[1][t] = 0.0
+        best, meet = inf, -1
+        pop, push = heapq.heappop, heapq.heappush
+        token, stats = self._token, self._stats
 
-            for neigh, w in self.graph[node].items():
-                if neigh not in visited:
-                    heapq.heappush(pq, (cost + w, neigh, path))
+        while heaps[0] and heaps[1]:
+            if heaps[0][0][0] + heaps[1][0][0] >= best:
+                break
+            if token is not None:
+                token.tick(n)
+            side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+            heap, own, other, pred, settled = heaps[side], dist[side], dist[1 - side], prev[side], done[side]
+            d, u = pop(heap)
+            if settled[u]:
+                continue
+            settled[u] = 1
+            if stats is not None:
+                stats.visit(len(heaps[0]) + len(heaps[1]) + 1, off[u + 1] - off[u])
+            for k in range(off[u], off[u + 1]):
+                v = to[k]
+                nd = d + wt[k]
+                if nd < own[v]:
+                    own[v] = nd
+                    pred[v] = u
+                    push(heap, (nd, v))
+                if own[v] + other[v] < best:
+                    best, meet = own[v] + other[v], v
 
-        return None, None
+        if meet < 0:
+            return None, None
+        path = self._unwind(prev[0], meet)
+        path.extend(reversed(self._unwind(prev[1], meet)[:-1]))
+        return self._path_names(path), round(self._path_length(path), 2)
+
+    def _path_length(self, ids):
+        """Sum the road weights along ``ids`` from the start, in the order dijkstra adds them.
+
+        Searches that meet in the middle or go through shortcuts add the same
+        weights in another order; re-summing keeps their rounded result identical.
+        """
+        weights, index, key = self._w, self._edge_ids, self._edge_key
+        total = 0.0
+        for u, v in zip(ids, ids[1:]):
+            total += weights[index[key(u, v)]]
+        return total
+
+    @staticmethod
+    def _unwind(prev, node):
+        """Follow predecessor links back from ``node``; return ids in source-first order."""
+        path = []
+        while node != -1:
+            path.append(node)
+            node = prev[node]
+        path.reverse()
+        return path
+
+    # Dynamic shortest-path trees
+    def watch_source(self, city):
+        """Keep a full shortest-path tree for ``city`` and repair it as weights change.
+
+        Queries from (or to) a watched city are answered from the tree; after
+        add_route or per-road/regional traffic updates only the affected
+        subtrees are recomputed. Returns False for unknown cities.
+        """
+        s = self._ids.get(city)
+        if s is None:
+            return False
+        if s not in self._hot:
+            # Settle pending changes first so they aren't replayed on the new tree.
+            self._hot_tree(s)
+            dist, prev = self._dijkstra_ids(s)
+            self._hot[s] = (list(dist), list(prev))
+        return True
+
+    def unwatch_source(self, city):
+        self._hot.pop(self._ids.get(city), None)
+        if not self._hot:
+            self._hot_changes.clear()
+            self._hot_stale = False
+
+    def hot_sources(self):
+        return self._path_names(self._hot)
+
+    def _hot_tree(self, s):
+        """Return (dist, prev) for watched source ``s`` after applying pending changes."""
+        if self._hot_stale:
+            for src in self._hot:
+                dist, prev = self._dijkstra_ids(src)
+                self._hot[src] = (list(dist), list(prev))
+            self._hot_stale = False
+            self._hot_changes.clear()
+        elif self._hot_changes:
+            changed = list(self._hot_changes)
+            self._hot_changes.clear()
+            with self._phase("hot_repair"):
+                for dist, prev in self._hot.values():
+                    self._repair_tree(dist, prev, changed)
+        return self._hot.get(s)
+
+    def _repair_tree(self, dist, prev, changed):
+        """Ramalingam-Reps style batch update of one shortest-path tree, in place.
+
+        Tree edges that got heavier orphan their subtree; those nodes are reset
+        and reseeded from unaffected neighbours. Edges that got lighter seed
+        improvements at their endpoints. A Dijkstra pass from these seeds then
+        only touches nodes whose distance actually changes.
+        """
+        off, to, wt = self._adjacency()
+        first = self._edge_slots[0]
+        eu, ev = self._eu, self._ev
+        n = len(self._names)
+        inf = float("inf")
+
+        roots = []
+        for e in changed:
+            u, v, w = eu[e], ev[e], wt[first[e]]
+            if prev[v] == u and dist[u] + w > dist[v]:
+                roots.append(v)
+            elif prev[u] == v and dist[v] + w > dist[u]:
+                roots.append(u)
+
+        affected = bytearray(n)
+        orphans = []
+        for r in roots:
+            if not affected[r]:
+                affected[r] = 1
+                orphans.append(r)
+        i = 0
+        while i < len(orphans):
+            x = orphans[i]
+            i += 1
+            for k in range(off[x], off[x + 1]):
+                y = to[k]
+                if prev[y] == x and not affected[y]:
+                    affected[y] = 1
+                    orphans.append(y)
+
+        heap = []
+        for x in orphans:
+            dist[x], prev[x] = inf, -1
+        for x in orphans:
+            for k in range(off[x], off[x + 1]):
+                y = to[k]
+                if not affected[y] and dist[y] + wt[k] < dist[x]:
+                    dist[x], prev[x] = dist[y] + wt[k], y
+            if dist[x] < inf:
+                heap.append((dist[x], x))
+        for e in changed:
+            u, v, w = eu[e], ev[e], wt[first[e]]
+            for a, b in ((u, v), (v, u)):
+                if dist[a] + w < dist[b]:
+                    dist[b], prev[b] = dist[a] + w, a
+                    heap.append((dist[b], b))
+        heapq.heapify(heap)
+
+        pop, push = heapq.heappop, heapq.heappush
+        stats = self._stats
+        while heap:
+            d, x = pop(heap)
+            if d > dist[x]:
+                continue
+            if stats is not None:
+                stats.visit(len(heap) + 1, off[x + 1] - off[x])
+            for k in range(off[x], off[x + 1]):
+                y = to[k]
+                nd = d + wt[k]
+                if nd < dist[y]:
+                    dist[y], prev[y] = nd, x
+                    push(heap, (nd, y))
+
+    # Distance matrix
+    @_instrumented
+    def distance_matrix(self, sources, targets=None, processes=None):
+        """Return a len(sources) x len(targets) NumPy array of shortest distances (km).
+
+        One Dijkstra runs per source and stops as soon as every target has settled.
+        Unknown or unreachable cities give ``inf``. With ``processes`` > 1 the
+        sources are split across a process pool that receives the CSR arrays once.
+        """
+        sources = list(sources)
+        targets = sources if targets is None else list(targets)
+        out = np.full((len(sources), len(targets)), np.inf)
+        src = [self._ids.get(c, -1) for c in sources]
+        cols = [j for j, c in enumerate(targets) if c in self._ids]
+        dst = [self._ids[targets[j]] for j in cols]
+        rows = [i for i, s in enumerate(src) if s >= 0]
+        if not rows or not dst:
+            return out
+
+        if processes and processes > 1 and len(rows) > 1:
+            off, to, wt = self._adjacency()
+            chunk = max(1, -(-len(rows) // (processes * 4)))
+            batches = [rows[i:i + chunk] for i in range(0, len(rows), chunk)]
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_matrix_worker,
+                                     initargs=(_owned(off), _owned(to), _owned(wt), len(self._names))) as pool:
+                futures = [pool.submit(_matrix_rows, [src[i] for i in batch], dst) for batch in batches]
+                for batch, future in zip(batches, futures):
+                    out[np.ix_(batch, cols)] = future.result()
+        else:
+            for done, i in enumerate(rows):
+                if self._token is not None:
+                    self._token.progress = done / len(rows)
+                tree = self._search_tree(src[i])
+                for t in dst:
+                    if not tree.done[t]:
+                        self._grow_tree(tree, t)
+                dist = tree.dist
+                out[i, cols] = [dist[t] for t in dst]
+        return np.round(out, 2)
+
+    # Isochrones
+    @_instrumented
+    def isochrone(self, sources, budgets, by="distance"):
+        """Return {budget: {city: cost}} for the cities reachable within each budget.
+
+        ``sources`` is a city or a list of cities (costs are to the nearest one)
+        and ``budgets`` a number or a list: km, or hours with ``by="time"``, where
+        each road takes its length over its road_speeds entry. A single Dijkstra
+        that stops at the largest budget answers all of them. Returns None if no
+        source is a known city.
+        """
+        search = self._bounded_search(sources, budgets, by)
+        if search is None:
+            return None
+        budgets, (order, costs, _) = search
+        names, digits = self._names, 4 if by == "time" else 2
+        out = {}
+        for budget in budgets:
+            k = bisect.bisect_right(costs, budget)
+            out[budget] = {names[v]: round(c, digits) for v, c in zip(order[:k], costs[:k])}
+        return out
+
+    def isochrone_edges(self, sources, budget, by="distance"):
+        """Shortest-path forest within ``budget`` as (parent, city, cost) tuples, ready for visualize_graph."""
+        search = self._bounded_search(sources, budget, by)
+        if search is None:
+            return None
+        (budget,), (order, costs, prev) = search
+        names, digits = self._names, 4 if by == "time" else 2
+        k = bisect.bisect_right(costs, budget)
+        return [(names[prev[v]], names[v], round(c, digits)) for v, c in zip(order[:k], costs[:k]) if prev[v] >= 0]
+
+    def _bounded_search(self, sources, budgets, by):
+        """Normalise isochrone arguments; return (budgets, (order, costs, prev)) or None."""
+        if by not in ("distance", "time"):
+            return None
+        sources = [sources] if isinstance(sources, str) else sources
+        budgets = [budgets] if isinstance(budgets, numbers.Real) else list(budgets)
+        ids = tuple(sorted({self._ids[c] for c in sources if c in self._ids}))
+        if not ids:
+            return None
+        limit = max(budgets, default=-1.0)
+        key = ("isochrone", ids, limit, by, self._version)
+        search = self._results.get(key, _MISSING)
+        if search is _MISSING:
+            search = self._bounded_dijkstra(ids, limit, by == "time")
+            self._results.put(key, search)
+        return budgets, search
+
+    def _bounded_dijkstra(self, sources, limit, by_time=False):
+        """Multi-source Dijkstra that settles only cities within ``limit``.
+
+        Returns (order, costs, prev): settled ids in cost order, their costs and a
+        {city: predecessor} map (-1 for sources).
+        """
+        off, to, wt = self._adjacency()
+        if by_time:
+            wt = self._time_slots()
+        inf = float("inf")
+        dist = {s: 0.0 for s in sources}
+        prev = {s: -1 for s in sources}
+        heap = [(0.0, s) for s in sources]
+        order, costs = array("i"), array("d")
+        pop, push = heapq.heappop, heapq.heappush
+        token, stats, n = self._token, self._stats, len(self._names)
+
+        while heap:
+            d, u = pop(heap)
+            if d > limit:
+                break
+            if d > dist[u]:
+                continue
+            if token is not None:
+                token.tick(n)
+            if stats is not None:
+                stats.visit(len(heap) + 1, off[u + 1] - off[u])
+            order.append(u)
+            costs.append(d)
+            for k in range(off[u], off[u + 1]):
+                v = to[k]
+                nd = d + wt[k]
+                if nd <= limit and nd < dist.get(v, inf):
+                    dist[v] = nd
+                    prev[v] = u
+                    push(heap, (nd, v))
+        return order, costs, prev
+
+    def _time_slots(self):
+        """Per-CSR-slot travel time in hours (road length / road speed), cached per graph version."""
+        if self._time_w is None or self._time_w[0] != self._version:
+            self._adjacency()
+            eids = _as_numpy("i", self._csr[2])
+            hours = _as_numpy("d", self._base_w)[eids] / _as_numpy("d", self._speed)[eids]
+            self._time_w = (self._version, _to_array("d", hours))
+        return self._time_w[1]
+
+    # Multi-stop itineraries
+    @_instrumented
+    def optimize_itinerary(self, stops, round_trip=False, restarts=8, processes=None):
+        """Order ``stops`` for the shortest drive; return (stop_order, city_path, km).
+
+        The first stop is the start; with ``round_trip`` the route returns to it.
+        Stop-to-stop distances come from one Dijkstra per stop and are cached for
+        the graph version, so changing a few stops only searches from the new
+        ones. Each of ``restarts`` runs builds a nearest-neighbour tour (randomised
+        after the first) and improves it with 2-opt and Or-opt moves; with
+        ``processes`` > 1 the restarts run in a process pool. Returns
+        (None, None, None) if a stop is unknown or unreachable.
+        """
+        ids = list(dict.fromkeys(self._ids.get(c, -1) for c in stops))
+        if not ids or -1 in ids:
+            return None, None, None
+        table = self._stop_distances(ids)
+        if any(d == float("inf") for d in table[0]):
+            return None, None, None
+        # Append the fixed end node: the start again, or a dummy that is free to reach.
+        rows = [row + [row[0] if round_trip else 0.0] for row in table]
+        rows.append(rows[0][:] if round_trip else [0.0] * (len(ids) + 1))
+
+        seeds = [None] + list(range(1, max(1, restarts)))
+        if processes and processes > 1 and len(ids) > 3 and len(seeds) > 1:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                results = list(pool.map(solve_tour, [rows] * len(seeds), seeds))
+        else:
+            results = []
+            for done, seed in enumerate(seeds):
+                if self._token is not None:
+                    self._token.progress = 0.5 + 0.5 * done / len(seeds)
+                    if self._token.cancelled:
+                        raise QueryCancelled()
+                results.append(solve_tour(rows, seed))
+        cost, tour = min(results, key=lambda r: r[0])
+
+        order = [ids[i] for i in tour[:-1]] + ([ids[0]] if round_trip else [])
+        path = [order[0]]
+        for a, b in zip(order, order[1:]):
+            _, prev = self._dijkstra_ids(a, b)
+            path += self._unwind(prev, b)[1:]
+        return self._path_names(order), self._path_names(path), round(cost, 2)
+
+    def _stop_distances(self, ids):
+        """Return the len(ids) x len(ids) distance table, searching only for pairs not cached yet.
+
+        Roads are two-way, so a pair is known once either stop has searched to
+        the other; each new stop costs one Dijkstra that runs until every stop
+        has settled.
+        """
+        if self._stop_table is None or self._stop_table[0] != self._version:
+            self._stop_table = (self._version, {})
+        known = self._stop_table[1]
+        # New stops search first, so cached stops find their distances in the new rows.
+        for done, s in enumerate(sorted(ids, key=known.__contains__)):
+            if self._token is not None:
+                self._token.progress = 0.5 * done / len(ids)
+            row = known.setdefault(s, {})
+            missing = [t for t in ids if t not in row and s not in known.get(t, ())]
+            if missing:
+                tree = self._search_tree(s)
+                for t in missing:
+                    if not tree.done[t]:
+                        self._grow_tree(tree, t)
+                row.update((t, tree.dist[t]) for t in missing)
+        return [[known[a][b] if b in known[a] else known[b][a] for b in ids] for a in ids]
 
     # A*
+    @_instrumented
     def a_star(self, start, goal):
         """A* search returning (path, distance)."""
-        if start not in self.graph or goal not in self.graph:
-            return None, None
+        return self._cached("a_star", start, goal, self._a_star)
 
-        def heuristic(a, b):
-            return abs(len(a) - len(b)) * 5
+    def _a_star(self, start, goal):
+        ends = self._endpoints(start, goal)
+        if ends is None:
+            return None, None
+        s, t = ends
+        off, to, wt = self._adjacency()
+        heuristic = self._heuristic(t)
+        n = len(self._names)
 
-        open_heap = [(heuristic(start, goal), start)]
-        came_from = {}
-        g_score = {start: 0.0}
+        g_score = [float("inf")] * n
+        came_from = [-1] * n
+        g_score[s] = 0.0
+        open_heap = [(heuristic(s), 0.0, s)]
+        pop, push = heapq.heappop, heapq.heappush
+        token, stats = self._token, self._stats
 
         while open_heap:
-            _, current = heapq.heappop(open_heap)
-            if current == goal:
-                path = [current]
-                while current in came_from:
-                    current = came_from[current]
-                    path.append(current)
-                return path[::-1], round(g_score[goal], 2)
-
-            for neigh, w in self.graph[current].items():
-                tentative_g = g_score[current] + w
-                if neigh not in g_score or tentative_g < g_score[neigh]:
+            if token is not None:
+                token.tick(n)
+            _, g, current = pop(open_heap)
+            if g > g_score[current]:
+                continue
+            if stats is not None:
+                stats.visit(len(open_heap) + 1, off[current + 1] - off[current])
+            if current == t:
+                return self._path_names(self._unwind(came_from, t)), round(g, 2)
+
+            for k in range(off[current], off[current + 1]):
+                neigh = to[k]
+                tentative_g = g + wt[k]
+                if tentative_g < g_score[neigh]:
                     came_from[neigh] = current
                     g_score[neigh] = tentative_g
-                    f = tentative_g + heuristic(neigh, goal)
-                    heapq.heappush(open_heap, (f, neigh))
+                    push(open_heap, (tentative_g + heuristic(neigh), tentative_g, neigh))
 
         return None, None
 
+    def _heuristic(self, t):
+        """Return an admissible lower-bound function h(node) on the distance to ``t``."""
+        bounds = [h for h in (self._geographic_bound(t), self._landmark_bound(t)) if h is not None]
+        if not bounds:
+            return lambda v: 0.0
+        if len(bounds) == 1:
+            return bounds[0]
+        geo, alt = bounds
+        return lambda v: max(geo(v), alt(v))
+
+    def _geographic_bound(self, t):
+        lat_t, lon_t = self._lat[t], self._lon[t]
+        if math.isnan(lat_t):
+            return None
+        scale = self._geographic_scale()
+        if not scale:
+            return None
+
+        lat, lon = self._lat, self._lon
+        cos_t = math.cos(lat_t)
+        k = 2 * EARTH_RADIUS_KM * scale
+        sin, cos, asin, sqrt = math.sin, math.cos, math.asin, math.sqrt
+
+        def geographic(v):
+            la = lat[v]
+            if la != la:
+                return 0.0
+            a = sin((la - lat_t) / 2) ** 2 + cos(la) * cos_t * sin((lon[v] - lon_t) / 2) ** 2
+            return k * asin(sqrt(min(a, 1.0)))
+
+        return geographic
+
+    def _geographic_scale(self):
+        """Largest factor <= 1 keeping scaled great-circle distance below every road weight.
+
+        Roads are normally longer than the straight line between their ends, but
+        data entry can disagree with the map; shrinking the bound keeps it
+        admissible (and consistent) for the weights actually stored. The scale
+        is 0 (no bound) unless every city on a road has coordinates: a detour
+        through unplaced cities is not limited by the straight line.
+        """
+        if self._geo_scale is None:
+            weights = _as_numpy("d", self._w)
+            with self._phase("geo_scale"):
+                lat, lon = _as_numpy("d", self._lat), _as_numpy("d", self._lon)
+                eu, ev = _as_numpy("i", self._eu), _as_numpy("i", self._ev)
+                crow = _haversine_km(lat[eu], lon[eu], lat[ev], lon[ev])
+                moved = crow > 0
+                scale = 1.0
+                if np.isnan(crow).any():
+                    scale = 0.0
+                elif moved.any():
+                    scale = min(scale, float(np.min(weights[moved] / crow[moved])))
+                self._geo_scale = max(scale, 0.0)
+        return self._geo_scale
+
+    # ALT landmarks
+    def prepare_landmarks(self, k=8):
+        """Pick ``k`` landmarks by farthest-point selection and store their distance tables.
+
+        A* then uses the triangle inequality |d(L, t) - d(L, v)| as a lower bound,
+        which works without coordinates. Tables are dropped whenever weights
+        change and rebuilt on the next A* query.
+        """
+        self._landmark_count = max(0, int(k))
+        self._landmarks = self._landmark_dist = None
+        if self._landmark_count and self._names:
+            self._build_landmarks()
+        return self._path_names(self._landmarks or [])
+
+    def clear_landmarks(self):
+        self._landmark_count = 0
+        self._landmarks = self._landmark_dist = None
+
+    def _build_landmarks(self):
+        n = len(self._names)
+        k = min(self._landmark_count, n)
+        inf = float("inf")
+        # Start from the point farthest from an arbitrary city, then repeatedly add
+        # the city farthest from every landmark chosen so far; cities in other
+        # components are infinitely far, so each component gets covered.
+        seed = np.array(self._dijkstra_ids(0)[0])
+        first = int(np.where(np.isfinite(seed), seed, -1.0).argmax())
+        landmarks, rows = [], []
+        nearest = np.full(n, inf)
+        candidate = first
+        while len(landmarks) < k:
+            dist = self._dijkstra_ids(candidate)[0]
+            landmarks.append(candidate)
+            rows.append(array("d", dist))
+            np.minimum(nearest, dist, out=nearest)
+            nearest[landmarks] = -1.0
+            candidate = int(nearest.argmax())
+            if nearest[candidate] <= 0:
+                break
+        self._landmarks, self._landmark_dist = landmarks, rows
+
+    def _landmark_bound(self, t):
+        if not self._landmark_count or not self._names:
+            return None
+        if self._landmark_dist is None:
+            with self._phase("landmarks"):
+                self._build_landmarks()
+        inf = float("inf")
+        pairs = [(row, row[t]) for row in self._landmark_dist if row[t] != inf]
+        if not pairs:
+            return None
+
+        def landmark(v):
+            best = 0.0
+            for row, dt in pairs:
+                x = row[v] - dt
+                if x < 0:
+                    x = -x
+                if best < x < inf:
+                    best = x
+            return best
+
+        return landmark
+
+    def save_landmarks(self, path):
+        """Write the landmark tables to ``path`` (NumPy .npz) so restarts can skip preprocessing."""
+        if self._landmark_dist is None:
+            if not self._landmark_count or not self._names:
+                return False
+            self._build_landmarks()
+        np.savez(path, landmarks=np.array(self._landmarks, dtype=np.int32),
+                 dist=np.array([_as_numpy("d", row) for row in self._landmark_dist]),
+                 fingerprint=np.array(self._fingerprint()))
+        return True
+
+    def load_landmarks(self, path):
+        """Load tables written by save_landmarks; returns False if they belong to another network."""
+        with np.load(path, allow_pickle=False) as data:
+            if str(data["fingerprint"]) != self._fingerprint():
+                return False
+            self._landmarks = data["landmarks"].tolist()
+            self._landmark_dist = [_to_array("d", row) for row in data["dist"]]
+        self._landmark_count = len(self._landmarks)
+        return True
+
+    def _fingerprint(self):
+        """Digest of city names, endpoints and current weights; identifies one network state."""
+        h = hashlib.sha1()
+        h.update("\x00".join(self._names).encode("utf-8"))
+        for arr in (self._eu, self._ev, self._w):
+            h.update(arr.tobytes())
+        return h.hexdigest()
+
+    # Contraction Hierarchies
+    def build_contraction_hierarchy(self):
+        """Preprocess the network into a Contraction Hierarchies index for fast queries."""
+        self._ch = ContractionHierarchy(len(self._names), self._eu, self._ev, self._w, tick=self._token_tick())
+        self._ch_stale = False
+        return self._ch.shortcut_count
+
+    def customize_contraction_hierarchy(self):
+        """Refresh shortcut weights after traffic changes, keeping the node order."""
+        if self._ch is None:
+            return self.build_contraction_hierarchy()
+        self._ch.customize(self._eu, self._ev, self._w, tick=self._token_tick())
+        self._ch_stale = False
+        return self._ch.shortcut_count
+
+    @_instrumented
+    def ch_shortest_path(self, start, goal):
+        """Shortest path via the CH index; same (path, distance) result as dijkstra.
+
+        The index is built on first use, customized after weight changes and
+        rebuilt after new routes are added.
+        """
+        ends = self._endpoints(start, goal)
+        if ends is None:
+            return None, None
+        if self._ch is None:
+            with self._phase("ch_build"):
+                self.build_contraction_hierarchy()
+        elif self._ch_stale:
+            with self._phase("ch_customize"):
+                self.customize_contraction_hierarchy()
+        path, _ = self._ch.query(*ends)
+        if path is None:
+            return None, None
+        return self._path_names(path), round(self._path_length(path), 2)
+
     # Bellman Ford
-    def bellman_ford(self, start, goal):
-        """Compute shortest path even with negative weights."""
-        if start not in self.graph or goal not in self.graph:
+    @_instrumented
+    def bellman_ford(self, start, goal, method="queue"):
+        """Compute shortest path even with negative weights.
+
+        ``method="queue"`` relaxes only edges out of cities whose distance changed
+        in the previous round; ``"vectorized"`` relaxes every edge per round with
+        NumPy, which suits dense graphs. Both stop as soon as a round changes
+        nothing and return (None, NEGATIVE_CYCLE) if a reachable negative cycle exists.
+        """
+        if method == "vectorized":
+            return self._cached("bellman_ford_vectorized", start, goal, self._bellman_ford_vectorized)
+        return self._cached("bellman_ford", start, goal, self._bellman_ford)
+
+    def _bellman_ford(self, start, goal):
+        ends = self._endpoints(start, goal)
+        if ends is None:
             return None, None
+        s, t = ends
+        off, to, wt = self._adjacency()
+        n = len(self._names)
 
-        dist = {node: float("inf") for node in self.graph}
-        prev = {node: None for node in self.graph}
-        dist[start] = 0.0
+        inf = float("inf")
+        dist = [inf] * n
+        prev = [-1] * n
+        dist[s] = 0.0
+        queued = bytearray(n)
+        frontier = [s]
+        token, stats = self._token, self._stats
 
-        for _ in range(len(self.graph) - 1):
-            for u in self.graph:
-                for v, w in self.graph[u].items():
-                    if dist[u] + w < dist[v]:
-                        dist[v] = dist[u] + w
+        # A shortest path has at most n-1 edges, so anything still changing in
+        # round n can only be caused by a negative cycle.
+        for _ in range(n):
+            if not frontier:
+                break
+            changed = []
+            for u in frontier:
+                queued[u] = 0
+            for u in frontier:
+                if token is not None:
+                    token.tick()
+                if stats is not None:
+                    stats.visit(len(frontier), off[u + 1] - off[u])
+                du = dist[u]
+                for k in range(off[u], off[u + 1]):
+                    v = to[k]
+                    if du + wt[k] < dist[v]:
+                        dist[v] = du + wt[k]
                         prev[v] = u
+                        if not queued[v]:
+                            queued[v] = 1
+                            changed.append(v)
+            frontier = changed
 
-        for u in self.graph:
-            for v, w in self.graph[u].items():
-                if dist[u] + w < dist[v]:
-                    print("Warning: Negative weight cycle detected!")
-                    return None, None
-
-        path = []
-        current = goal
-        while current is not None:
-            path.append(current)
-            current = prev[current]
-        path.reverse()
+        if frontier:
+            return None, NEGATIVE_CYCLE
+        if dist[t] == inf:
+            return None, None
+        return self._path_names(self._unwind(prev, t)), round(dist[t], 2)
 
-        if dist[goal] == float("inf"):
+    def _bellman_ford_vectorized(self, start, goal):
+        ends = self._endpoints(start, goal)
+        if ends is None:
             return None, None
+        s, t = ends
+        off, to, wt = self._adjacency()
+        n = len(self._names)
+        offsets = _as_numpy("q", off)
+        src = np.repeat(np.arange(n, dtype=np.int32), np.diff(offsets))
+        dst, w = _as_numpy("i", to), _as_numpy("d", wt)
+
+        dist = np.full(n, np.inf)
+        prev = np.full(n, -1, dtype=np.int64)
+        dist[s] = 0.0
+        settled = False
+        stats = self._stats
+        for _ in range(n):
+            if self._token is not None:
+                self._token.tick()
+            if stats is not None:
+                # One round relaxes every half-edge at once.
+                stats.popped += 1
+                stats.relaxed += len(w)
+            cand = dist[src] + w
+            better = cand < dist[dst]
+            if not better.any():
+                settled = True
+                break
+            new = dist.copy()
+            np.minimum.at(new, dst[better], cand[better])
+            # Among the improving edges into each city keep one that achieves the minimum.
+            tight = better & (cand == new[dst])
+            prev[dst[tight]] = src[tight]
+            dist = new
 
-        return path, round(dist[goal], 2)
+        if not settled:
+            return None, NEGATIVE_CYCLE
+        if dist[t] == np.inf:
+            return None, None
+        return self._path_names(self._unwind(prev.tolist(), t)), round(float(dist[t]), 2)
 
     # BFS/DFS
-    def bfs(self, start, goal):
-        if start not in self.graph or goal not in self.graph:
+    @_instrumented
+    def bfs(self, start, goal, bidirectional=False, max_hops=None):
+        """Return a minimum-hop path as a list of cities, or None.
+
+        ``bidirectional=True`` searches from both ends, which visits far fewer
+        cities on large networks; ``max_hops`` rejects paths with more roads.
+        """
+        algorithm = "bfs" if not bidirectional and max_hops is None else ("bfs", bidirectional, max_hops)
+        search = self._bidirectional_bfs if bidirectional else self._bfs
+        return self._cached(algorithm, start, goal, lambda a, b: search(a, b, max_hops))
+
+    def _bfs(self, start, goal, max_hops=None):
+        """Level-by-level BFS keeping one parent pointer per city instead of a path per queue entry."""
+        ends = self._endpoints(start, goal)
+        if ends is None:
             return None
-        if start == goal:
+        s, t = ends
+        if s == t:
             return [start]
+        off, to, _ = self._adjacency()
+        n = len(self._names)
+        seen = bytearray(n)
+        seen[s] = 1
+        parent = array("i", [-1]) * n
+        frontier = [s]
+        depth, limit = 0, n if max_hops is None else max_hops
+        token, stats = self._token, self._stats
 
-        visited = set([start])
-        queue = deque([[start]])
+        while frontier and depth < limit:
+            depth += 1
+            nxt = []
+            for u in frontier:
+                if token is not None:
+                    token.tick(n)
+                if stats is not None:
+                    stats.visit(len(frontier) + len(nxt), off[u + 1] - off[u])
+                for k in range(off[u], off[u + 1]):
+                    v = to[k]
+                    if seen[v]:
+                        continue
+                    seen[v] = 1
+                    parent[v] = u
+                    if v == t:
+                        return self._path_names(self._unwind(parent, t))
+                    nxt.append(v)
+            frontier = nxt
+        return None
 
-        while queue:
-            path = queue.popleft()
-            node = path[-1]
-            for neigh in self.graph.get(node, {}):
-                if neigh in visited:
-                    continue
-                new_path = list(path) + [neigh]
-                if neigh == goal:
-                    return new_path
-                queue.append(new_path)
-                visited.add(neigh)
+    def _bidirectional_bfs(self, start, goal, max_hops=None):
+        """BFS from both ends, always expanding the smaller frontier by one whole level."""
+        ends = self._endpoints(start, goal)
+        if ends is None:
+            return None
+        s, t = ends
+        if s == t:
+            return [start]
+        off, to, _ = self._adjacency()
+        n = len(self._names)
+        seen = (bytearray(n), bytearray(n))
+        parent = (array("i", [-1]) * n, array("i", [-1]) * n)
+        seen[0][s] = seen[1][t] = 1
+        frontiers = [[s], [t]]
+        depth = [0, 0]
+        limit = n if max_hops is None else max_hops
+        token, stats = self._token, self._stats
+
+        while frontiers[0] and frontiers[1] and depth[0] + depth[1] < limit:
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            own, other, pred = seen[side], seen[1 - side], parent[side]
+            nxt, meets = [], []
+            for u in frontiers[side]:
+                if token is not None:
+                    token.tick(n)
+                if stats is not None:
+                    stats.visit(len(frontiers[0]) + len(frontiers[1]) + len(nxt), off[u + 1] - off[u])
+                for k in range(off[u], off[u + 1]):
+                    v = to[k]
+                    if other[v]:
+                        meets.append((u, v))
+                    if not own[v]:
+                        own[v] = 1
+                        pred[v] = u
+                        nxt.append(v)
+            depth[side] += 1
+            if meets:
+                # Every meet closes a path of depth[side] hops plus the other side's
+                # depth of v; those depths differ by at most one, so take the shortest.
+                back = parent[1 - side]
+                u, v = min(meets, key=lambda m: len(self._unwind(back, m[1])))
+                path = self._unwind(pred, u) + self._unwind(back, v)[::-1]
+                if len(path) - 1 > limit:
+                    return None
+                return self._path_names(path if side == 0 else path[::-1])
+            frontiers[side] = nxt
         return None
 
+    @_instrumented
     def dfs(self, start, goal, visited=None, path=None):
-        if start not in self.graph or goal not in self.graph:
+        """Return a depth-first path from ``start`` to ``goal`` as a list of cities, or None.
+
+        Walks an explicit stack, so long corridors don't hit the recursion limit.
+        ``visited`` (cities to avoid, updated in place) and ``path`` (a prefix
+        for the result) work as they did in the recursive version.
+        """
+        if visited is None and path is None:
+            return self._cached("dfs", start, goal, self._dfs)
+        return self._dfs(start, goal, visited, path)
+
+    def _dfs(self, start, goal, visited=None, path=None):
+        ends = self._endpoints(start, goal)
+        if ends is None:
             return None
-        if visited is None:
-            visited = set()
-        if path is None:
-            path = []
-        visited.add(start)
-        path = path + [start]
-        if start == goal:
-            return path
-        for neigh in self.graph.get(start, {}):
-            if neigh not in visited:
-                res = self.dfs(neigh, goal, visited, path)
-                if res:
-                    return res
-        return None
+        s, t = ends
+        off, to, _ = self._adjacency()
+        n = len(self._names)
+        seen = bytearray(n)
+        for city in visited or ():
+            node = self._ids.get(city)
+            if node is not None:
+                seen[node] = 1
+        seen[s] = 1
+        # stack[i] is the i-th city on the current path, cursor[i] its next CSR slot to try.
+        stack, cursor = [s], [off[s]]
+        token, stats = self._token, self._stats
+        if stats is not None:
+            stats.visit(1, off[s + 1] - off[s])
+
+        while stack:
+            u = stack[-1]
+            if u == t:
+                break
+            if token is not None:
+                token.tick(n)
+            k, end = cursor[-1], off[u + 1]
+            while k < end and seen[to[k]]:
+                k += 1
+            if k == end:
+                stack.pop()
+                cursor.pop()
+                continue
+            cursor[-1] = k + 1
+            v = to[k]
+            seen[v] = 1
+            stack.append(v)
+            cursor.append(off[v])
+            if stats is not None:
+                stats.visit(len(stack), off[v + 1] - off[v])
+
+        if visited is not None:
+            visited.update(self._names[i] for i in range(n) if seen[i])
+        if not stack:
+            return None
+        return list(path or []) + self._path_names(stack)
 
     # Prim's MST
 
+    @_instrumented
     def prim_mst(self):
-        if not self.graph:
+        """Return (edges, total) of the minimum spanning tree around the first city.
+
+        The spanning forest is computed once with a heap-based Prim and then
+        patched in place by add_route, so repeated calls after small edits are cheap.
+        """
+        n = len(self._names)
+        if not n:
             return [], 0.0
+        if self._mst is None:
+            self._mst = self._prim_forest()
+        tree = self._mst
+        tree.extend({} for _ in range(n - len(tree)))
 
-        start = next(iter(self.graph))
-        visited = set([start])
         edges = []
         total = 0.0
-
-        while len(visited) < len(self.graph):
-            candidate = None
-            candidate_w = float("inf")
-            for u in visited:
-                for v, w in self.graph[u].items():
-                    if v not in visited and w < candidate_w:
-                        candidate = (u, v, w)
-                        candidate_w = w
-            if candidate is None:
-                break
-            u, v, w = candidate
-            edges.append((u, v, w))
-            total += w
-            visited.add(v)
+        weights = self._w
+        seen = bytearray(n)
+        seen[0] = 1
+        queue = deque([0])
+        while queue:
+            u = queue.popleft()
+            for v, eid in tree[u].items():
+                if seen[v]:
+                    continue
+                seen[v] = 1
+                w = weights[eid]
+                edges.append((self._names[u], self._names[v], w))
+                total += w
+                queue.append(v)
 
         return edges, round(total, 2)
 
+    def _prim_forest(self):
+        """Heap-based Prim with lazy deletion, restarted in every component."""
+        off, to, wt = self._adjacency()
+        eids = self._csr[2]
+        n = len(self._names)
+        in_tree = bytearray(n)
+        tree = [{} for _ in range(n)]
+        pop, push = heapq.heappop, heapq.heappush
+        token, stats = self._token, self._stats
+
+        for root in range(n):
+            if in_tree[root]:
+                continue
+            in_tree[root] = 1
+            heap = [(wt[k], k, root) for k in range(off[root], off[root + 1])]
+            heapq.heapify(heap)
+            while heap:
+                if token is not None:
+                    token.tick(len(off))
+                _, k, u = pop(heap)
+                v = to[k]
+                if in_tree[v]:
+                    continue
+                in_tree[v] = 1
+                tree[u][v] = tree[v][u] = eids[k]
+                if stats is not None:
+                    stats.visit(len(heap) + 1, off[v + 1] - off[v])
+                for kk in range(off[v], off[v + 1]):
+                    if not in_tree[to[kk]]:
+                        push(heap, (wt[kk], kk, v))
+        return tree
+
+    def _mst_update(self, eid, old_weight):
+        """Patch the stored forest after edge ``eid`` was added or re-weighted.
+
+        Cycle property: a new or cheaper edge replaces the heaviest edge on the
+        tree path between its ends if it is lighter. A tree edge that got heavier
+        may need a cut-based swap, so the forest is simply recomputed later.
+        """
+        weights = self._w
+        tree, u, v, w = self._mst, self._eu[eid], self._ev[eid], weights[eid]
+        tree.extend({} for _ in range(len(self._names) - len(tree)))
+        if u == v:
+            return
+        if v in tree[u]:
+            if old_weight is not None and w > old_weight:
+                self._mst = None
+            return
+
+        path = self._tree_path(tree, u, v)
+        if path is not None:
+            heaviest = max(path, key=lambda e: weights[e[2]])
+            if weights[heaviest[2]] <= w:
+                return
+            a, b, _ = heaviest
+            del tree[a][b], tree[b][a]
+        tree[u][v] = tree[v][u] = eid
+
+    @staticmethod
+    def _tree_path(tree, u, v):
+        """Return the (a, b, edge id) hops between u and v in the forest, or None."""
+        parent = {u: None}
+        queue = deque([u])
+        while queue and v not in parent:
+            a = queue.popleft()
+            for b, eid in tree[a].items():
+                if b not in parent:
+                    parent[b] = (a, eid)
+                    queue.append(b)
+        if v not in parent:
+            return None
+        hops = []
+        node = v
+        while parent[node] is not None:
+            a, eid = parent[node]
+            hops.append((a, node, eid))
+            node = a
+        return hops
+
     # Kruskal MST
+    @_instrumented
     def kruskal_mst(self):
-        parent = {}
-        rank = {}
-
-        def make_set(x):
-            parent[x] = x
-            rank[x] = 0
+        n = len(self._names)
+        parent = list(range(n))
+        rank = [0] * n
 
         def find(x):
-            if parent[x] != x:
-                parent[x] = find(parent[x])
-            return parent[x]
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
 
         def union(a, b):
             ra, rb = find(a), find(b)
@@ -232,140 +2313,558 @@ class GraphManager:
                     rank[ra] += 1
             return True
 
-        for node in self.graph:
-            make_set(node)
-
-        edge_list = []
-        seen = set()
-        for u in self.graph:
-            for v, w in self.graph[u].items():
-                if (v, u) in seen:
-                    continue
-                edge_list.append((u, v, w))
-                seen.add((u, v))
-
-        edge_list.sort(key=lambda x: x[2])
+        eu, ev, names, weights = self._eu, self._ev, self._names, self._w
 
         mst = []
         total = 0.0
-        for u, v, w in edge_list:
+        token, stats = self._token, self._stats
+        for e in self._sorted_edges():
+            if token is not None:
+                token.tick(len(eu))
+            if stats is not None:
+                stats.relaxed += 1
+            u, v = eu[e], ev[e]
             if union(u, v):
-                mst.append((u, v, w))
+                w = weights[e]
+                mst.append((names[u], names[v], w))
                 total += w
 
         return mst, round(total, 2)
 
-    
+    def _sorted_edges(self):
+        """Edge ids by (weight, id), cached until the graph version changes."""
+        cached = self._kruskal_order
+        if cached is None or cached[0] != self._version:
+            with self._phase("sort_edges"):
+                order = np.argsort(_as_numpy("d", self._w), kind="stable").tolist()
+            self._kruskal_order = cached = (self._version, order)
+        return cached[1]
+
+    # Boruvka MST
+    @_instrumented
+    def boruvka_mst(self, processes=None):
+        """Minimum spanning forest via Boruvka rounds; same (edges, total) format as kruskal_mst.
+
+        With ``processes`` > 1 each round's cheapest-edge scan runs on a process
+        pool over shared-memory edge arrays, which pays off on very large networks.
+        """
+        weights = _as_numpy("d", self._w)
+        chosen = boruvka_mst(len(self._names), _as_numpy("i", self._eu), _as_numpy("i", self._ev),
+                             weights, processes)
+        # List edges the way kruskal_mst does: by weight, then insertion order.
+        chosen = chosen[np.lexsort((chosen, weights[chosen]))]
+        names, w = self._names, self._w
+        edges = []
+        total = 0.0
+        for e in chosen.tolist():
+            edges.append((names[self._eu[e]], names[self._ev[e]], w[e]))
+            total += w[e]
+        return edges, round(total, 2)
+
     def calculate_travel_time(self, distance, speed):
         if speed <= 0:
             return "N/A"
-        hours = distance / speed
+        return self.format_duration(distance / speed)
+
+    @staticmethod
+    def format_duration(hours):
         h = int(hours)
         m = int(round((hours - h) * 60))
         return f"{h}h {m}m" if h > 0 else f"{m}m"
 
     def compare_algorithms(self, start, goal):
-        d_path, d_dist = self.dijkstra(start, goal)
-        a_path, a_dist = self.a_star(start, goal)
-        b_path, b_dist = self.bellman_ford(start, goal)
+        """Run Dijkstra, A* and Bellman-Ford on one pair and report time and search effort.
+
+        Metrics are switched on for the comparison (and off again if they were
+        off). An answer that settled no node came straight from that algorithm's
+        own cache and is labelled as such.
+        """
+        enabled = self._metrics is not None
+        self.enable_metrics()
+        timed = []
+        try:
+            for name, search in (("Dijkstra", self.dijkstra), ("A*", self.a_star),
+                                 ("Bellman-Ford", self.bellman_ford)):
+                t0 = time.perf_counter()
+                path, dist = search(start, goal)
+                elapsed = (time.perf_counter() - t0) * 1000
+                timed.append((name, path, dist, elapsed, self._metrics.last))
+        finally:
+            if not enabled:
+                self.enable_metrics(False)
 
-        if not d_path or not a_path or not b_path:
+        if not all(path for _, path, _, _, _ in timed):
             return "Comparison failed (invalid path)."
 
-        result = (
-            f"Dijkstra: {d_dist:.2f} km\n"
-            f"A*: {a_dist:.2f} km\n"
-            f"Bellman-Ford: {b_dist:.2f} km\n"
-        )
-        best = min((d_dist, "Dijkstra"), (a_dist, "A*"), (b_dist, "Bellman-Ford"))
+        result = ""
+        for name, path, dist, elapsed, stats in timed:
+            if stats.popped:
+                note = (f"{len(path) - 1} hops, {stats.popped} settled, {stats.relaxed} relaxed, "
+                        f"heap max {stats.heap_max}")
+            else:
+                note = "cached"
+            result += f"{name}: {dist:.2f} km in {elapsed:.2f} ms ({note})\n"
+        best = min((dist, name) for name, _, dist, _, _ in timed)
         result += f"→ Best (shortest) path: {best[1]}"
         return result
 
     # Traffic
-    def simulate_traffic(self, factor):
-        if not self.original_graph:
-            return "No routes available."
-
-        for city, neighbors in self.original_graph.items():
-            for dest, base_dist in neighbors.items():
-                if city in self.graph and dest in self.graph[city]:
-                    self.graph[city][dest] = round(base_dist * factor, 2)
+    def simulate_traffic(self, factor, scenario="traffic"):
+        """Scale every road in ``scenario`` by ``factor`` and make it the active scenario.
 
-        new_speeds = {}
-        for (a, b), base_speed in self.road_speeds.items():
-            new_speed = max(10.0, round(base_speed / factor, 1))
-            new_speeds[(a, b)] = new_speed
-        self.road_speeds = new_speeds
+        Only the overlay's global factor changes here; effective weights are
+        derived lazily on the next query instead of rewriting every edge.
+        """
+        if not len(self._eu):
+            return "No routes available."
 
         hour = datetime.datetime.now().hour
         rush = (7 <= hour <= 9) or (16 <= hour <= 18)
+        overlay = self._overlays.setdefault(scenario, TrafficOverlay())
+        overlay.factor = factor
+        overlay.rush_hour = rush
+        overlay.drop_derived()
+        self._scenario = scenario
+        self._mark_weights_changed()
         if rush:
-            for k in list(self.road_speeds.keys()):
-                self.road_speeds[k] = max(10.0, round(self.road_speeds[k] * 0.85, 1))
             return "Traffic updated (with Rush Hour slowdown)."
         return "Traffic updated."
 
     def reset_traffic(self):
-        if not self.original_graph:
+        """Deactivate the current traffic scenario; the base weights are used again as-is.
+
+        The scenario itself is kept and can be re-activated with use_scenario.
+        """
+        if not len(self._eu):
             return "Nothing to reset."
-        self.graph = {k: v.copy() for k, v in self.original_graph.items()}
-        self._restore_speeds()
+        self.use_scenario(None)
         return "Traffic reset to normal flow."
 
-    def _restore_speeds(self):
-        self.road_speeds.clear()
-        for a in self.graph:
-            for b, dist in self.graph[a].items():
-                if dist < 30:
-                    speed = 40.0
-                elif dist < 100:
-                    speed = 60.0
-                else:
-                    speed = 90.0
-                self.road_speeds[(a, b)] = speed
-
-    
-    def visualize_graph(self, highlight_path=None, is_tree=False):
-        if not self.graph:
+    def define_region(self, name, cities):
+        """Group cities into a named region for set_region_traffic (a city has one region).
+
+        Returns False, leaving the regions unchanged, if any city is unknown.
+        """
+        nodes = array("i", (self._ids.get(c, -1) for c in cities))
+        if -1 in nodes:
+            return False
+        for node in self._regions.pop(name, ()):
+            self._node_region.pop(node, None)
+        for node in nodes:
+            old = self._node_region.get(node)
+            if old is not None and old != name:
+                self._regions[old] = array("i", (x for x in self._regions[old] if x != node))
+            self._node_region[node] = name
+        self._regions[name] = nodes
+        for overlay in self._overlays.values():
+            if overlay.regions:
+                overlay.drop_derived()
+        if self._overlays.get(self._scenario) is not None:
+            self._mark_weights_changed()
+        return True
+
+    def set_road_traffic(self, city1, city2, multiplier, scenario=None):
+        """Slow down (or speed up) a single road in a scenario; returns False if no such road."""
+        eid = self._edge_id(city1, city2)
+        if eid is None:
+            return False
+        overlay = self._editable_overlay(scenario)
+        if multiplier == 1.0:
+            overlay.edges.pop(eid, None)
+        else:
+            overlay.edges[eid] = float(multiplier)
+        self._overlay_changed(overlay, (eid,))
+        return True
+
+    def set_region_traffic(self, region, multiplier, scenario=None):
+        """Apply ``multiplier`` to every road touching ``region``; returns False for unknown regions."""
+        nodes = self._regions.get(region)
+        if nodes is None:
+            return False
+        overlay = self._editable_overlay(scenario)
+        if multiplier == 1.0:
+            overlay.regions.pop(region, None)
+        else:
+            overlay.regions[region] = float(multiplier)
+        off, _, _ = self._adjacency()
+        eids = self._csr[2]
+        touched = {eids[k] for u in nodes for k in range(off[u], off[u + 1])}
+        self._overlay_changed(overlay, touched)
+        return True
+
+    def use_scenario(self, scenario=None):
+        """Activate a stored scenario by name (None for free flow); returns False if unknown."""
+        if scenario is not None and scenario not in self._overlays:
+            return False
+        if scenario != self._scenario:
+            self._scenario = scenario
+            self._mark_weights_changed()
+        return True
+
+    def scenarios(self):
+        return list(self._overlays)
+
+    def _editable_overlay(self, scenario):
+        if scenario is None:
+            scenario = self._scenario or "traffic"
+            if self._scenario is None:
+                self._scenario = scenario
+                # A fresh overlay reproduces the base weights exactly (see _traffic_values),
+                # so no edge changed; a stored one may differ anywhere.
+                self._mark_weights_changed(() if scenario not in self._overlays else None)
+        return self._overlays.setdefault(scenario, TrafficOverlay())
+
+    def _overlay_changed(self, overlay, eids):
+        self._patch_overlay(overlay, eids)
+        if overlay is self._overlays.get(self._scenario):
+            self._mark_weights_changed(eids)
+
+    def _multipliers(self, overlay):
+        """Vectorized per-edge multiplier: factor x regional x per-road."""
+        mult = np.full(len(self._eu), float(overlay.factor))
+        if overlay.regions:
+            node_mult = np.full(len(self._names), np.nan)
+            for name, x in overlay.regions.items():
+                node_mult[_as_numpy("i", self._regions[name])] = x
+            eu, ev = _as_numpy("i", self._eu), _as_numpy("i", self._ev)
+            regional = np.fmax(node_mult[eu], node_mult[ev])
+            mult *= np.where(np.isnan(regional), 1.0, regional)
+        if overlay.edges:
+            eids = np.fromiter(overlay.edges.keys(), dtype=np.int64, count=len(overlay.edges))
+            mult[eids] *= np.fromiter(overlay.edges.values(), dtype=np.float64, count=len(overlay.edges))
+        return mult
+
+    def _multiplier(self, overlay, eid):
+        """Scalar version of _multipliers for a single edge (same order, so same rounding)."""
+        mult = float(overlay.factor)
+        if overlay.regions:
+            regional = [overlay.regions[r] for r in (self._node_region.get(self._eu[eid]),
+                                                     self._node_region.get(self._ev[eid]))
+                        if r in overlay.regions]
+            if regional:
+                mult *= max(regional)
+        if eid in overlay.edges:
+            mult *= overlay.edges[eid]
+        return mult
+
+    @staticmethod
+    def _traffic_values(base_w, base_speed, mult, rush_hour):
+        """Effective (weights, speeds) for NumPy arrays of base values and multipliers.
+
+        Roads with a multiplier of exactly 1 keep their base values untouched;
+        only scaled roads are rounded.
+        """
+        same = mult == 1.0
+        weights = np.where(same, base_w, np.round(base_w * mult, 2))
+        speeds = np.where(same, base_speed, np.maximum(10.0, np.round(base_speed / mult, 1)))
+        if rush_hour:
+            speeds = np.maximum(10.0, np.round(speeds * 0.85, 1))
+        return weights, speeds
+
+    def _derive_overlay(self, overlay):
+        with self._phase("traffic"):
+            weights, speeds = self._traffic_values(_as_numpy("d", self._base_w), _as_numpy("d", self._base_speed),
+                                                   self._multipliers(overlay), overlay.rush_hour)
+            overlay.weights = _to_array("d", weights)
+            overlay.speeds = _to_array("d", speeds)
+            overlay.slot_weights = None
+
+    def _patch_overlay(self, overlay, eids):
+        """Recompute a few edges of an already-derived overlay in place."""
+        if overlay.weights is None:
+            return
+        for e in eids:
+            w, speed = self._traffic_values(np.float64(self._base_w[e]), np.float64(self._base_speed[e]),
+                                             self._multiplier(overlay, e), overlay.rush_hour)
+            overlay.weights[e] = float(w)
+            overlay.speeds[e] = float(speed)
+            self._set_slots(overlay.slot_weights, e, float(w))
+
+    def _set_slots(self, slot_weights, eid, w):
+        if slot_weights is None or self._edge_slots is None:
+            return
+        first, last = self._edge_slots
+        slot_weights[first[eid]] = w
+        slot_weights[last[eid]] = w
+
+    # Time-dependent fastest routes
+    def add_speed_profile(self, name, points):
+        """Define a periodic speed shape from (hour_of_day, speed_multiplier) points.
+
+        The shape is linear between points, wraps around midnight and is sampled
+        onto a shared 15-minute grid, so each road only stores a small shape id.
+        """
+        hours = np.array([p[0] for p in points], dtype=np.float64) % 24.0
+        values = np.array([p[1] for p in points], dtype=np.float64)
+        grid = np.arange(PROFILE_SLOTS + 1) * (24.0 / PROFILE_SLOTS)
+        shape = np.interp(grid, hours, values, period=24.0).astype(np.float32)
+        if name in self._profile_names:
+            self._profile_shapes[self._profile_names[name]] = shape
+        else:
+            self._profile_names[name] = len(self._profile_shapes)
+            self._profile_shapes.append(shape)
+        self._td_tables = None
+
+    def set_road_profile(self, city1, city2, name):
+        """Give one road a named speed profile; returns False if the road or profile is unknown."""
+        eid = self._edge_id(city1, city2)
+        if eid is None or name not in self._profile_names:
+            return False
+        self._road_profiles[eid] = self._profile_names[name]
+        self._td_tables = None
+        return True
+
+    @_instrumented
+    def fastest_route(self, start, goal, depart=None):
+        """Time-dependent Dijkstra minimising travel time; returns (path, hours) or (None, None).
+
+        ``depart`` is an hour of day (float) or a datetime, defaulting to now. Each
+        road's speed is its traffic-adjusted free-flow speed times its profile
+        shape at the moment the road is being driven.
+        """
+        ends = self._endpoints(start, goal)
+        if ends is None:
+            return None, None
+        s, t = ends
+        if depart is None:
+            depart = datetime.datetime.now()
+        if isinstance(depart, (datetime.datetime, datetime.time)):
+            depart = depart.hour + depart.minute / 60.0 + depart.second / 3600.0
+        t0 = float(depart)
+
+        off, to, _ = self._adjacency()
+        tables = self._time_tables()
+        inf = float("inf")
+        arrival = {s: t0}
+        prev = {s: -1}
+        done = set()
+        heap = [(t0, s)]
+        pop, push = heapq.heappop, heapq.heappush
+        token, stats, n = self._token, self._stats, len(self._names)
+
+        while heap:
+            if token is not None:
+                token.tick(n)
+            now, u = pop(heap)
+            if u in done:
+                continue
+            done.add(u)
+            if u == t:
+                break
+            lo, hi = off[u], off[u + 1]
+            if stats is not None:
+                stats.visit(len(heap) + 1, hi - lo)
+            if lo == hi:
+                continue
+            for k, reach in zip(range(lo, hi), self._arrival_times(tables, lo, hi, now).tolist()):
+                v = to[k]
+                if reach < arrival.get(v, inf):
+                    arrival[v] = reach
+                    prev[v] = u
+                    push(heap, (reach, v))
+
+        if t not in done:
+            return None, None
+        return self._path_names(self._unwind(prev, t)), round(arrival[t] - t0, 4)
+
+    def _time_tables(self):
+        """Per-CSR-slot road length, free-flow speed and shape id, cached per graph version."""
+        if self._td_tables is None or self._td_tables[0] != self._version:
+            self._adjacency()
+            with self._phase("time_tables"):
+                eids = _as_numpy("i", self._csr[2])
+                overlay = self._overlays.get(self._scenario)
+                free = _as_numpy("d", self._base_speed)
+                if overlay is not None:
+                    free = np.maximum(10.0, free / self._multipliers(overlay))
+                shape_of = np.full(len(self._eu), self._default_profile, dtype=np.int16)
+                if self._road_profiles:
+                    shape_of[list(self._road_profiles)] = list(self._road_profiles.values())
+                self._td_tables = (self._version, _as_numpy("d", self._base_w)[eids], free[eids],
+                                   shape_of[eids], np.array(self._profile_shapes, dtype=np.float64))
+        return self._td_tables
+
+    @staticmethod
+    def _arrival_times(tables, lo, hi, start):
+        """Arrival times (hours) over CSR slots lo..hi when entering them at ``start``.
+
+        Speed varies linearly inside each 15-minute bucket, so the distance driven
+        in a bucket is a quadratic in time; roads spanning several buckets are
+        advanced bucket by bucket, all slots at once. Driving is FIFO: leaving
+        later never gets you there earlier.
+        """
+        _, lengths, free, shape_of, shapes = tables
+        step = 24.0 / PROFILE_SLOTS
+        remaining = lengths[lo:hi].copy()
+        speed = free[lo:hi]
+        shape = shapes[shape_of[lo:hi]]
+        now = np.full(hi - lo, start)
+        active = np.arange(hi - lo)
+        while len(active):
+            t = now[active]
+            bucket = np.floor(t / step)
+            i = (bucket % PROFILE_SLOTS).astype(np.int64)
+            v0 = np.maximum(speed[active] * shape[active, i], 1.0)
+            v1 = np.maximum(speed[active] * shape[active, i + 1], 1.0)
+            slope = (v1 - v0) / step
+            into = t - bucket * step
+            vt = v0 + slope * into
+            span = step - into
+            reach = vt * span + 0.5 * slope * span * span
+            rem = remaining[active]
+            finish = rem <= reach
+            # Solve 0.5*slope*d^2 + vt*d = rem for the finishing slots.
+            f_slope, f_vt, f_rem = slope[finish], vt[finish], rem[finish]
+            root = np.sqrt(np.maximum(f_vt * f_vt + 2.0 * f_slope * f_rem, 0.0))
+            flat = np.abs(f_slope) < 1e-12
+            delta = np.where(flat, f_rem / f_vt, (root - f_vt) / np.where(flat, 1.0, f_slope))
+            now[active[finish]] = t[finish] + delta
+            going = active[~finish]
+            remaining[going] -= reach[~finish]
+            now[going] = t[~finish] + span[~finish]
+            active = going
+        return now
+
+    def visualize_graph(self, highlight_path=None, is_tree=False, lod=None, block=True, pos=None):
+        """Draw the network, highlighting ``highlight_path`` (a city list or edge tuples).
+
+        Layouts are cached and extended as routes are added; ``pos`` takes
+        positions already computed by layout_positions (e.g. on a worker
+        thread, so a GUI thread only renders). While the previous figure is
+        open and the graph unchanged only the highlight is redrawn. Above
+        LOD_NODES cities (or with ``lod=True``) edges are batched into one
+        LineCollection and labels are dropped.
+        """
+        if not self._names:
             print("Graph is empty.")
             return
 
-        G = nx.Graph()
-        for u in self.graph:
-            for v, w in self.graph[u].items():
-                G.add_edge(u, v, weight=w)
-
-        pos = self._hierarchical_pos(G) if is_tree else nx.spring_layout(G, seed=42)
-
-        highlight_edges = set()
-        if highlight_path:
-            if all(isinstance(item, tuple) for item in highlight_path):
-                for e in highlight_path:
-                    if len(e) >= 2:
-                        a, b = e[0], e[1]
-                        highlight_edges.add((a, b))
-                        highlight_edges.add((b, a))
-            else:
-                for i in range(len(highlight_path) - 1):
-                    a = highlight_path[i]
-                    b = highlight_path[i + 1]
-                    highlight_edges.add((a, b))
-                    highlight_edges.add((b, a))
-
-        edge_colors = []
-        for (u, v) in G.edges():
-            if (u, v) in highlight_edges or (v, u) in highlight_edges:
-                edge_colors.append("red")
+        if pos is None or len(pos) != len(self._names):
+            pos = self.layout_positions(is_tree)
+        if lod is None:
+            lod = len(self._names) > LOD_NODES
+        # Labels show weights, so a detailed drawing is stale after any change;
+        # the LOD drawing only depends on the topology.
+        key = ((len(self._names), len(self._eu)) if lod else self._version, is_tree, lod)
+
+        fig, ax, drawn, artists = self._figure or (None, None, None, ())
+        if fig is None or not plt.fignum_exists(fig.number):
+            fig, ax = plt.subplots(figsize=(9, 7))
+            drawn = None
+        if drawn != key:
+            ax.clear()
+            ax.set_title("SmartRoute+ Network Visualization", color="white", fontsize=13)
+            if lod:
+                self._draw_lod(ax, pos)
             else:
-                edge_colors.append("#999999")
+                self._draw_detailed(ax, pos)
+        else:
+            for artist in artists:
+                artist.remove()
+        artists = self._draw_highlight(ax, pos, highlight_path, lod)
+        self._figure = (fig, ax, key, artists)
+        fig.canvas.draw_idle()
+        plt.show(block=block)
 
-        plt.figure(figsize=(9, 7))
-        plt.title("SmartRoute+ Network Visualization", color="white", fontsize=13)
-        nx.draw(G, pos, with_labels=True, node_color="#00FFAA", edge_color=edge_colors,
+    def _draw_detailed(self, ax, pos):
+        G = nx.Graph()
+        for u, v, w in self.get_all_routes():
+            G.add_edge(u, v, weight=w)
+        ids = self._ids
+        pos = {city: pos[ids[city]] for city in G}
+        nx.draw(G, pos, ax=ax, with_labels=True, node_color="#00FFAA", edge_color="#999999",
                 node_size=1300, font_weight='bold', font_color='black')
         labels = nx.get_edge_attributes(G, 'weight')
-        nx.draw_networkx_edge_labels(G, pos, edge_labels=labels, font_color='mediumseagreen')
-        plt.show()
+        nx.draw_networkx_edge_labels(G, pos, edge_labels=labels, font_color='mediumseagreen', ax=ax)
+
+    def _draw_lod(self, ax, pos):
+        eu, ev = _as_numpy("i", self._eu), _as_numpy("i", self._ev)
+        ax.add_collection(LineCollection(np.stack([pos[eu], pos[ev]], axis=1),
+                                         colors="#999999", linewidths=0.5, zorder=1))
+        ax.scatter(pos[:, 0], pos[:, 1], s=6, c="#00FFAA", zorder=2)
+        ax.autoscale_view()
+        ax.set_axis_off()
+
+    def _draw_highlight(self, ax, pos, highlight_path, lod):
+        """Draw the highlighted roads on top of the base drawing; returns the new artists."""
+        if not highlight_path:
+            return ()
+        if all(isinstance(item, tuple) for item in highlight_path):
+            pairs = [e[:2] for e in highlight_path if len(e) >= 2]
+        else:
+            pairs = list(zip(highlight_path, highlight_path[1:]))
+        # Only existing roads are highlighted.
+        ids = [(u, v) for u, v in (self._endpoints(a, b) or (None, None) for a, b in pairs)
+               if u is not None and self._edge_key(u, v) in self._edge_ids]
+        if not ids:
+            return ()
+        u, v = np.array(ids).T
+        width = 2.0 if lod else 1.0
+        return (ax.add_collection(LineCollection(np.stack([pos[u], pos[v]], axis=1),
+                                                 colors="red", linewidths=width, zorder=1.5)),)
+
+    def layout_positions(self, tree=False):
+        """Return an (n, 2) array of node positions, reusing the cached layout when possible.
+
+        This is the expensive part of visualize_graph on a new or large network.
+        """
+        n, m = len(self._names), len(self._eu)
+        kind = "tree" if tree else "spring"
+        cached = self._layouts.get(kind)
+        if cached is not None and cached[:2] == (n, m):
+            return cached[2]
+        if tree:
+            G = nx.Graph()
+            G.add_edges_from((u, v) for u, v, _ in self.get_all_routes())
+            placed = self._hierarchical_pos(G)
+            pos = np.zeros((n, 2))
+            for city, xy in placed.items():
+                pos[self._ids[city]] = xy
+        else:
+            pos = self._spring_positions(None if cached is None else cached[2])
+        self._layouts[kind] = (n, m, pos)
+        return pos
+
+    def _spring_positions(self, old):
+        """Force-directed positions, placing only new cities when ``old`` covers most of the graph.
+
+        New cities start at the centroid of their placed neighbours and are relaxed
+        against them with the old cities held fixed. The layout ignores weights,
+        so traffic never moves cities around.
+        """
+        n = len(self._names)
+        eu, ev = _as_numpy("i", self._eu), _as_numpy("i", self._ev)
+        k = 0 if old is None else len(old)
+        if n == k:
+            return np.zeros((0, 2)) if old is None else old
+        touching = (eu >= k) | (ev >= k)
+        sub = nx.Graph()
+        sub.add_nodes_from(range(k, n))
+        sub.add_edges_from(zip(eu[touching].tolist(), ev[touching].tolist()))
+        if 4 * (n - k) > k or len(sub) >= 500:
+            G = nx.Graph()
+            G.add_nodes_from(range(n))
+            G.add_edges_from(zip(eu.tolist(), ev.tolist()))
+            warm = None if old is None else dict(enumerate(old))
+            placed = nx.spring_layout(G, pos=warm, weight=None, seed=42, iterations=50 if warm is None else 20)
+            return np.array([placed[i] for i in range(n)], dtype=float).reshape(n, 2)
+
+        pos = np.vstack([old, np.zeros((n - k, 2))])
+        rng = np.random.default_rng(42)
+        lo, hi = old.min(axis=0), old.max(axis=0)
+        spacing = 2.0 / math.sqrt(n)
+        ready = set(range(k))
+        for v in range(k, n):
+            anchors = [u for u in sub[v] if u in ready]
+            base = pos[anchors].mean(axis=0) if anchors else rng.uniform(lo, hi)
+            pos[v] = base + rng.normal(scale=spacing / 2, size=2)
+            ready.add(v)
+        fixed = [u for u in sub if u < k]
+        placed = nx.spring_layout(sub, k=spacing, pos={v: pos[v] for v in sub}, fixed=fixed or None,
+                                  weight=None, seed=42, iterations=30, scale=None)
+        for v in range(k, n):
+            pos[v] = placed[v]
+        return pos
 
     def _hierarchical_pos(self, G, root=None):
         if root is None:
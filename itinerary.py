@@ -0,0 +1,74 @@
+# itinerary.py
+import heapq
+import random
+
+
+# Stop ordering. A tour is a list of row indices into a square distance table;
+# index 0 is the fixed start and the last index a fixed end node (the start again
+# for round trips, or a zero-distance dummy for open routes).
+def _tour_cost(rows, tour):
+    return sum(rows[a][b] for a, b in zip(tour, tour[1:]))
+
+
+def _nearest_neighbour_tour(rows, rng=None):
+    """Greedy tour from the start; with ``rng`` each step picks one of the three nearest stops."""
+    end = len(rows) - 1
+    left = set(range(1, end))
+    tour, here = [0], 0
+    while left:
+        nearest = heapq.nsmallest(3 if rng else 1, left, key=rows[here].__getitem__)
+        here = rng.choice(nearest) if rng else nearest[0]
+        left.remove(here)
+        tour.append(here)
+    tour.append(end)
+    return tour
+
+
+def _two_opt(rows, tour):
+    """Reverse inner segments while that shortens the tour; True if anything changed."""
+    improved = False
+    for i in range(1, len(tour) - 2):
+        for j in range(i + 1, len(tour) - 1):
+            a, b, c, d = tour[i - 1], tour[i], tour[j], tour[j + 1]
+            if rows[a][c] + rows[b][d] < rows[a][b] + rows[c][d] - 1e-9:
+                tour[i:j + 1] = tour[i:j + 1][::-1]
+                improved = True
+    return improved
+
+
+def _or_opt(rows, tour):
+    """Move runs of 1-3 stops (possibly reversed) to a cheaper place; True if anything changed."""
+    improved = False
+    for length in (1, 2, 3):
+        i = 1
+        while i + length < len(tour):
+            seg = tour[i:i + length]
+            first, last = seg[0], seg[-1]
+            before, after = tour[i - 1], tour[i + length]
+            saving = rows[before][first] + rows[last][after] - rows[before][after]
+            rest = tour[:i] + tour[i + length:]
+            best = None
+            for p in range(len(rest) - 1):
+                if p == i - 1:
+                    continue
+                x, y = rest[p], rest[p + 1]
+                forward = rows[x][first] + rows[last][y] - rows[x][y]
+                backward = rows[x][last] + rows[first][y] - rows[x][y]
+                cost = min(forward, backward)
+                if cost < saving - 1e-9 and (best is None or cost < best[0]):
+                    best = (cost, p, backward < forward)
+            if best is None:
+                i += 1
+                continue
+            _, p, flip = best
+            tour[:] = rest[:p + 1] + (seg[::-1] if flip else seg) + rest[p + 1:]
+            improved = True
+    return improved
+
+
+def solve_tour(rows, seed=None):
+    """One restart: nearest-neighbour construction (randomised when seeded), then 2-opt/Or-opt."""
+    tour = _nearest_neighbour_tour(rows, None if seed is None else random.Random(seed))
+    while _two_opt(rows, tour) | _or_opt(rows, tour):
+        pass
+    return _tour_cost(rows, tour), tour
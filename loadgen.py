@@ -0,0 +1,189 @@
+# loadgen.py
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import numpy as np
+
+from benchmark import environment, write_json
+
+DEFAULT_MIX = {"route": 90, "matrix": 6, "mst": 1, "traffic": 3}
+
+
+# HTTP client
+class Connection:
+    """One keep-alive HTTP/1.1 connection to the routing server."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self._reader = self._writer = None
+
+    async def request(self, method, path, payload=None):
+        """Send one request and return (status, decoded JSON body)."""
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        body = b"" if payload is None else json.dumps(payload).encode()
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(body)}\r\n"
+        if body:
+            head += "Content-Type: application/json\r\n"
+        self._writer.write(head.encode() + b"\r\n" + body)
+        await self._writer.drain()
+        status = int((await self._reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        data = await self._reader.readexactly(int(headers.get("content-length", 0)))
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, json.loads(data) if data else None
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._reader = self._writer = None
+
+
+# Workload
+def _parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def _make_request(op, cities, rng, hot_pairs, matrix_size):
+    """Return (method, path, payload) for one random operation."""
+    if op == "route":
+        start, goal = rng.choice(hot_pairs) if hot_pairs else rng.sample(cities, 2)
+        return "POST", "/route", {"from": start, "to": goal}
+    if op == "matrix":
+        return "POST", "/matrix", {"sources": rng.sample(cities, matrix_size),
+                                   "targets": rng.sample(cities, matrix_size)}
+    if op == "mst":
+        return "GET", "/mst?algorithm=kruskal", None
+    if rng.random() < 0.25:
+        return "POST", "/traffic", {"reset": True}
+    return "POST", "/traffic", {"factor": round(rng.uniform(1.0, 2.0), 2)}
+
+
+async def _client(host, port, ops, weights, cities, rng, hot_pairs, matrix_size, stop, samples):
+    conn = Connection(host, port)
+    try:
+        while not stop():
+            op = rng.choices(ops, weights)[0]
+            method, path, payload = _make_request(op, cities, rng, hot_pairs, matrix_size)
+            t0 = time.perf_counter()
+            try:
+                status, _ = await conn.request(method, path, payload)
+            except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+                conn.close()
+                status = None
+            samples.append((op, time.perf_counter() - t0, status == 200))
+    finally:
+        conn.close()
+
+
+async def run_load(host="127.0.0.1", port=8080, concurrency=16, duration=10.0, requests=None,
+                   mix=None, hot=0, matrix_size=10, seed=0):
+    """Drive the server with ``concurrency`` keep-alive clients and return (rows, server stats).
+
+    Runs for ``duration`` seconds, or until ``requests`` requests when given.
+    ``hot`` > 0 draws route queries from that many fixed city pairs, which
+    makes identical queries overlap so request batching shows up.
+    """
+    mix = mix or DEFAULT_MIX
+    ops = [op for op in mix if mix[op] > 0]
+    weights = [mix[op] for op in ops]
+    conn = Connection(host, port)
+    try:
+        _, listing = await conn.request("GET", "/cities")
+        _, before = await conn.request("GET", "/stats")
+        cities = listing["cities"]
+        if len(cities) < max(2, matrix_size):
+            raise ValueError(f"the server has only {len(cities)} cities")
+        rng = random.Random(seed)
+        hot_pairs = [tuple(rng.sample(cities, 2)) for _ in range(hot)]
+        samples = []
+        deadline = time.perf_counter() + duration
+
+        def stop():
+            if requests is not None:
+                return len(samples) >= requests
+            return time.perf_counter() >= deadline
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(_client(host, port, ops, weights, cities, random.Random(seed + 1 + i),
+                                       hot_pairs, matrix_size, stop, samples) for i in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+        _, after = await conn.request("GET", "/stats")
+    finally:
+        conn.close()
+    after["batched_during_run"] = after["batched"] - before["batched"]
+    return summarize(samples, elapsed, concurrency), after
+
+
+def summarize(samples, elapsed, concurrency):
+    rows = []
+    for op in ["all"] + sorted({s[0] for s in samples}):
+        picked = [s for s in samples if op == "all" or s[0] == op]
+        ms = np.array([s[1] * 1000 for s in picked]) if picked else np.zeros(1)
+        rows.append({
+            "operation": op, "concurrency": concurrency, "requests": len(picked),
+            "errors": sum(not s[2] for s in picked),
+            "rps": round(len(picked) / elapsed, 1) if elapsed else 0.0,
+            "mean_ms": round(float(ms.mean()), 3),
+            "p50_ms": round(float(np.percentile(ms, 50)), 3),
+            "p95_ms": round(float(np.percentile(ms, 95)), 3),
+            "p99_ms": round(float(np.percentile(ms, 99)), 3),
+            "max_ms": round(float(ms.max()), 3),
+        })
+    return rows
+
+
+def format_table(rows):
+    lines = [f"{'operation':<10}{'requests':>10}{'errors':>8}{'req/s':>10}{'mean ms':>10}"
+             f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+    for r in rows:
+        lines.append(f"{r['operation']:<10}{r['requests']:>10}{r['errors']:>8}{r['rps']:>10.1f}{r['mean_ms']:>10.2f}"
+                     f"{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['max_ms']:>10.2f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test a running SmartRoute+ server (see server.py).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--concurrency", type=int, default=16, help="simultaneous keep-alive clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument("--requests", type=int, help="stop after this many requests instead")
+    parser.add_argument("--mix", type=_parse_mix, default=DEFAULT_MIX,
+                        help="operation weights, e.g. route=90,matrix=6,mst=1,traffic=3")
+    parser.add_argument("--hot", type=int, default=0, help="draw routes from this many fixed pairs")
+    parser.add_argument("--matrix-size", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", help="tag stored with the results")
+    parser.add_argument("--json", help="write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    rows, stats = asyncio.run(run_load(args.host, args.port, args.concurrency, args.duration, args.requests,
+                                       args.mix, args.hot, args.matrix_size, args.seed))
+    print(format_table(rows))
+    print(f"server: {stats['mode']} x{stats['workers']}, generation {stats['generation']}, "
+          f"{stats['batched_during_run']} requests joined an identical query in flight")
+    if args.json:
+        meta = environment(args.label)
+        meta["server"] = stats
+        write_json(rows, args.json, meta)
+
+
+if __name__ == "__main__":
+    main()
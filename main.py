@@ -1,6 +1,9 @@
+import os
 import tkinter as tk
-from tkinter import ttk, messagebox
-from graph_manager import GraphManager
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import ttk, messagebox, filedialog
+from graph_manager import GraphManager, CancelToken, QueryCancelled, NEGATIVE_CYCLE
 
 BG = "#0F111A"
 PANEL = "#181A22"
@@ -10,6 +13,96 @@ OUTPUT_BG = "#151616"
 SUCCESS = "#7CFC9A"
 WARN = "#FFD166"
 ERR = "#FF6B6B"
+POLL_MS = 50
+# The road network is kept between sessions as a memory-mapped binary snapshot.
+SNAPSHOT_PATH = os.path.join(os.path.expanduser("~"), ".smartroute", "network.srgs")
+# Console output is buffered and written at most once per LOG_FLUSH_MS, keeping
+# the last LOG_SCROLLBACK lines; the route table loads ROUTE_PAGE rows at a time.
+LOG_FLUSH_MS = 100
+LOG_SCROLLBACK = 5000
+ROUTE_PAGE = 200
+# City autocomplete waits this long after the last keystroke and shows this many names.
+AUTOCOMPLETE_MS = 250
+AUTOCOMPLETE_ROWS = 8
+# Itineraries with at least this many stops spread their restarts over processes.
+PARALLEL_STOPS = 50
+
+
+class CityAutocomplete:
+    """Suggestion list under an entry, refreshed a moment after typing stops.
+
+    ``lookup(text)`` returns the names to offer, or None when the graph is busy
+    (the lookup is then retried). In comma-separated lists only the last name
+    is completed.
+    """
+
+    def __init__(self, root, entry, lookup):
+        self.entry, self.lookup = entry, lookup
+        self._after = None
+        self.listbox = tk.Listbox(root, height=AUTOCOMPLETE_ROWS, bg=OUTPUT_BG, fg=TEXT, font=("Consolas", 10),
+                                  selectbackground="#1E1F28", selectforeground=ACCENT, activestyle="none",
+                                  highlightthickness=1, highlightcolor=ACCENT, borderwidth=0)
+        entry.bind("<KeyRelease>", self._on_key, add="+")
+        entry.bind("<Down>", lambda e: self._move(1))
+        entry.bind("<Up>", lambda e: self._move(-1))
+        entry.bind("<Return>", self._accept)
+        entry.bind("<Escape>", lambda e: self.hide())
+        entry.bind("<FocusOut>", lambda e: entry.after(150, self.hide))  # let a click on the list land first
+        self.listbox.bind("<ButtonRelease-1>", self._accept)
+
+    def _on_key(self, event):
+        if event.keysym in ("Up", "Down", "Return", "Escape", "Tab") or event.keysym.startswith(("Shift", "Control")):
+            return
+        if self._after is not None:
+            self.entry.after_cancel(self._after)
+        self._after = self.entry.after(AUTOCOMPLETE_MS, self._refresh)
+
+    def _refresh(self):
+        self._after = None
+        text = self.entry.get().rpartition(",")[2].strip()
+        if not text:
+            self.hide()
+            return
+        names = self.lookup(text)
+        if names is None:
+            self._after = self.entry.after(AUTOCOMPLETE_MS, self._refresh)
+            return
+        if not names or names == [text]:
+            self.hide()
+            return
+        self.listbox.delete(0, tk.END)
+        self.listbox.insert(tk.END, *names)
+        self.listbox.config(height=min(len(names), AUTOCOMPLETE_ROWS))
+        self.listbox.place(in_=self.entry, x=0, rely=1.0, relwidth=1.0)
+        self.listbox.lift()
+
+    def hide(self):
+        self.listbox.place_forget()
+
+    def _move(self, step):
+        if not self.listbox.winfo_ismapped():
+            return None
+        current = self.listbox.curselection()
+        i = min(max((current[0] + step) if current else 0, 0), self.listbox.size() - 1)
+        self.listbox.selection_clear(0, tk.END)
+        self.listbox.selection_set(i)
+        self.listbox.activate(i)
+        self.listbox.see(i)
+        return "break"
+
+    def _accept(self, event=None):
+        if not self.listbox.winfo_ismapped():
+            return None
+        current = self.listbox.curselection()
+        if not current:
+            return None
+        head = self.entry.get().rpartition(",")[0]
+        city = self.listbox.get(current[0])
+        self.entry.delete(0, tk.END)
+        self.entry.insert(0, f"{head}, {city}" if head.strip() else city)
+        self.entry.icursor(tk.END)
+        self.hide()
+        return "break"
 
 
 class SmartRouteApp:
@@ -20,10 +113,25 @@ class SmartRouteApp:
         self.root.config(bg=BG)
 
         self.graph = GraphManager()
+        # Algorithms run on a worker thread; only one task (search or edit) at a time.
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="smartroute")
+        self._task = None
+        # Stats of finished queries, appended by a metrics hook on the worker thread.
+        self._query_stats = deque(maxlen=16)
+        # Console lines waiting for the next flush; older ones are dropped past the scrollback.
+        self._log_pending = deque(maxlen=LOG_SCROLLBACK)
+        self._log_dropped = 0
+        self._log_flush_id = None
+        self._routes_window = None
+        # Graph version last loaded from or written to the snapshot; None forces a save.
+        self._saved_version = None
         self._setup_styles()
         self._build_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         self._log("Welcome to SmartRoute+ — Ready!", "info")
+        if os.path.exists(SNAPSHOT_PATH):
+            self._run_task("Load Network", lambda: GraphManager.load_snapshot(SNAPSHOT_PATH), self._snapshot_loaded)
 
     def _setup_styles(self):
         style = ttk.Style()
@@ -52,6 +160,11 @@ class SmartRouteApp:
         style.map("Ghost.TButton",
                   background=[("active", "#1E1F28"), ("!disabled", PANEL)])
 
+        style.configure("Treeview", background=OUTPUT_BG, fieldbackground=OUTPUT_BG, foreground=TEXT,
+                        font=("Consolas", 10), rowheight=22, borderwidth=0)
+        style.configure("Treeview.Heading", background=PANEL, foreground=ACCENT, font=("Helvetica", 10, "bold"))
+        style.map("Treeview", background=[("selected", "#1E1F28")])
+
     def _build_ui(self):
         header = tk.Frame(self.root, bg=BG)
         header.pack(pady=(20, 5))
@@ -68,6 +181,8 @@ class SmartRouteApp:
         tk.Label(route_frame, text="To:", fg=TEXT, bg=PANEL).grid(row=0, column=2, padx=8, pady=6)
         self.entry_to = ttk.Entry(route_frame, width=18)
         self.entry_to.grid(row=0, column=3, padx=8, pady=6)
+        self._autocomplete = [CityAutocomplete(self.root, entry, self._city_matches)
+                              for entry in (self.entry_from, self.entry_to)]
 
         tk.Label(route_frame, text="Distance (km):", fg=TEXT, bg=PANEL).grid(row=0, column=4, padx=8, pady=6)
         self.entry_distance = ttk.Entry(route_frame, width=10)
@@ -75,6 +190,7 @@ class SmartRouteApp:
 
         ttk.Button(route_frame, text="Add Route", style="Accent.TButton", command=self.add_route).grid(row=0, column=6, padx=10)
         ttk.Button(route_frame, text="View Routes", style="Ghost.TButton", command=self.view_routes).grid(row=0, column=7, padx=10)
+        ttk.Button(route_frame, text="📥 Import Routes", style="Ghost.TButton", command=self.import_routes).grid(row=0, column=8, padx=10)
 
         algo_frame = tk.LabelFrame(self.root, text="Pathfinding & Graph Algorithms", bg=PANEL, fg=ACCENT, padx=12, pady=12,
                                    font=("Helvetica", 10, "bold"))
@@ -84,11 +200,32 @@ class SmartRouteApp:
         ttk.Button(algo_frame, text="A* Path", style="Accent.TButton", command=self.find_a_star_path).grid(row=0, column=1, padx=10, pady=8)
         ttk.Button(algo_frame, text="Bellman-Ford", style="Accent.TButton", command=self.find_bellman_ford_path).grid(row=0, column=2, padx=10, pady=8)
         ttk.Button(algo_frame, text="Compare Dijkstra vs A*", style="Ghost.TButton", command=self.compare_algorithms).grid(row=0, column=3, padx=10, pady=8)
+        ttk.Button(algo_frame, text="Fastest (Time)", style="Accent.TButton", command=self.find_fastest_path).grid(row=0, column=4, padx=10, pady=8)
 
         ttk.Button(algo_frame, text="BFS", style="Accent.TButton", command=self.find_bfs_path).grid(row=1, column=0, padx=10, pady=8)
         ttk.Button(algo_frame, text="DFS", style="Accent.TButton", command=self.find_dfs_path).grid(row=1, column=1, padx=10, pady=8)
         ttk.Button(algo_frame, text="Prim's MST", style="Accent.TButton", command=self.find_mst).grid(row=1, column=2, padx=10, pady=8)
         ttk.Button(algo_frame, text="Kruskal's MST", style="Accent.TButton", command=self.find_kruskal_mst).grid(row=1, column=3, padx=10, pady=8)
+        self.cancel_button = ttk.Button(algo_frame, text="✖ Cancel", style="Ghost.TButton", command=self.cancel_task, state="disabled")
+        self.cancel_button.grid(row=1, column=4, padx=10, pady=8)
+
+        tk.Label(algo_frame, text="Reach within:", fg=TEXT, bg=PANEL).grid(row=2, column=0, padx=10, pady=8, sticky="e")
+        self.entry_budget = ttk.Entry(algo_frame, width=18)
+        self.entry_budget.grid(row=2, column=1, padx=10, pady=8)
+        self.budget_unit = ttk.Combobox(algo_frame, values=["km", "minutes"], state="readonly", width=10)
+        self.budget_unit.current(0)
+        self.budget_unit.grid(row=2, column=2, padx=10, pady=8)
+        ttk.Button(algo_frame, text="🕒 Reachable Cities", style="Accent.TButton", command=self.find_reachable).grid(row=2, column=3, padx=10, pady=8)
+
+        tk.Label(algo_frame, text="Stops (start first):", fg=TEXT, bg=PANEL).grid(row=3, column=0, padx=10, pady=8, sticky="e")
+        self.entry_stops = ttk.Entry(algo_frame, width=44)
+        self.entry_stops.grid(row=3, column=1, columnspan=2, padx=10, pady=8, sticky="we")
+        self._autocomplete.append(CityAutocomplete(self.root, self.entry_stops, self._city_matches))
+        self.round_trip = tk.BooleanVar(value=False)
+        tk.Checkbutton(algo_frame, text="Return to start", variable=self.round_trip, fg=TEXT, bg=PANEL,
+                       selectcolor=OUTPUT_BG, activebackground=PANEL,
+                       activeforeground=TEXT).grid(row=3, column=3, padx=10, pady=8)
+        ttk.Button(algo_frame, text="🧭 Plan Itinerary", style="Accent.TButton", command=self.plan_itinerary).grid(row=3, column=4, padx=10, pady=8)
 
         traffic_frame = tk.LabelFrame(self.root, text="Traffic Control & Visualization", bg=PANEL, fg=ACCENT, padx=12, pady=12,
                                       font=("Helvetica", 10, "bold"))
@@ -102,6 +239,10 @@ class SmartRouteApp:
         ttk.Button(traffic_frame, text="🚦 Simulate Traffic", style="Accent.TButton", command=self.simulate_traffic).grid(row=0, column=2, padx=10, pady=6)
         ttk.Button(traffic_frame, text="🔄 Reset Traffic", style="Accent.TButton", command=self.reset_traffic).grid(row=0, column=3, padx=10, pady=6)
         ttk.Button(traffic_frame, text="🌐 Visualize Graph", style="Ghost.TButton", command=self.visualize_graph).grid(row=0, column=4, padx=10, pady=6)
+        self.show_stats = tk.BooleanVar(value=False)
+        tk.Checkbutton(traffic_frame, text="📊 Query Stats", variable=self.show_stats, command=self.toggle_stats,
+                       fg=TEXT, bg=PANEL, selectcolor=OUTPUT_BG, activebackground=PANEL,
+                       activeforeground=TEXT).grid(row=0, column=5, padx=10, pady=6)
 
         console_frame = tk.Frame(self.root, bg=PANEL, padx=8, pady=8)
         console_frame.pack(fill="both", expand=True, padx=20, pady=10)
@@ -120,9 +261,148 @@ class SmartRouteApp:
         self.status_label.pack(fill="x")
 
     def _log(self, msg, tag="info"):
-        self.output.insert(tk.END, msg + "\n", tag)
+        if len(self._log_pending) == self._log_pending.maxlen:
+            self._log_dropped += 1
+        self._log_pending.append((msg, tag))
+        if self._log_flush_id is None:
+            self._log_flush_id = self.root.after(LOG_FLUSH_MS, self._flush_log)
+
+    def _flush_log(self):
+        """Write buffered console lines in one insert and trim the scrollback."""
+        self._log_flush_id = None
+        if not self._log_pending:
+            return
+        chunks = []
+        if self._log_dropped:
+            chunks += [f"… {self._log_dropped} earlier lines skipped\n", "warn"]
+            self._log_dropped = 0
+        for msg, tag in self._log_pending:
+            chunks += [msg + "\n", tag]
+        last = self._log_pending[-1][0]
+        self._log_pending.clear()
+        self.output.insert(tk.END, *chunks)
+        lines = int(self.output.index("end-1c").split(".")[0])
+        if lines > LOG_SCROLLBACK:
+            self.output.delete("1.0", f"{lines - LOG_SCROLLBACK + 1}.0")
         self.output.see(tk.END)
-        self.status_label.config(text=f"Status: {msg}")
+        self.status_label.config(text=f"Status: {last.strip()}")
+
+    def _run_task(self, title, work, on_done, layout=None):
+        """Run ``work`` on the worker thread and hand its result to ``on_done`` on the Tk thread.
+
+        With ``layout`` ("spring" or "tree") the worker also computes the drawing
+        positions and ``on_done`` receives ``(result, positions)``, so drawing on
+        the Tk thread never has to lay out the network.
+        """
+        if self._task is not None:
+            self._log(f"⏳ Still running {self._task[3]} — wait or cancel it first.", "warn")
+            return
+        token = CancelToken()
+
+        def job():
+            with self.graph.lock, self.graph.cancellable(token):
+                result = work()
+                if layout is None:
+                    return result
+                return result, self.graph.layout_positions(tree=layout == "tree")
+
+        callback = on_done if layout is None else (lambda outcome: on_done(*outcome))
+        self._task = (self._pool.submit(job), token, callback, title)
+        self.cancel_button.config(state="normal")
+        self.root.after(POLL_MS, self._poll_task)
+
+    def _poll_task(self):
+        future, token, on_done, title = self._task
+        if not future.done():
+            self.status_label.config(text=f"Status: {title}… {int(token.progress * 100)}%")
+            self.root.after(POLL_MS, self._poll_task)
+            return
+        self._task = None
+        self.cancel_button.config(state="disabled")
+        try:
+            result = future.result()
+        except QueryCancelled:
+            self._log(f"✖ {title} cancelled.", "warn")
+            return
+        except Exception as exc:
+            self._log(f"❌ {title} failed: {exc}", "error")
+            return
+        on_done(result)
+        while self._query_stats:
+            self._log(f"📊 {self._query_stats.popleft().summary()}", "info")
+
+    def toggle_stats(self):
+        if self.show_stats.get():
+            self.graph.add_metrics_hook(self._query_stats.append)
+            self._log("📊 Query stats on — each search reports its work below.", "info")
+        else:
+            self.graph.enable_metrics(False)
+            self._query_stats.clear()
+            self._log("📊 Query stats off.", "info")
+
+    def _snapshot_loaded(self, graph):
+        if graph is None:
+            self._log(f"⚠️ Ignored {SNAPSHOT_PATH}: not a snapshot this version can read.", "warn")
+            return
+        self.graph = graph
+        self._saved_version = graph.version
+        if self.show_stats.get():
+            graph.add_metrics_hook(self._query_stats.append)
+        self._log(f"📂 Loaded {len(graph.graph)} cities and {len(graph.get_all_routes())} routes "
+                  "from the last session.", "success")
+
+    def on_close(self):
+        """Save the network if it changed, then close the window."""
+        if self._task is not None:
+            self._task[1].cancel()
+        with self.graph.lock:
+            if self.graph.version != self._saved_version and self.graph.graph:
+                try:
+                    os.makedirs(os.path.dirname(SNAPSHOT_PATH), exist_ok=True)
+                    self.graph.save_snapshot(SNAPSHOT_PATH)
+                except OSError as exc:
+                    messagebox.showerror("Error", f"Could not save the network: {exc}")
+        self._pool.shutdown(wait=False)
+        self.root.destroy()
+
+    def _city_matches(self, text):
+        """Cities starting with ``text``, else close misspellings; None while a task holds the graph."""
+        if not self.graph.lock.acquire(blocking=False):
+            return None
+        try:
+            return (self.graph.complete_city(text, AUTOCOMPLETE_ROWS)
+                    or self.graph.suggest_cities(text, AUTOCOMPLETE_ROWS))
+        finally:
+            self.graph.lock.release()
+
+    def _route_ends(self):
+        """Return the (from, to) cities typed by the user, resolving case and spacing, or None."""
+        frm, to = self.entry_from.get().strip(), self.entry_to.get().strip()
+        if not (frm and to):
+            messagebox.showerror("Error", "Enter both cities!")
+            return None
+        if self._task is not None:
+            return frm, to  # the graph is busy; _run_task will say so
+        ends = self._resolve_cities([frm, to])
+        return tuple(ends) if ends else None
+
+    def _resolve_cities(self, cities):
+        """Map typed names to stored ones; logs suggestions and returns None for an unknown name."""
+        found = []
+        for city in cities:
+            name = self.graph.lookup_city(city)
+            if name is None:
+                close = self.graph.suggest_cities(city, 3)
+                hint = f" — did you mean {', '.join(close)}?" if close else ""
+                self._log(f"⚠️ Unknown city '{city}'{hint}", "warn")
+                return None
+            found.append(name)
+        return found
+
+    def cancel_task(self):
+        if self._task is not None:
+            self._task[1].cancel()
+            self.status_label.config(text=f"Status: Cancelling {self._task[3]}…")
 
     def add_route(self):
         frm, to, dist = self.entry_from.get().strip(), self.entry_to.get().strip(), self.entry_distance.get().strip()
@@ -135,18 +415,70 @@ class SmartRouteApp:
             messagebox.showerror("Error", "Distance must be a number!")
             return
 
-        self.graph.add_route(frm, to, dist)
-        self._log(f"✅ Added route: {frm} ↔ {to} = {dist:.2f} km", "success")
+        def done(_):
+            self._log(f"✅ Added route: {frm} ↔ {to} = {dist:.2f} km", "success")
+            self.entry_from.delete(0, tk.END)
+            self.entry_to.delete(0, tk.END)
+            self.entry_distance.delete(0, tk.END)
 
-        self.entry_from.delete(0, tk.END)
-        self.entry_to.delete(0, tk.END)
-        self.entry_distance.delete(0, tk.END)
+        self._run_task("Add Route", lambda: self.graph.add_route(frm, to, dist), done)
 
     def view_routes(self):
-        routes = self.graph.get_all_routes()
-        self._log("\n--- All Routes ---", "info")
-        for frm, to, dist in routes:
-            self._log(f"{frm} ↔ {to} = {dist} km", "info")
+        def done(routes):
+            self._log(f"📋 {len(routes)} routes — showing them in the route table.", "info")
+            self._show_route_table(routes)
+
+        self._run_task("View Routes", self.graph.get_all_routes, done)
+
+    def _show_route_table(self, routes):
+        """Show ``routes`` in a Treeview that fetches another page whenever it is scrolled to the end."""
+        if self._routes_window is not None and self._routes_window.winfo_exists():
+            self._routes_window.destroy()
+        win = self._routes_window = tk.Toplevel(self.root, bg=PANEL)
+        win.title("All Routes")
+        win.geometry("560x480")
+        info = tk.Label(win, bg=PANEL, fg=TEXT, anchor="w", padx=8)
+        info.pack(fill="x", pady=(6, 0))
+        frame = tk.Frame(win, bg=PANEL)
+        frame.pack(fill="both", expand=True, padx=8, pady=8)
+        table = ttk.Treeview(frame, columns=("from", "to", "distance"), show="headings")
+        for column, title, width in (("from", "From", 200), ("to", "To", 200), ("distance", "Distance (km)", 120)):
+            table.heading(column, text=title)
+            table.column(column, width=width, anchor="e" if column == "distance" else "w")
+        scroll = ttk.Scrollbar(frame, orient="vertical", command=table.yview)
+        table.pack(side="left", fill="both", expand=True)
+        scroll.pack(side="right", fill="y")
+        loaded, pending = [0], [False]
+
+        def load_page():
+            pending[0] = False
+            rows = routes[loaded[0]:loaded[0] + ROUTE_PAGE]
+            for frm, to, dist in rows:
+                table.insert("", tk.END, values=(frm, to, f"{dist:.2f}"))
+            loaded[0] += len(rows)
+            info.config(text=f"Showing {loaded[0]} of {len(routes)} routes — scroll down for more")
+
+        def on_scroll(first, last):
+            scroll.set(first, last)
+            if float(last) >= 0.98 and loaded[0] < len(routes) and not pending[0]:
+                pending[0] = True
+                table.after_idle(load_page)
+
+        table.configure(yscrollcommand=on_scroll)
+        load_page()
+
+    def import_routes(self):
+        path = filedialog.askopenfilename(title="Import Routes",
+                                          filetypes=[("Route lists", "*.csv *.tsv *.txt"), ("All files", "*.*")])
+        if not path:
+            return
+
+        def done(stats):
+            self._log(f"📥 Imported {stats['rows']} rows from {os.path.basename(path)}: {stats['added']} new routes, "
+                      f"{stats['updated']} updated, {stats['cities']} new cities "
+                      f"({stats['duplicates']} duplicates merged, {stats['skipped']} rows skipped)", "success")
+
+        self._run_task("Import Routes", lambda: self.graph.load_routes(path), done)
 
     def _get_avg_speed(self):
         mode = self.traffic_mode.get()
@@ -166,103 +498,200 @@ class SmartRouteApp:
         else:
             return 1.6
 
+    def _show_path(self, label, frm, to, path, distance, pos):
+        time = self.graph.calculate_travel_time(distance, self._get_avg_speed())
+        self._log(f"\n[{label}] {frm} → {to}\nPath: {' → '.join(path)}\nDistance: {distance:.2f} km\nEstimated Time: {time}", "info")
+        self.graph.visualize_graph(highlight_path=path, block=False, pos=pos)
+
     def find_shortest_path(self):
-        frm, to = self.entry_from.get().strip(), self.entry_to.get().strip()
-        if not (frm and to):
-            messagebox.showerror("Error", "Enter both cities!")
+        ends = self._route_ends()
+        if ends is None:
             return
-        path, distance = self.graph.dijkstra(frm, to)
-        if not path:
-            self._log("⚠️ No path found!", "warn")
-            return
-        time = self.graph.calculate_travel_time(distance, self._get_avg_speed())
-        self._log(f"\n[Dijkstra] {frm} → {to}\nPath: {' → '.join(path)}\nDistance: {distance:.2f} km\nEstimated Time: {time}", "info")
-        self.graph.visualize_graph(highlight_path=path)
+        frm, to = ends
+
+        def done(result, pos):
+            path, distance = result
+            if not path:
+                self._log("⚠️ No path found!", "warn")
+                return
+            self._show_path("Dijkstra", frm, to, path, distance, pos)
+
+        self._run_task("Dijkstra", lambda: self.graph.dijkstra(frm, to, bidirectional=True), done, layout="spring")
 
     def find_a_star_path(self):
-        frm, to = self.entry_from.get().strip(), self.entry_to.get().strip()
-        if not (frm and to):
-            messagebox.showerror("Error", "Enter both cities!")
+        ends = self._route_ends()
+        if ends is None:
             return
-        path, distance = self.graph.a_star(frm, to)
-        if not path:
-            self._log("⚠️ No path found!", "warn")
+        frm, to = ends
+
+        def done(result, pos):
+            path, distance = result
+            if not path:
+                self._log("⚠️ No path found!", "warn")
+                return
+            self._show_path("A*", frm, to, path, distance, pos)
+
+        self._run_task("A*", lambda: self.graph.a_star(frm, to), done, layout="spring")
+
+    def find_fastest_path(self):
+        ends = self._route_ends()
+        if ends is None:
             return
-        time = self.graph.calculate_travel_time(distance, self._get_avg_speed())
-        self._log(f"\n[A*] {frm} → {to}\nPath: {' → '.join(path)}\nDistance: {distance:.2f} km\nEstimated Time: {time}", "info")
-        self.graph.visualize_graph(highlight_path=path)
+        frm, to = ends
+
+        def done(result, pos):
+            path, hours = result
+            if not path:
+                self._log("⚠️ No path found!", "warn")
+                return
+            time = self.graph.format_duration(hours)
+            self._log(f"\n[Fastest] {frm} → {to} (leaving now)\nPath: {' → '.join(path)}\nTravel Time: {time}", "info")
+            self.graph.visualize_graph(highlight_path=path, block=False, pos=pos)
+
+        self._run_task("Fastest Route", lambda: self.graph.fastest_route(frm, to), done, layout="spring")
 
     def find_bellman_ford_path(self):
-        frm, to = self.entry_from.get().strip(), self.entry_to.get().strip()
-        if not (frm and to):
-            messagebox.showerror("Error", "Enter both cities!")
-            return
-        path, distance = self.graph.bellman_ford(frm, to)
-        if distance == "Negative cycle detected!":
-            self._log("⚠️ Negative cycle detected! Pathfinding aborted.", "error")
-            return
-        if not path:
-            self._log("⚠️ No valid path found!", "warn")
+        ends = self._route_ends()
+        if ends is None:
             return
-        time = self.graph.calculate_travel_time(distance, self._get_avg_speed())
-        self._log(f"\n[Bellman-Ford] {frm} → {to}\nPath: {' → '.join(path)}\nDistance: {distance:.2f} km\nEstimated Time: {time}", "info")
-        self.graph.visualize_graph(highlight_path=path)
+        frm, to = ends
+
+        def done(result, pos):
+            path, distance = result
+            if distance == NEGATIVE_CYCLE:
+                self._log("⚠️ Negative cycle detected! Pathfinding aborted.", "error")
+                return
+            if not path:
+                self._log("⚠️ No valid path found!", "warn")
+                return
+            self._show_path("Bellman-Ford", frm, to, path, distance, pos)
+
+        self._run_task("Bellman-Ford", lambda: self.graph.bellman_ford(frm, to), done, layout="spring")
 
     def find_bfs_path(self):
-        frm, to = self.entry_from.get().strip(), self.entry_to.get().strip()
-        path = self.graph.bfs(frm, to)
-        if path:
-            self._log(f"\n[BFS] Path: {' → '.join(path)}", "info")
-            self.graph.visualize_graph(highlight_path=path)
-        else:
-            self._log("⚠️ No path found!", "warn")
+        ends = self._route_ends()
+        if ends is None:
+            return
+        frm, to = ends
+
+        def done(path, pos):
+            if path:
+                self._log(f"\n[BFS] Path: {' → '.join(path)}", "info")
+                self.graph.visualize_graph(highlight_path=path, block=False, pos=pos)
+            else:
+                self._log("⚠️ No path found!", "warn")
+
+        self._run_task("BFS", lambda: self.graph.bfs(frm, to), done, layout="spring")
 
     def find_dfs_path(self):
-        frm, to = self.entry_from.get().strip(), self.entry_to.get().strip()
-        path = self.graph.dfs(frm, to)
-        if path:
-            self._log(f"\n[DFS] Path: {' → '.join(path)}", "info")
-            self.graph.visualize_graph(highlight_path=path, is_tree=True)
-        else:
-            self._log("⚠️ No path found!", "warn")
+        ends = self._route_ends()
+        if ends is None:
+            return
+        frm, to = ends
 
-    def find_mst(self):
-        edges, cost = self.graph.prim_mst()
-        self._log("\n[Prim's MST]", "info")
+        def done(path, pos):
+            if path:
+                self._log(f"\n[DFS] Path: {' → '.join(path)}", "info")
+                self.graph.visualize_graph(highlight_path=path, is_tree=True, block=False, pos=pos)
+            else:
+                self._log("⚠️ No path found!", "warn")
+
+        self._run_task("DFS", lambda: self.graph.dfs(frm, to), done, layout="tree")
+
+    def _show_mst(self, label, result, pos):
+        edges, cost = result
+        self._log(f"\n[{label}]", "info")
         for frm, to, w in edges:
             self._log(f"{frm} ↔ {to} = {w:.2f} km", "info")
         self._log(f"Total Cost: {cost:.2f} km", "success")
-        self.graph.visualize_graph(highlight_path=[n for e in edges for n in e[:2]])
+        self.graph.visualize_graph(highlight_path=[(frm, to) for frm, to, _ in edges], block=False, pos=pos)
+
+    def find_mst(self):
+        self._run_task("Prim's MST", self.graph.prim_mst,
+                       lambda result, pos: self._show_mst("Prim's MST", result, pos), layout="spring")
 
     def find_kruskal_mst(self):
-        edges, cost = self.graph.kruskal_mst()
-        self._log("\n[Kruskal's MST]", "info")
-        for frm, to, w in edges:
-            self._log(f"{frm} ↔ {to} = {w:.2f} km", "info")
-        self._log(f"Total Cost: {cost:.2f} km", "success")
-        self.graph.visualize_graph(highlight_path=[n for e in edges for n in e[:2]])
+        self._run_task("Kruskal's MST", self.graph.kruskal_mst,
+                       lambda result, pos: self._show_mst("Kruskal's MST", result, pos), layout="spring")
+
+    def find_reachable(self):
+        sources = [c.strip() for c in self.entry_from.get().split(",") if c.strip()]
+        if not sources:
+            messagebox.showerror("Error", "Enter one or more start cities (comma-separated) in From!")
+            return
+        try:
+            budgets = sorted({float(b) for b in self.entry_budget.get().split(",") if b.strip()})
+        except ValueError:
+            budgets = None
+        if not budgets or budgets[0] < 0:
+            messagebox.showerror("Error", "Budgets must be non-negative numbers, e.g. 30, 60!")
+            return
+        if self._task is None:
+            sources = [self.graph.lookup_city(city) or city for city in sources]
+        minutes = self.budget_unit.get() == "minutes"
+        by, limits = ("time", [b / 60 for b in budgets]) if minutes else ("distance", budgets)
+        unit = "min" if minutes else "km"
+
+        def work():
+            return self.graph.isochrone(sources, limits, by), self.graph.isochrone_edges(sources, limits[-1], by)
+
+        def done(result, pos):
+            bands, tree = result
+            if bands is None:
+                self._log("⚠️ None of the start cities are in the network!", "warn")
+                return
+            self._log(f"\n[Reachable] from {', '.join(sources)}", "info")
+            for budget, limit in zip(budgets, limits):
+                self._log(f"Within {budget:g} {unit}: {len(bands[limit])} cities", "info")
+            self.graph.visualize_graph(highlight_path=tree, block=False, pos=pos)
+
+        self._run_task("Reachable Cities", work, done, layout="spring")
+
+    def plan_itinerary(self):
+        stops = [c.strip() for c in self.entry_stops.get().split(",") if c.strip()]
+        if len(stops) < 2:
+            messagebox.showerror("Error", "Enter a start city and at least one stop, comma-separated!")
+            return
+        if self._task is None:
+            stops = self._resolve_cities(stops)
+            if stops is None:
+                return
+        round_trip = self.round_trip.get()
+        processes = os.cpu_count() if len(stops) >= PARALLEL_STOPS else None
+
+        def done(result, pos):
+            order, path, km = result
+            if not order:
+                self._log("⚠️ Some stops can't be reached from the start!", "warn")
+                return
+            self._log(f"\n[Itinerary] {len(set(order))} stops, {km} km"
+                      f"{' (round trip)' if round_trip else ''}\nOrder: {' → '.join(order)}", "info")
+            self.graph.visualize_graph(highlight_path=path, block=False, pos=pos)
+
+        self._run_task("Itinerary", lambda: self.graph.optimize_itinerary(stops, round_trip, processes=processes),
+                       done, layout="spring")
 
     def compare_algorithms(self):
-        frm, to = self.entry_from.get().strip(), self.entry_to.get().strip()
-        if not (frm and to):
-            messagebox.showerror("Error", "Enter both cities!")
+        ends = self._route_ends()
+        if ends is None:
             return
-        result = self.graph.compare_algorithms(frm, to)
-        self._log(f"\n⚖️ Algorithm Comparison:\n{result}", "info")
+        frm, to = ends
+        self._run_task("Comparison", lambda: self.graph.compare_algorithms(frm, to),
+                       lambda result: self._log(f"\n⚖️ Algorithm Comparison:\n{result}", "info"))
 
     def simulate_traffic(self):
         factor = self._get_traffic_factor()
         mode = self.traffic_mode.get()
-        message = self.graph.simulate_traffic(factor)
-        self._log(f"🚦 Simulated {mode} Traffic — road distances adjusted by ×{factor}", "success")
+        self._run_task("Traffic Simulation", lambda: self.graph.simulate_traffic(factor),
+                       lambda message: self._log(f"🚦 Simulated {mode} Traffic — road distances adjusted by ×{factor}", "success"))
 
     def reset_traffic(self):
-        message = self.graph.reset_traffic()
-        self._log(f"🔄 {message}", "success")
+        self._run_task("Traffic Reset", self.graph.reset_traffic,
+                       lambda message: self._log(f"🔄 {message}", "success"))
 
     def visualize_graph(self):
-        self.graph.visualize_graph()
-
+        self._run_task("Layout", lambda: None,
+                       lambda _, pos: self.graph.visualize_graph(block=False, pos=pos), layout="spring")
 
 
 if __name__ == "__main__":
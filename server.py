@@ -0,0 +1,377 @@
+# server.py
+import argparse
+import asyncio
+import functools
+import json
+import math
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+from graph_manager import GraphManager, NEGATIVE_CYCLE
+
+ROUTE_ALGORITHMS = ("dijkstra", "a_star", "bellman_ford", "bfs", "ch_shortest_path", "fastest_route")
+MST_ALGORITHMS = {"prim": "prim_mst", "kruskal": "kruskal_mst", "boruvka": "boruvka_mst"}
+MAX_BODY = 1 << 20
+MAX_MATRIX_CELLS = 250_000
+FLAGS = {"1": True, "true": True, "yes": True, "on": True, "0": False, "false": False, "no": False, "off": False}
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class _HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _flag(value):
+    """Parse a yes/no parameter given as a JSON boolean or a query-string word ("1", "false", ...)."""
+    if value is None or isinstance(value, bool):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in FLAGS:
+        return FLAGS[value.strip().lower()]
+    raise ValueError(f"not a yes/no value: {value!r}")
+
+
+# Queries (module level so process workers can run them)
+def _run_query(graph, kind, args):
+    """Answer one query on ``graph`` and return a JSON-ready dict."""
+    if kind == "route":
+        algorithm, start, goal = args
+        result = getattr(graph, algorithm)(start, goal)
+        path, cost = result if isinstance(result, tuple) else (result, len(result) - 1 if result else None)
+        if cost == NEGATIVE_CYCLE:
+            return {"algorithm": algorithm, "path": None, "error": NEGATIVE_CYCLE}
+        unit = {"bfs": "hops", "fastest_route": "hours"}.get(algorithm, "km")
+        return {"algorithm": algorithm, "path": path, unit: cost}
+    if kind == "matrix":
+        sources, targets = args
+        rows = graph.distance_matrix(sources, targets).tolist()
+        return {"sources": sources, "targets": targets,
+                "distances": [[None if math.isinf(d) else round(d, 2) for d in row] for row in rows]}
+    if kind == "mst":
+        edges, total = getattr(graph, MST_ALGORITHMS[args[0]])()
+        return {"algorithm": args[0], "edges": edges, "total": total}
+    raise ValueError(f"unknown query kind {kind!r}")
+
+
+def _thread_query(graph, kind, args):
+    with graph.lock:
+        return _run_query(graph, kind, args)
+
+
+_worker = {}
+
+
+def _init_worker(path):
+    _worker["graph"] = GraphManager.load_snapshot(path)
+    _worker["generation"] = 0
+
+
+def _process_query(generation, factor, kind, args):
+    """Run a query in a worker process, first replaying the traffic state of ``generation``."""
+    graph = _worker["graph"]
+    if _worker["generation"] != generation:
+        graph.reset_traffic()
+        if factor is not None:
+            graph.simulate_traffic(factor)
+        _worker["generation"] = generation
+    return _run_query(graph, kind, args)
+
+
+# Server
+class RouteServer:
+    """Localhost HTTP/JSON routing service over a GraphManager.
+
+    Reads go to a pool. In thread mode queries share the manager and hold
+    ``graph.lock`` while they fill its caches, so they run one at a time and
+    the pool defaults to a single thread; it only keeps the event loop
+    responsive. With ``processes=True`` worker processes each map a snapshot
+    of the network and run in parallel (one per CPU by default). Identical
+    queries in flight at the same time share one computation.
+
+    Traffic updates are copy-on-write: the writer clones the current manager,
+    changes the clone and publishes it with the next generation number.
+    Cloning takes ``graph.lock``, so it waits for the query running at that
+    moment, but queries already submitted keep the state they started on and
+    never see weights change under them.
+    """
+
+    def __init__(self, graph, workers=None, processes=False):
+        self.workers = workers or ((os.cpu_count() or 1) if processes else 1)
+        self.processes = processes
+        # Published state, replaced as a whole: (generation, manager, traffic factor or None).
+        self._state = (0, graph, None)
+        self._writer = asyncio.Lock()
+        self._in_flight = {}
+        self._snapshot = None
+        self._server = None
+        self.queries = 0
+        self.batched = 0
+        if processes:
+            fd, self._snapshot = tempfile.mkstemp(suffix=".srgs")
+            os.close(fd)
+            graph.save_snapshot(self._snapshot)
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=(self._snapshot,))
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="route-server")
+        self._routes = {
+            "/route": (("GET", "POST"), self._route),
+            "/matrix": (("GET", "POST"), self._matrix),
+            "/mst": (("GET",), self._mst),
+            "/traffic": (("POST",), self._traffic),
+            "/cities": (("GET",), self._cities),
+            "/stats": (("GET",), self._stats),
+        }
+
+    @property
+    def graph(self):
+        return self._state[1]
+
+    async def start(self, host="127.0.0.1", port=8080):
+        """Start listening and return the bound port (useful with ``port=0``)."""
+        self._server = await asyncio.start_server(self._serve_client, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        # Waiting for running queries blocks, so do it off the event loop.
+        await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self._pool.shutdown, cancel_futures=True))
+        if self._snapshot is not None:
+            os.remove(self._snapshot)
+            self._snapshot = None
+
+    # HTTP
+    async def _serve_client(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, target, headers, body = request
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                    status, payload = await self._dispatch(method, target, body)
+                except _HTTPError as exc:
+                    status, payload, keep_alive = exc.status, {"error": str(exc)}, False
+                data = json.dumps(payload).encode()
+                head = [f"HTTP/1.1 {status} {REASONS[status]}", "Content-Type: application/json",
+                        f"Content-Length: {len(data)}"]
+                if not keep_alive:
+                    head.append("Connection: close")
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader):
+        """Return (method, target, headers, body), or None when the client closed the connection."""
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        parts = line.decode("latin-1").split()
+        if len(parts) != 3:
+            raise _HTTPError(400, "malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise _HTTPError(400, "bad Content-Length") from None
+        if length > MAX_BODY:
+            raise _HTTPError(413, f"request body over {MAX_BODY} bytes")
+        body = await reader.readexactly(length) if length > 0 else b""
+        return parts[0].upper(), parts[1], headers, body
+
+    async def _dispatch(self, method, target, body):
+        url = urlsplit(target)
+        entry = self._routes.get(url.path)
+        if entry is None:
+            return 404, {"error": f"no endpoint {url.path}"}
+        methods, handler = entry
+        if method not in methods:
+            return 405, {"error": f"{url.path} accepts {', '.join(methods)}"}
+        params = dict(parse_qsl(url.query))
+        if body:
+            try:
+                data = json.loads(body)
+            except ValueError:
+                return 400, {"error": "body is not valid JSON"}
+            if not isinstance(data, dict):
+                return 400, {"error": "body must be a JSON object"}
+            params.update(data)
+        try:
+            return await handler(params)
+        except Exception as exc:
+            return 500, {"error": f"{type(exc).__name__}: {exc}"}
+
+    # Endpoints
+    async def _route(self, params):
+        start, goal = params.get("from"), params.get("to")
+        algorithm = params.get("algorithm", "dijkstra")
+        if not isinstance(start, str) or not isinstance(goal, str):
+            return 400, {"error": "'from' and 'to' city names are required"}
+        if algorithm not in ROUTE_ALGORITHMS:
+            return 400, {"error": f"algorithm must be one of {', '.join(ROUTE_ALGORITHMS)}"}
+        unknown = [city for city in (start, goal) if city not in self.graph.graph]
+        if unknown:
+            return 404, {"error": f"unknown city {unknown[0]!r}"}
+        return 200, await self._query("route", (algorithm, start, goal))
+
+    async def _matrix(self, params):
+        sources, targets = params.get("sources"), params.get("targets", params.get("sources"))
+        if isinstance(sources, str):
+            sources = sources.split(",")
+        if isinstance(targets, str):
+            targets = targets.split(",")
+        if not isinstance(sources, list) or not isinstance(targets, list) \
+                or not all(isinstance(c, str) for c in sources + targets):
+            return 400, {"error": "'sources' (and optional 'targets') must be lists of city names"}
+        if len(sources) * len(targets) > MAX_MATRIX_CELLS:
+            return 400, {"error": f"matrix is limited to {MAX_MATRIX_CELLS} cells"}
+        return 200, await self._query("matrix", (tuple(sources), tuple(targets)))
+
+    async def _mst(self, params):
+        algorithm = params.get("algorithm", "prim")
+        if algorithm not in MST_ALGORITHMS:
+            return 400, {"error": f"algorithm must be one of {', '.join(MST_ALGORITHMS)}"}
+        return 200, await self._query("mst", (algorithm,))
+
+    async def _traffic(self, params):
+        factor = params.get("factor")
+        try:
+            reset = _flag(params.get("reset"))
+        except ValueError:
+            return 400, {"error": "'reset' must be true or false"}
+        if reset:
+            factor = None
+        elif isinstance(factor, str):
+            try:
+                factor = float(factor)
+            except ValueError:
+                factor = -1.0
+        if not reset and (isinstance(factor, bool) or not isinstance(factor, (int, float))
+                          or not 0 < factor < math.inf):
+            return 400, {"error": "'factor' must be a positive number (or pass 'reset': true)"}
+        async with self._writer:
+            generation, graph, _ = self._state
+
+            def update():
+                with graph.lock:
+                    fresh = graph.clone()
+                message = fresh.reset_traffic() if factor is None else fresh.simulate_traffic(factor)
+                return fresh, message
+
+            fresh, message = await asyncio.get_running_loop().run_in_executor(None, update)
+            self._state = (generation + 1, fresh, factor)
+        return 200, {"generation": generation + 1, "factor": factor, "message": message}
+
+    async def _cities(self, params):
+        names = list(self.graph.graph)
+        try:
+            limit = int(params.get("limit", len(names)))
+        except (TypeError, ValueError):
+            return 400, {"error": "'limit' must be an integer"}
+        return 200, {"count": len(names), "cities": names[:max(limit, 0)]}
+
+    async def _stats(self, params):
+        generation, graph, factor = self._state
+        return 200, {"generation": generation, "traffic": factor,
+                     "mode": "processes" if self.processes else "threads", "workers": self.workers,
+                     "queries": self.queries, "batched": self.batched, "in_flight": len(self._in_flight),
+                     "cities": len(graph.graph), "version": graph.version}
+
+    # Query batching
+    async def _query(self, kind, args):
+        """Run a query against the current state, joining an identical one already in flight."""
+        state = self._state
+        key = (state[0], kind, args)
+        future = self._in_flight.get(key)
+        if future is None:
+            self.queries += 1
+            future = self._submit(state, kind, args)
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.batched += 1
+        # Shielded so one client hanging up doesn't cancel the others' answer.
+        return await asyncio.shield(future)
+
+    def _submit(self, state, kind, args):
+        generation, graph, factor = state
+        loop = asyncio.get_running_loop()
+        if self.processes:
+            return loop.run_in_executor(self._pool, _process_query, generation, factor, kind, args)
+        return loop.run_in_executor(self._pool, _thread_query, graph, kind, args)
+
+
+def load_graph(args):
+    if args.snapshot:
+        graph = GraphManager.load_snapshot(args.snapshot)
+        if graph is None:
+            raise SystemExit(f"{args.snapshot}: not a readable snapshot")
+        return graph
+    if args.routes:
+        graph = GraphManager()
+        graph.load_routes(args.routes)
+        return graph
+    from benchmark import GENERATORS
+    if args.graph not in GENERATORS:
+        raise SystemExit(f"--graph must be one of {', '.join(GENERATORS)}")
+    return GENERATORS[args.graph](args.size, args.seed)
+
+
+async def serve(graph, host, port, workers, processes):
+    server = RouteServer(graph, workers, processes)
+    try:
+        port = await server.start(host, port)
+        mode = "processes" if processes else "threads"
+        print(f"Serving {len(graph.graph)} cities on http://{host}:{port} ({server.workers} {mode})", flush=True)
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve SmartRoute+ queries over HTTP/JSON on localhost.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--snapshot", help="network snapshot written by GraphManager.save_snapshot")
+    source.add_argument("--routes", help="route list to import (CSV/TSV: city1, city2, distance)")
+    source.add_argument("--graph", default="geometric", help="synthetic network from benchmark.py")
+    parser.add_argument("--size", type=int, default=10000, help="cities in the synthetic network")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, help="pool size (default: 1 thread, or one process per CPU)")
+    parser.add_argument("--processes", action="store_true",
+                        help="answer queries in worker processes sharing a mapped snapshot")
+    args = parser.parse_args(argv)
+    graph = load_graph(args)
+    try:
+        asyncio.run(serve(graph, args.host, args.port, args.workers, args.processes))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,845 @@
+# test_graph_manager.py
+import heapq
+import itertools
+import math
+import random
+
+import numpy as np
+import pytest
+
+import graph_manager
+from graph_manager import GraphManager
+
+
+def _triangle():
+    g = GraphManager()
+    g.add_route("A", "B", 1)
+    g.add_route("B", "C", 2)
+    g.add_route("A", "C", 5)
+    return g
+
+
+def _random_network(seed, n=30, m=70):
+    """Connected network on cities C0..C{n-1}: a random spanning tree plus extra roads."""
+    rng = random.Random(seed)
+    g = GraphManager()
+    for i in range(1, n):
+        g.add_route(f"C{rng.randrange(i)}", f"C{i}", round(rng.uniform(1, 50), 3))
+    for _ in range(m - n + 1):
+        a, b = rng.sample(range(n), 2)
+        g.add_route(f"C{a}", f"C{b}", round(rng.uniform(1, 50), 3))
+    return g, rng
+
+
+# Dijkstra
+def test_dijkstra_after_add_city():
+    g = _triangle()
+    assert g.dijkstra("A", "C") == (["A", "B", "C"], 3.0)
+    g.add_city("Z")
+    assert g.dijkstra("A", "Z") == (None, None)
+    assert g.dijkstra("Z", "A") == (None, None)
+    g.add_route("Z", "C", 1)
+    assert g.dijkstra("A", "Z") == (["A", "B", "C", "Z"], 4.0)
+
+
+def test_bidirectional_dijkstra_matches_dijkstra():
+    g, _ = _random_network(9)
+    g.add_city("Lonely")
+    cities = list(g.graph)
+    for a, b in [("C0", "C29"), ("C4", "C4"), ("C12", "Lonely")] + list(zip(cities, reversed(cities))):
+        assert g.dijkstra(a, b, bidirectional=True) == g.dijkstra(a, b)
+
+
+# Bulk loading
+def _rows(seed, count=300, cities=40):
+    rng = random.Random(seed)
+    # Few cities, many rows: plenty of repeated roads in both directions.
+    return [(f"C{a}", f"C{b}", str(round(rng.uniform(1, 200), 2)))
+            for a, b in (rng.sample(range(cities), 2) for _ in range(count))]
+
+
+def _added_one_by_one(rows):
+    g = GraphManager()
+    for a, b, d in rows:
+        g.add_route(a, b, d)
+    return g
+
+
+def test_load_routes_matches_add_route(tmp_path):
+    rows = _rows(15)
+    expected = _added_one_by_one(rows)
+    path = tmp_path / "routes.csv"
+    path.write_text("from,to,km\n" + "".join(f"{a},{b},{d}\n" for a, b, d in rows))
+    for source in (path, rows, [",".join(r) for r in rows]):
+        g = GraphManager()
+        stats = g.load_routes(source, chunk_size=64)
+        assert list(g.graph) == list(expected.graph)
+        assert g.get_all_routes() == expected.get_all_routes()
+        assert stats["rows"] == len(rows)
+        assert stats["added"] + stats["duplicates"] == len(rows)
+
+
+def test_load_routes_updates_and_skips():
+    g = _triangle()
+    expected = _triangle()
+    rows = [("A", "B", "4"), ("C", "D", "oops"), ("", "E", "1"), ("B", "E", "inf"), ("C", "D", "7")]
+    stats = g.load_routes(rows)
+    expected.add_route("A", "B", 4)
+    expected.add_route("C", "D", 7)
+    assert g.get_all_routes() == expected.get_all_routes()
+    assert (stats["added"], stats["updated"], stats["skipped"]) == (1, 1, 3)
+    assert g.dijkstra("A", "D") == expected.dijkstra("A", "D")
+
+
+def test_load_routes_header_detection():
+    rows = [("A", "B", "3"), ("B", "C", "4")]
+    expected = _added_one_by_one(rows)
+    for header, skipped in ((("Distance", "FROM", " To "), 0), (("city_a", "city_b", "km"), 1),
+                            (("A", "B", "far"), 1), (("from", "to", "cost"), 1)):
+        g = GraphManager()
+        ordered = [tuple(row[i] for i in (2, 0, 1)) for row in rows] if skipped == 0 else rows
+        stats = g.load_routes([header] + ordered)
+        assert g.get_all_routes() == expected.get_all_routes(), header
+        assert (stats["rows"], stats["skipped"]) == (2, skipped), header
+
+
+# City lookup
+def _edit_distance(a, b):
+    row = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        prev, row[0] = row[0], i
+        for j, cb in enumerate(b, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (ca != cb))
+    return row[-1]
+
+
+def test_lookup_and_complete_fold_case_and_spaces():
+    g = GraphManager()
+    g.add_route("New  York", "Newark", 15)
+    g.add_route("new haven", "Boston", 220)
+    assert g.lookup_city("  NEW york ") == "New  York"
+    assert g.lookup_city("Boston") == "Boston"
+    assert g.lookup_city("Bost") is None
+    assert g.complete_city("NEW") == ["new haven", "New  York", "Newark"]
+    assert g.complete_city("new  ", limit=10) == ["new haven", "New  York", "Newark"]
+    assert g.complete_city("new", limit=2) == ["new haven", "New  York"]
+    assert g.complete_city("x") == []
+
+
+def test_city_index_follows_new_cities():
+    g = _triangle()
+    assert g.complete_city("") == ["A", "B", "C"]
+    g.add_route("Albany", "Bern", 3)
+    assert g.lookup_city("albany") == "Albany"
+    g.load_routes([(f"Alpha{i}", "Bern", i + 1) for i in range(40)])
+    assert g.complete_city("alpha3", limit=20) == ["Alpha3", "Alpha30", "Alpha31", "Alpha32", "Alpha33",
+                                                   "Alpha34", "Alpha35", "Alpha36", "Alpha37", "Alpha38",
+                                                   "Alpha39"]
+    assert g.lookup_city("ALPHA17") == "Alpha17"
+
+
+def test_suggest_cities_matches_brute_force():
+    rng = random.Random(18)
+    g = GraphManager()
+    names = sorted({"".join(rng.choice("abcd") for _ in range(rng.randint(1, 6))) for _ in range(300)})
+    names = [name.upper() if rng.random() < 0.3 else name for name in names]
+    for a, b in zip(names, names[1:]):
+        g.add_route(a, b, 1)
+    keys = {graph_manager._city_key(city): city for city in g.graph}
+    for query in ("abc", "dd", "a", "bacdab", "ccccccc", ""):
+        for max_edits in (0, 1, 2, 3):
+            scored = sorted((_edit_distance(query, key), key) for key in keys)
+            expected = [keys[key] for d, key in scored if d <= max_edits]
+            assert g.suggest_cities(query, limit=1000, max_edits=max_edits) == expected
+            assert g.suggest_cities(query, limit=3, max_edits=max_edits) == expected[:3]
+
+
+# Route listing
+def test_route_view_slices_like_a_list():
+    g = GraphManager()
+    for i in range(8):
+        g.add_route(f"C{i}", f"C{i + 1}", i + 1)
+    routes = g.get_all_routes()
+    rows = list(routes)
+    assert routes[::-1] == rows[::-1]
+    assert routes[5:1:-2] == rows[5:1:-2]
+    assert routes[-3:] == rows[-3:]
+    assert routes[-1] == rows[-1] and routes[-len(rows)] == rows[0]
+
+
+def test_route_view_is_a_snapshot():
+    g = GraphManager()
+    for i in range(4):
+        g.add_route(f"C{i}", f"C{i + 1}", i + 1)
+    before = g.get_all_routes()
+    rows = list(before)
+    g.add_route("C0", "C1", 9)
+    g.add_city("C9")
+    assert before == rows and before[0] == ("C0", "C1", 1.0)
+    g.simulate_traffic(1.0)
+    busy = g.get_all_routes()
+    rows = list(busy)
+    assert g.set_road_traffic("C2", "C3", 2)
+    assert busy == rows and busy[2] == ("C2", "C3", 3.0)
+    assert g.get_all_routes()[2] == ("C2", "C3", 6.0)
+
+
+# Snapshots
+def _edit_snapshot(path, edit):
+    """Rewrite the header and section table of a snapshot file through ``edit(fields, entries)``."""
+    header, entry = graph_manager._SNAPSHOT_HEADER, graph_manager._SNAPSHOT_ENTRY
+    data = bytearray(path.read_bytes())
+    fields = list(header.unpack_from(data, 0))
+    entries = [list(entry.unpack_from(data, header.size + i * entry.size)) for i in range(fields[-1])]
+    edit(fields, entries)
+    header.pack_into(data, 0, *fields)
+    for i, values in enumerate(entries):
+        entry.pack_into(data, header.size + i * entry.size, *values)
+    path.write_bytes(bytes(data))
+
+
+def test_snapshot_round_trip(tmp_path):
+    g = _triangle()
+    g.prepare_landmarks(2)
+    g.a_star("A", "C")
+    g.add_city("Z")
+    path = tmp_path / "net.snap"
+    assert g.save_snapshot(path)
+    h = GraphManager.load_snapshot(path)
+    assert h.get_all_routes() == g.get_all_routes()
+    assert len(h._landmark_dist) == 2
+    assert h.a_star("A", "C") == (["A", "B", "C"], 3.0)
+
+
+def test_snapshot_missing_section(tmp_path):
+    path = tmp_path / "net.snap"
+    _triangle().save_snapshot(path)
+
+    def drop_last(fields, entries):
+        fields[-1] -= 1
+
+    _edit_snapshot(path, drop_last)
+    assert GraphManager.load_snapshot(path) is None
+
+
+def test_snapshot_section_size_mismatch(tmp_path):
+    path = tmp_path / "net.snap"
+    _triangle().save_snapshot(path)
+
+    def shrink_targets(fields, entries):
+        for entry in entries:
+            if entry[0].rstrip(b"\0") == b"csr_to":
+                entry[2] -= 4
+
+    _edit_snapshot(path, shrink_targets)
+    assert GraphManager.load_snapshot(path) is None
+
+
+# Traffic
+def test_define_region_rejects_unknown_city():
+    g = _triangle()
+    assert g.define_region("north", ["A", "B"])
+    assert not g.define_region("north", ["A", "Nowhere"])
+    assert "Nowhere" not in g.graph
+    assert g.set_region_traffic("north", 2.0)
+    assert g.dijkstra("A", "B") == (["A", "B"], 2.0)
+
+
+def test_reset_traffic_keeps_scenario():
+    g = _triangle()
+    g.simulate_traffic(2.0, scenario="jam")
+    jammed = g.dijkstra("A", "C")
+    assert jammed[1] > 3.0
+    g.reset_traffic()
+    assert g.dijkstra("A", "C") == (["A", "B", "C"], 3.0)
+    assert "jam" in g.scenarios()
+    assert g.use_scenario("jam")
+    assert g.dijkstra("A", "C") == jammed
+
+
+def test_traffic_leaves_unscaled_roads_alone():
+    g = GraphManager()
+    g.add_route("A", "B", 1.004)
+    g.add_route("B", "C", 1.004)
+    g.add_route("C", "D", 5)
+    assert g.set_road_traffic("C", "D", 2)
+    assert g.get_all_routes() == [("A", "B", 1.004), ("B", "C", 1.004), ("C", "D", 10.0)]
+    g.simulate_traffic(1.0)
+    assert g.get_all_routes()[:2] == [("A", "B", 1.004), ("B", "C", 1.004)]
+
+
+def test_patched_overlay_matches_fresh_derivation():
+    g, rng = _random_network(17)
+    assert g.define_region("west", [f"C{i}" for i in range(10)])
+    g.simulate_traffic(1.3)
+    g.set_region_traffic("west", 1.7)
+    for a, b, _ in rng.sample(list(g.get_all_routes()), 10):
+        g.set_road_traffic(a, b, rng.choice((0.6, 1.1, 2.3)))
+    patched = list(g.get_all_routes())
+    g._overlays[g._scenario].drop_derived()
+    assert list(g.get_all_routes()) == patched
+
+
+# Time-dependent routes
+def test_fastest_route_with_flat_profiles_matches_dijkstra_on_times():
+    g, _ = _random_network(11)
+    h = GraphManager()
+    for a, b, d in g.get_all_routes():
+        assert g.set_road_profile(a, b, "flat")
+        h.add_route(a, b, d / graph_manager._default_speed(d))
+    for goal in ("C7", "C18", "C29"):
+        path, hours = g.fastest_route("C0", goal, depart=8.0)
+        assert path == h.dijkstra("C0", goal)[0]
+        expected = sum(g.graph[a][b] / graph_manager._default_speed(g.graph[a][b]) for a, b in zip(path, path[1:]))
+        assert hours == pytest.approx(expected, abs=1e-4)
+
+
+def test_fastest_route_rush_hour_is_slower_and_fifo():
+    g = _triangle()
+    g.add_route("C", "D", 120)
+    _, night = g.fastest_route("A", "D", depart=2.0)
+    _, rush = g.fastest_route("A", "D", depart=7.5)
+    assert rush > night
+    departures = [6.0 + i / 20 for i in range(40)]
+    arrivals = [t + g.fastest_route("A", "D", depart=t)[1] for t in departures]
+    # Durations are rounded to 4 decimals.
+    assert all(a <= b + 1e-4 for a, b in zip(arrivals, arrivals[1:]))
+    assert g.fastest_route("A", "Nowhere", depart=2.0) == (None, None)
+
+
+# Distance matrix
+def _dijkstra_km(g, start, goal):
+    km = g.dijkstra(start, goal)[1]
+    return np.inf if km is None else km
+
+
+def test_distance_matrix_after_add_city():
+    g = _triangle()
+    assert g.distance_matrix(["A"], ["C"])[0][0] == 3.0
+    g.add_city("Z")
+    matrix = g.distance_matrix(["A", "Z"], ["C", "Z"])
+    assert matrix[0][0] == 3.0 and math.isinf(matrix[0][1])
+    assert math.isinf(matrix[1][0]) and matrix[1][1] == 0.0
+
+
+def test_distance_matrix_matches_dijkstra():
+    g, rng = _random_network(21, n=50, m=110)
+    g.add_city("Lonely")
+    sources = ["C0", "C7", "Lonely", "Nowhere", "C33", "C7"]
+    targets = [f"C{i}" for i in rng.sample(range(50), 12)] + ["Lonely", "Nowhere"]
+    expected = np.array([[_dijkstra_km(g, a, b) for b in targets] for a in sources])
+    # Weights have three decimals, so a sum can land on a rounding tie either way.
+    assert np.allclose(g.distance_matrix(sources, targets), expected, rtol=0, atol=0.0101)
+    g.clear_caches()
+    assert np.allclose(g.distance_matrix(sources, targets, processes=2), expected, rtol=0, atol=0.0101)
+    square = np.array([[_dijkstra_km(g, a, b) for b in sources] for a in sources])
+    assert np.allclose(g.distance_matrix(sources, processes=2), square, rtol=0, atol=0.0101)
+
+
+# Isochrones
+def _reference_costs(g, sources, cost):
+    """Plain multi-source Dijkstra over the public adjacency view."""
+    dist = {s: 0.0 for s in sources}
+    heap = [(0.0, s) for s in sources]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for v in g.graph[u]:
+            nd = d + cost(u, v)
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+    return dist
+
+
+def test_isochrone_accepts_numpy_budget():
+    g = _triangle()
+    assert g.isochrone("A", np.float64(1.5)) == g.isochrone("A", 1.5)
+    assert g.isochrone("A", np.int64(3)) == g.isochrone("A", 3)
+
+
+@pytest.mark.parametrize("by, budgets", [("distance", [20, 45.5, 80]), ("time", [0.25, 0.6, 1.5])])
+def test_isochrone_matches_brute_force(by, budgets):
+    g, _ = _random_network(17, n=60, m=130)
+    g.add_city("Lonely")
+    if by == "time":
+        def cost(a, b):
+            return g.graph[a][b] / g.road_speeds[(a, b)]
+    else:
+        def cost(a, b):
+            return g.graph[a][b]
+    digits = 4 if by == "time" else 2
+    for sources in (["C0"], ["C5", "C41", "Nowhere"], "C12"):
+        reference = _reference_costs(g, [sources] if isinstance(sources, str) else
+                                     [c for c in sources if c in g.graph], cost)
+        result = g.isochrone(sources, budgets, by=by)
+        assert list(result) == budgets
+        for budget in budgets:
+            within = {c for c, d in reference.items() if d <= budget}
+            assert set(result[budget]) == within
+            assert all(abs(result[budget][c] - reference[c]) <= 10 ** -digits for c in within)
+        edges = g.isochrone_edges(sources, budgets[1], by=by)
+        sourced = {c for c, d in reference.items() if d == 0}
+        assert {city for _, city, _ in edges} == set(result[budgets[1]]) - sourced
+        for parent, city, c in edges:
+            assert abs(reference[parent] + cost(parent, city) - reference[city]) < 1e-9
+            assert abs(c - reference[city]) <= 10 ** -digits
+    assert g.isochrone("Nowhere", budgets, by=by) is None
+
+
+# Itineraries
+def _best_tour(g, stops, round_trip):
+    matrix = g.distance_matrix(stops)
+    best = math.inf
+    for rest in itertools.permutations(range(1, len(stops))):
+        tour = (0,) + rest + ((0,) if round_trip else ())
+        best = min(best, sum(matrix[a][b] for a, b in zip(tour, tour[1:])))
+    return round(float(best), 2)
+
+
+def test_itinerary_after_add_city():
+    g = _triangle()
+    assert g.optimize_itinerary(["A", "B", "C"])[0] is not None
+    g.add_city("Z")
+    assert g.optimize_itinerary(["A", "B", "Z"]) == (None, None, None)
+    g.add_route("C", "Z", 1)
+    order, _, total = g.optimize_itinerary(["A", "B", "C", "Z"])
+    assert order[0] == "A" and total == 4.0
+
+
+def test_optimize_itinerary_matches_brute_force():
+    g, rng = _random_network(16, n=40, m=90)
+    for _ in range(4):
+        stops = [f"C{i}" for i in rng.sample(range(40), 6)]
+        for round_trip in (False, True):
+            order, path, total = g.optimize_itinerary(stops, round_trip=round_trip)
+            assert order[0] == stops[0] and sorted(order[:len(stops)]) == sorted(stops)
+            assert len(order) == len(stops) + round_trip
+            if round_trip:
+                assert order[-1] == stops[0]
+            assert path[0] == order[0] and path[-1] == order[-1]
+            assert all(b in g.graph[a] for a, b in zip(path, path[1:]))
+            assert total == pytest.approx(_best_tour(g, stops, round_trip), abs=0.011)
+
+
+# A*
+def test_a_star_after_add_city():
+    g = _triangle()
+    g.prepare_landmarks(2)
+    g.add_city("Z")
+    assert g.a_star("A", "Z") == (None, None)
+    assert g.a_star("A", "C") == (["A", "B", "C"], 3.0)
+    g.add_route("Z", "C", 1)
+    assert g.a_star("A", "Z") == (["A", "B", "C", "Z"], 4.0)
+
+
+def test_a_star_ignores_coordinates_when_some_cities_lack_them():
+    g = GraphManager()
+    g.add_city("V", 0, 0)
+    g.add_city("T", 0, 1)
+    for a, b, d in [("S", "V", 1), ("V", "X", 1), ("X", "T", 1), ("S", "T", 10), ("V", "T", 500)]:
+        g.add_route(a, b, d)
+    assert g.dijkstra("S", "T") == (["S", "V", "X", "T"], 3.0)
+    assert g.a_star("S", "T") == (["S", "V", "X", "T"], 3.0)
+
+
+# Contraction hierarchies
+def _assert_ch_matches_dijkstra(g, pairs):
+    for a, b in pairs:
+        assert g.ch_shortest_path(a, b) == g.dijkstra(a, b)
+
+
+def test_contraction_hierarchy_shortcut_count():
+    g = _triangle()
+    shortcuts = g.build_contraction_hierarchy()
+    assert shortcuts == g._ch.shortcut_count
+    assert g.customize_contraction_hierarchy() == shortcuts
+    assert g.ch_shortest_path("A", "C") == (["A", "B", "C"], 3.0)
+
+
+def test_contraction_hierarchy_matches_dijkstra():
+    g, rng = _random_network(20, n=60, m=130)
+    g.add_city("Lonely")
+    cities = list(g.graph)
+    pairs = [tuple(rng.sample(cities, 2)) for _ in range(60)] + [("C5", "C5")]
+    _assert_ch_matches_dijkstra(g, pairs)
+
+    for a, b, d in rng.sample(list(g.get_all_routes()), 15):
+        g.add_route(a, b, d * rng.choice((0.3, 2.5)))
+    assert g._ch is not None and g._ch_stale
+    _assert_ch_matches_dijkstra(g, pairs)  # customized in the existing order
+
+    assert g.define_region("core", [f"C{i}" for i in range(20)])
+    g.simulate_traffic(1.2)
+    g.set_region_traffic("core", 1.9)
+    _assert_ch_matches_dijkstra(g, pairs)
+    g.reset_traffic()
+    assert g.customize_contraction_hierarchy() == g._ch.shortcut_count
+    _assert_ch_matches_dijkstra(g, pairs)
+
+
+# Watched shortest-path trees
+def _fresh(g):
+    """Unwatched copy of ``g`` built from its route list, with cities in the same order."""
+    h = GraphManager()
+    for city in g.graph:
+        h.add_city(city)
+    for a, b, d in g.get_all_routes():
+        h.add_route(a, b, d)
+    return h
+
+
+def _assert_tree_matches(g, source):
+    h = _fresh(g)
+    for city in g.graph:
+        assert g.dijkstra(source, city) == h.dijkstra(source, city)
+
+
+def test_watched_source_after_add_city():
+    g = _triangle()
+    g.watch_source("A")
+    g.add_city("Z")
+    assert g.dijkstra("A", "Z") == (None, None)
+    assert g.dijkstra("Z", "A") == (None, None)
+    g.add_route("Z", "C", 1)
+    assert g.dijkstra("A", "Z") == (["A", "B", "C", "Z"], 4.0)
+    assert g.dijkstra("Z", "A") == (["Z", "C", "B", "A"], 4.0)
+
+
+def test_watched_tree_after_weight_decreases():
+    g, rng = _random_network(1)
+    g.watch_source("C0")
+    routes = list(g.get_all_routes())
+    for a, b, d in rng.sample(routes, 10):
+        g.add_route(a, b, d / 4)
+    _assert_tree_matches(g, "C0")
+
+
+def test_watched_tree_after_weight_increases():
+    g, rng = _random_network(2)
+    g.watch_source("C0")
+    # Raise the tree edges on the way to a few cities so whole subtrees are orphaned.
+    for city in ("C5", "C17", "C29"):
+        path, _ = g.dijkstra("C0", city)
+        for a, b in zip(path, path[1:]):
+            g.add_route(a, b, g.graph[a][b] * 3)
+    _assert_tree_matches(g, "C0")
+
+
+def test_watched_tree_after_new_roads_and_cities():
+    g, rng = _random_network(3)
+    g.watch_source("C0")
+    for _ in range(8):
+        a, b = rng.sample(range(30), 2)
+        g.add_route(f"C{a}", f"C{b}", round(rng.uniform(1, 5), 3))
+    g.add_city("New1")
+    g.add_route("New1", "C7", 2.5)
+    g.add_route("New1", "New2", 1.5)
+    g.add_route("New2", "C0", 40)
+    _assert_tree_matches(g, "C0")
+
+
+def test_watched_tree_after_mixed_batch():
+    g, rng = _random_network(4)
+    g.watch_source("C0")
+    g.watch_source("C9")
+    routes = list(g.get_all_routes())
+    for a, b, d in rng.sample(routes, 12):
+        g.add_route(a, b, d * rng.choice((0.2, 0.5, 2.0, 5.0)))
+    g.add_route("C3", "Z", 1.0)
+    _assert_tree_matches(g, "C0")
+    _assert_tree_matches(g, "C9")
+
+
+def test_watched_tree_after_first_overlay():
+    g = GraphManager()
+    g.add_route("A", "B", 1.004)
+    g.add_route("B", "C", 1.004)
+    g.add_route("C", "D", 5)
+    g.watch_source("A")
+    assert g.set_road_traffic("C", "D", 2)
+    assert g.dijkstra("A", "C") == g.dijkstra("A", "C", bidirectional=True) == (["A", "B", "C"], 2.01)
+    assert g.dijkstra("A", "D") == (["A", "B", "C", "D"], 12.01)
+    g.set_road_traffic("A", "B", 3)
+    _assert_tree_matches(g, "A")
+
+
+# Minimum spanning trees
+def _edge_set(edges):
+    return {frozenset((a, b)) for a, b, _ in edges}
+
+
+def _assert_mst_matches_kruskal(g):
+    prim, kruskal = g.prim_mst(), g.kruskal_mst()
+    assert prim[1] == kruskal[1]
+    assert _edge_set(prim[0]) == _edge_set(kruskal[0])
+
+
+def test_prim_mst_patched_after_decrease():
+    g, rng = _random_network(5)
+    tree = _edge_set(g.prim_mst()[0])
+    for a, b, d in rng.sample([r for r in g.get_all_routes() if frozenset(r[:2]) not in tree], 5):
+        g.add_route(a, b, d / 10)
+        assert g._mst is not None
+        _assert_mst_matches_kruskal(g)
+
+
+def test_prim_mst_after_tree_edge_increase():
+    g, rng = _random_network(6)
+    edges, _ = g.prim_mst()
+    for a, b, d in rng.sample(edges, 5):
+        g.add_route(a, b, d * 4)
+        _assert_mst_matches_kruskal(g)
+
+
+def test_prim_mst_patched_after_added_road():
+    g, rng = _random_network(7)
+    g.prim_mst()
+    for _ in range(5):
+        a, b = rng.sample(range(30), 2)
+        while f"C{b}" in g.graph[f"C{a}"]:
+            a, b = rng.sample(range(30), 2)
+        g.add_route(f"C{a}", f"C{b}", round(rng.uniform(0.5, 30), 3))
+        assert g._mst is not None
+        _assert_mst_matches_kruskal(g)
+    g.add_route("C4", "Z", 3.0)
+    assert g._mst is not None
+    _assert_mst_matches_kruskal(g)
+
+
+def test_boruvka_mst_matches_kruskal():
+    g, _ = _random_network(10, n=60, m=150)
+    # A second component and an isolated city: both return a spanning forest.
+    g.add_route("X", "Y", 2.0)
+    g.add_route("Y", "Z", 1.0)
+    g.add_city("Lonely")
+    expected = g.kruskal_mst()
+    assert g.boruvka_mst() == expected
+    assert g.boruvka_mst(processes=2) == expected
+
+
+# BFS/DFS
+def _hops(g, start):
+    """Minimum number of roads from ``start`` to every reachable city."""
+    hops, queue = {start: 0}, [start]
+    for city in queue:
+        for neighbour in g.graph[city]:
+            if neighbour not in hops:
+                hops[neighbour] = hops[city] + 1
+                queue.append(neighbour)
+    return hops
+
+
+def _assert_valid_path(g, path, start, goal):
+    assert path[0] == start and path[-1] == goal
+    assert len(set(path)) == len(path)
+    assert all(b in g.graph[a] for a, b in zip(path, path[1:]))
+
+
+def test_bfs_finds_minimum_hop_paths():
+    g, _ = _random_network(12, n=50, m=80)
+    g.add_city("Lonely")
+    hops = _hops(g, "C0")
+    for goal in g.graph:
+        for bidirectional in (False, True):
+            path = g.bfs("C0", goal, bidirectional=bidirectional)
+            if goal not in hops:
+                assert path is None
+                continue
+            _assert_valid_path(g, path, "C0", goal)
+            assert len(path) - 1 == hops[goal]
+
+
+def test_bfs_max_hops():
+    g, _ = _random_network(13, n=50, m=80)
+    hops = _hops(g, "C0")
+    for goal, needed in hops.items():
+        for bidirectional in (False, True):
+            for limit in range(max(0, needed - 1), needed + 2):
+                path = g.bfs("C0", goal, bidirectional=bidirectional, max_hops=limit)
+                if limit < needed:
+                    assert path is None
+                else:
+                    assert len(path) - 1 == needed
+
+
+def test_dfs_paths_and_long_corridor():
+    g, _ = _random_network(14)
+    g.add_city("Lonely")
+    for goal in ("C3", "C21", "C29"):
+        _assert_valid_path(g, g.dfs("C0", goal), "C0", goal)
+    assert g.dfs("C0", "Lonely") is None
+    visited = set()
+    assert g.dfs("C0", "Lonely", visited=visited) is None
+    assert visited == set(_hops(g, "C0"))
+
+    corridor = GraphManager()
+    for i in range(5000):
+        corridor.add_route(f"K{i}", f"K{i + 1}", 1)
+    assert len(corridor.dfs("K0", "K5000")) == 5001
+
+
+# Bellman-Ford
+def test_bellman_ford_agrees_with_dijkstra():
+    g, _ = _random_network(8)
+    for city in ("C3", "C11", "C29"):
+        expected = g.dijkstra("C0", city)
+        assert g.bellman_ford("C0", city) == expected
+        assert g.bellman_ford("C0", city, method="vectorized") == expected
+
+
+def test_bellman_ford_reachable_negative_cycle():
+    g = _triangle()
+    # Roads are two-way, so one negative road is already a negative cycle.
+    g.add_route("C", "D", -1)
+    for method in ("queue", "vectorized"):
+        assert g.bellman_ford("A", "C", method=method) == (None, graph_manager.NEGATIVE_CYCLE)
+
+
+def test_bellman_ford_unreachable_negative_cycle():
+    g = _triangle()
+    g.add_route("X", "Y", -1)
+    for method in ("queue", "vectorized"):
+        assert g.bellman_ford("A", "C", method=method) == (["A", "B", "C"], 3.0)
+        assert g.bellman_ford("A", "X", method=method) == (None, None)
+
+
+# Algorithm comparison
+def test_compare_algorithms_reports_effort_and_cache():
+    g = _triangle()
+    g.add_city("D")
+    g.prepare_landmarks(2)
+    g.add_route("A", "B", 1)  # drops the landmark tables; A* rebuilds them
+    first = g.compare_algorithms("A", "C").splitlines()
+    # The rebuild reuses Dijkstra's cached tree from A, but A* itself still searched.
+    assert all("settled" in line and "cached" not in line for line in first[:3])
+    assert all(line.endswith("(cached)") for line in g.compare_algorithms("A", "C").splitlines()[:3])
+    assert not g.metrics()["enabled"]
+
+
+# Cancellation
+class _CancelAfter(graph_manager.CancelToken):
+    """Token that cancels itself after ``steps`` ticks, i.e. in the middle of a long call."""
+
+    def __init__(self, steps):
+        super().__init__()
+        self.after = steps
+
+    def tick(self, total=0):
+        if self.steps == self.after:
+            self.cancel()
+        super().tick(total)
+
+
+def _cancelled(g, call, steps=1500):
+    token = _CancelAfter(steps)
+    with g.cancellable(token):
+        with pytest.raises(graph_manager.QueryCancelled):
+            call()
+    assert token.cancelled and 0 < token.progress < 1
+    assert g._token is None
+
+
+def test_cancelled_searches_leave_no_partial_state():
+    g, _ = _random_network(19, n=3000, m=6000)
+    expected = _fresh(g)
+    g.add_city("Far")  # unreachable, so the search below walks the whole network
+
+    _cancelled(g, lambda: g.dijkstra("C0", "Far"))
+    assert len(g._results) == 0
+    # The interrupted tree stops between two pops, so it resumes correctly.
+    assert g.dijkstra("C0", "C2999") == expected.dijkstra("C0", "C2999")
+
+    g.clear_caches()
+    _cancelled(g, lambda: g.prepare_landmarks(4))
+    assert g._landmarks is None and g._landmark_dist is None
+    assert g.a_star("C0", "C2999") == expected.dijkstra("C0", "C2999")
+    assert len(g._landmark_dist) == 4
+
+    _cancelled(g, g.prim_mst)
+    assert g._mst is None
+    assert g.prim_mst()[1] == g.kruskal_mst()[1]
+
+
+def test_cancelled_contraction_keeps_previous_index():
+    # A grid contracts quickly; it needs a few thousand cities for the token to be polled twice.
+    g = GraphManager()
+    for r in range(46):
+        for c in range(46):
+            if c:
+                g.add_route(f"G{r}_{c - 1}", f"G{r}_{c}", 1 + (r * c) % 7)
+            if r:
+                g.add_route(f"G{r - 1}_{c}", f"G{r}_{c}", 1 + (r + c) % 5)
+    _cancelled(g, g.build_contraction_hierarchy)
+    assert g._ch is None
+    g.build_contraction_hierarchy()
+    built, shortcuts = g._ch, g._ch.shortcut_count
+    g.simulate_traffic(1.5)
+    _cancelled(g, g.customize_contraction_hierarchy)
+    assert g._ch is built and g._ch.shortcut_count == shortcuts and g._ch_stale
+
+
+# Instrumentation
+def test_metrics_count_a_known_search():
+    g = _triangle()
+    g.enable_metrics()
+    g.dijkstra("A", "C")
+    stats = g.last_query_stats()
+    # Settles A, B and C, scanning both roads of each; B and C share the heap once.
+    assert (stats.algorithm, stats.args) == ("dijkstra", ("A", "C"))
+    assert (stats.popped, stats.relaxed, stats.heap_max) == (3, 6, 2)
+    assert (stats.cache_hits, stats.cache_misses) == (0, 1)
+    g.dijkstra("A", "C")
+    assert g.last_query_stats().popped == 0 and g.last_query_stats().cache_hits == 1
+    totals = g.metrics()["totals"]["dijkstra"]
+    assert (totals["queries"], totals["popped"], totals["relaxed"], totals["cache_hits"]) == (2, 3, 6, 1)
+    g.reset_metrics()
+    assert g.metrics()["totals"] == {} and g.last_query_stats() is None
+
+
+def test_metrics_hooks_and_phases():
+    g = _triangle()
+    seen = []
+    g.add_metrics_hook(seen.append)
+    assert g.metrics()["enabled"]
+    g.prepare_landmarks(2)
+    g.add_route("C", "D", 1)  # drops the CSR arrays and landmark tables
+    g.a_star("A", "C")
+    assert [s.algorithm for s in seen] == ["a_star"]
+    phases = seen[0].as_dict()["phases"]
+    assert {"csr_build", "landmarks", "search"} <= set(phases)
+    assert all(t >= 0 for t in phases.values())
+    g.remove_metrics_hook(seen.append)
+    g.bfs("A", "C")
+    assert len(seen) == 1 and g.last_query_stats().algorithm == "bfs"
+
+
+def test_metrics_off_records_nothing(monkeypatch):
+    def unexpected(*args):
+        raise AssertionError("QueryStats created while metrics are off")
+
+    g = _triangle()
+    g.enable_metrics()
+    g.enable_metrics(False)
+    monkeypatch.setattr(graph_manager, "QueryStats", unexpected)
+    assert g.dijkstra("A", "C") == (["A", "B", "C"], 3.0)
+    g.a_star("A", "C")
+    g.bellman_ford("A", "C")
+    g.prim_mst()
+    assert g._stats is None and g.last_query_stats() is None
+    assert g.metrics()["enabled"] is False and g.metrics()["totals"] == {}
+
+
+# Drawing
+def test_visualize_graph_uses_given_positions(monkeypatch):
+    g = _triangle()
+    pos = g.layout_positions()
+    g._layouts.clear()
+    monkeypatch.setattr(g, "_spring_positions", lambda old: pytest.fail("laid out again"))
+    monkeypatch.setattr(graph_manager.plt, "show", lambda block=True: None)
+    edges, _ = g.kruskal_mst()
+    g.visualize_graph(highlight_path=[(a, b) for a, b, _ in edges], block=False, pos=pos)
+    (highlight,) = g._figure[3]
+    assert len(highlight.get_segments()) == len(edges)
+    graph_manager.plt.close(g._figure[0])
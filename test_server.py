@@ -0,0 +1,126 @@
+# test_server.py
+import asyncio
+
+from graph_manager import GraphManager
+from loadgen import Connection, run_load
+from server import RouteServer
+
+
+def _network():
+    g = GraphManager()
+    for a, b, d in [("A", "B", 1), ("B", "C", 2), ("A", "C", 5), ("C", "D", 4), ("B", "D", 7), ("D", "E", 3)]:
+        g.add_route(a, b, d)
+    return g
+
+
+def _serve(test, **options):
+    """Run ``test(server, port)`` against a server on a free localhost port."""
+    async def main():
+        server = RouteServer(_network(), **options)
+        port = await server.start(port=0)
+        try:
+            return await test(server, port)
+        finally:
+            await server.close()
+    return asyncio.run(main())
+
+
+def test_route_matrix_mst_and_traffic():
+    async def check(server, port):
+        conn = Connection("127.0.0.1", port)
+        try:
+            assert await conn.request("POST", "/route", {"from": "A", "to": "E"}) == (
+                200, {"algorithm": "dijkstra", "path": ["A", "B", "C", "D", "E"], "km": 10.0})
+            assert await conn.request("GET", "/route?from=A&to=E&algorithm=bfs") == (
+                200, {"algorithm": "bfs", "path": ["A", "B", "D", "E"], "hops": 3})
+            status, matrix = await conn.request("POST", "/matrix", {"sources": ["A", "E"], "targets": ["C", "E"]})
+            assert status == 200 and matrix["distances"] == [[3.0, 10.0], [7.0, 0.0]]
+            status, mst = await conn.request("GET", "/mst?algorithm=kruskal")
+            assert status == 200 and mst["total"] == 10.0
+
+            status, update = await conn.request("POST", "/traffic", {"factor": 2})
+            assert status == 200 and update["generation"] == 1
+            assert (await conn.request("POST", "/route", {"from": "A", "to": "E"}))[1]["km"] == 20.0
+            status, update = await conn.request("POST", "/traffic?reset=true")
+            assert status == 200 and update["generation"] == 2
+            assert (await conn.request("POST", "/route", {"from": "A", "to": "E"}))[1]["km"] == 10.0
+            assert (await conn.request("GET", "/stats"))[1]["generation"] == 2
+        finally:
+            conn.close()
+
+    _serve(check)
+
+
+def test_error_responses():
+    async def check(server, port):
+        conn = Connection("127.0.0.1", port)
+        try:
+            bad = [("POST", "/route", {"from": "A"}),
+                   ("POST", "/route", {"from": "A", "to": "E", "algorithm": "teleport"}),
+                   ("POST", "/matrix", {"sources": "A,B", "targets": [1]}),
+                   ("GET", "/mst?algorithm=fastest", None),
+                   ("POST", "/traffic", {"factor": True}),
+                   ("POST", "/traffic", {"factor": -1}),
+                   ("POST", "/traffic", {"factor": "fast"}),
+                   ("POST", "/traffic", {"reset": "maybe"}),
+                   ("POST", "/traffic?reset=0", None),
+                   ("POST", "/traffic", {"reset": "false"})]
+            for method, path, payload in bad:
+                status, body = await conn.request(method, path, payload)
+                assert status == 400 and "error" in body, (method, path, payload)
+            assert (await conn.request("POST", "/route", {"from": "A", "to": "Nowhere"}))[0] == 404
+            assert (await conn.request("GET", "/nowhere"))[0] == 404
+            assert (await conn.request("GET", "/traffic"))[0] == 405
+            assert (await conn.request("GET", "/stats"))[1]["generation"] == 0
+        finally:
+            conn.close()
+
+    _serve(check)
+
+
+def test_batched_requests_match_serial():
+    pairs = [("A", "E"), ("E", "A"), ("B", "D"), ("A", "C")]
+
+    async def ask(port, start, goal):
+        conn = Connection("127.0.0.1", port)
+        try:
+            return await conn.request("POST", "/route", {"from": start, "to": goal})
+        finally:
+            conn.close()
+
+    async def check(server, port):
+        serial = [await ask(port, a, b) for a, b in pairs]
+        queries = server.queries
+        # Identical requests issued together share one computation.
+        joined = await asyncio.gather(*(server._query("route", ("dijkstra", "A", "E")) for _ in range(8)))
+        assert server.queries == queries + 1 and server.batched == 7
+        assert all(answer == serial[0][1] for answer in joined)
+        concurrent = await asyncio.gather(*(ask(port, a, b) for a, b in pairs * 5))
+        assert concurrent == serial * 5
+
+    _serve(check)
+
+
+def test_process_workers_follow_traffic():
+    async def check(server, port):
+        conn = Connection("127.0.0.1", port)
+        try:
+            assert (await conn.request("POST", "/route", {"from": "A", "to": "E"}))[1]["km"] == 10.0
+            assert (await conn.request("POST", "/traffic", {"factor": 1.5}))[0] == 200
+            assert (await conn.request("POST", "/route", {"from": "A", "to": "E"}))[1]["km"] == 15.0
+        finally:
+            conn.close()
+
+    _serve(check, workers=2, processes=True)
+
+
+def test_load_generator():
+    async def check(server, port):
+        return await run_load(port=port, concurrency=4, requests=60, matrix_size=3, hot=2)
+
+    rows, stats = _serve(check)
+    overall = rows[0]
+    assert overall["operation"] == "all" and overall["requests"] >= 60 and overall["errors"] == 0
+    assert {row["operation"] for row in rows[1:]} <= {"route", "matrix", "mst", "traffic"}
+    traffic = sum(row["requests"] for row in rows if row["operation"] == "traffic")
+    assert stats["generation"] == traffic